@@ -1,22 +1,48 @@
-import hashlib
+import asyncio
+import base64
+import json
 import logging
-import os
+from datetime import datetime
 from typing import List, Optional
 from xml.etree import ElementTree as ET
 
 from app.core.settings import settings
-from app.crud import (bulk_create_analysis_items, create_analysis, create_file,
-                      delete_file, get_analysis_with_items, get_file,
-                      get_latest_analysis, list_analyses_by_file, list_files)
-from app.db import get_db
-from app.models import AnalysisItemRow
-from app.services.analysis import analyze_xml
+from app.crud import (apply_item_operations, bump_analysis_version,
+                      count_files_by_sha256, count_items_by_file,
+                      create_analysis,
+                      create_analysis_job, create_file, create_rule_set,
+                      delete_file, delete_rule_set, derive_result_json,
+                      existing_item_ids, find_latest_analysis, get_file,
+                      get_files_by_ids,
+                      get_rule_set, get_rule_set_version, iter_findings,
+                      list_analyses_by_file, list_analysis_items,
+                      list_files_with_analysis_summary,
+                      list_rule_set_versions, list_rule_sets, update_rule_set)
+from app.db import SessionLocal, get_db
+from app.models import Analysis, AnalysisItemRow, RuleSet
+from app.services.analysis_cache import rules_hash
+from app.services.export import iter_csv, iter_xlsx
+from app.services.jobs import notify_new_job
+from app.services.metrics import render as render_metrics
+from app.services.pipeline import (AnalysisError, expected_model,
+                                   resolve_mode, run_analysis, save_outcome,
+                                   stream_analysis)
 from app.services.pptx_parser import PptxConverter
+from app.services.response_cache import RESPONSE_CACHE, get_response_cache
 from app.services.schemas import (AnalysisItem, AnalysisItemCreate,
-                                  AnalysisItemUpdate)
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse, Response
+                                  AnalysisItemCreateOp, AnalysisItemsBatchRequest,
+                                  AnalysisItemUpdate, AnalysisItemUpdateOp,
+                                  AnalyzeBatchRequest, RuleSetCreate,
+                                  RuleSetUpdate)
+from app.services.storage import (blob_lock, commit_blob, discard_temp,
+                                  remove_blob, save_upload, sha256_of_stream)
+from app.services.xml_cache import get_xml_cache
+from fastapi import (APIRouter, Depends, File, Form, HTTPException, Query,
+                     Request, UploadFile)
+from fastapi.responses import (JSONResponse, PlainTextResponse, Response,
+                               StreamingResponse)
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -29,33 +55,49 @@ def health():
     return {"status": "ok"}
 
 
-def _sha256(b: bytes) -> str:
-    h = hashlib.sha256()
-    h.update(b)
-    return h.hexdigest()
+@router.get("/metrics")
+def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(404, "metrics disabled")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @router.post("/files")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_file(
+    file: UploadFile = File(...),
+    revision_of: Optional[int] = Form(None),  # 改訂元の file_id（差分解析に使う）
+    db: Session = Depends(get_db),
+):
     if not (file.filename or "").lower().endswith(".pptx"):
         raise HTTPException(400, "pptxファイルのみ対応しています")
+    if revision_of is not None:
+        prev = get_file(db, revision_of)
+        if not prev or prev.user_id != FAKE_USER_ID:
+            raise HTTPException(404, "revision_of file not found")
+
+    # 全体をメモリに載せずチャンクで一時ファイルへ保存。同じ sha256 の blob があれば配置は省略される
+    tmp_path, digest, size = await save_upload(file, settings.STORAGE_DIR)
+
+    def register():
+        # blob の配置と File 行の作成を、同じ blob の削除（DELETE /files）と直列化する。
+        # 既存の blob を確認してから行を作るまでの間に、最後の参照の削除で blob が消されるのを防ぐ
+        with blob_lock(settings.STORAGE_DIR, digest):
+            rel_path = commit_blob(settings.STORAGE_DIR, tmp_path, digest)
+            return create_file(
+                db,
+                user_id=FAKE_USER_ID,
+                filename=file.filename,
+                path=rel_path,
+                sha256=digest,
+                size_bytes=size,
+                previous_file_id=revision_of,
+            )
 
-    data = await file.read()
-    digest = _sha256(data)
-    rel_path = f"{digest[:2]}/{digest}.pptx"
-    abs_path = os.path.join(settings.STORAGE_DIR, rel_path)
-    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-    with open(abs_path, "wb") as f:
-        f.write(data)
-
-    rec = create_file(
-        db,
-        user_id=FAKE_USER_ID,
-        filename=file.filename,
-        path=rel_path,
-        sha256=digest,
-        size_bytes=len(data),
-    )
+    try:
+        rec = await run_in_threadpool(register)
+    except BaseException:
+        await run_in_threadpool(discard_temp, tmp_path)
+        raise
     return {
         "file_id": rec.id,
         "filename": rec.filename,
@@ -64,13 +106,41 @@ async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db
     }
 
 
+def _encode_cursor(created_at: datetime, file_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{file_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts, file_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(file_id)
+    except Exception:
+        raise HTTPException(400, "after が不正です")
+
+
 @router.get("/files")
-def get_files(db: Session = Depends(get_db)):
-    files = list_files(db, user_id=FAKE_USER_ID)
+def get_files(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),  # 省略時は全件
+    after: Optional[str] = Query(None),  # 前ページの X-Next-Cursor
+    db: Session = Depends(get_db),
+):
+    rows = list_files_with_analysis_summary(
+        db,
+        user_id=FAKE_USER_ID,
+        limit=limit,
+        after=_decode_cursor(after) if after else None,
+    )
     result = []
-    for f in files:
-        analyses = list_analyses_by_file(db, file_id=f.id, user_id=FAKE_USER_ID)
-        status = "success" if len(analyses) > 0 else "pending"
+    for f, succeeded, busy, latest in rows:
+        if succeeded:
+            status = "success"
+        elif busy:
+            status = "analyzing"
+        else:
+            status = "pending"
         result.append(
             {
                 "id": str(f.id),
@@ -83,8 +153,12 @@ def get_files(db: Session = Depends(get_db)):
                 "error": None,
                 "isBasisAugmented": False,
                 "augmentationStatus": "idle",
+                "latestAnalysisAt": latest.isoformat() if latest else None,
             }
         )
+    if limit is not None and len(rows) == limit:
+        last = rows[-1][0]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.created_at, last.id)
     return result
 
 
@@ -93,11 +167,12 @@ def remove_file(file_id: int, db: Session = Depends(get_db)):
     f = get_file(db, file_id)
     if not f or f.user_id != FAKE_USER_ID:
         raise HTTPException(404, "not found")
-    try:
-        os.remove(os.path.join(settings.STORAGE_DIR, f.path))
-    except FileNotFoundError:
-        pass
-    delete_file(db, file_id)
+    digest, rel_path = f.sha256, f.path
+    with blob_lock(settings.STORAGE_DIR, digest):
+        delete_file(db, file_id)
+        # 他の File 行が同じ blob を参照している間は実体を残す
+        if count_files_by_sha256(db, digest) == 0:
+            remove_blob(settings.STORAGE_DIR, rel_path)
     return {"ok": True}
 
 
@@ -105,185 +180,332 @@ def remove_file(file_id: int, db: Session = Depends(get_db)):
 async def pptx_to_xml(file: UploadFile = File(...), pretty: Optional[bool] = Form(True)):
     if not (file.filename or "").lower().endswith(".pptx"):
         raise HTTPException(400, "pptxファイルのみ対応しています")
-    xml_str = PptxConverter.convert_to_xml(file, pretty=bool(pretty))
+    if not settings.XML_CACHE_ENABLED:
+        xml_str = await run_in_threadpool(PptxConverter.convert_to_xml, file.file, pretty=bool(pretty))
+        return Response(content=xml_str, media_type="application/xml")
+
+    cache = get_xml_cache()
+    opts = {"pretty": bool(pretty), "include_notes": settings.PPTX_INCLUDE_NOTES}
+    digest = await run_in_threadpool(sha256_of_stream, file.file)
+    xml_str = await run_in_threadpool(cache.get, digest, **opts)
+    if xml_str is None:
+        xml_str = await run_in_threadpool(PptxConverter.convert_to_xml, file.file, pretty=bool(pretty))
+        await run_in_threadpool(cache.put, digest, xml_str, **opts)
     return Response(content=xml_str, media_type="application/xml")
 
 
-def _mock_items_from_xml(_: str) -> list[AnalysisItem]:
-    return [
-        AnalysisItem(
-            slideNumber=1,
-            category="誤植",
-            basis="1",
-            issue="「こんな事をる患者さんがよくいます」という表現は、助詞の使い方に誤りがあるように見受けられます。読者に違和感を与える可能性がございます。",
-            suggestion="「こんなことを言う患者さんがよくいます」など、自然な表現へご修正いただけますと幸いです。",
-            correctionType="必須"
-        ),
-        AnalysisItem(
-            slideNumber=1,
-            category="表現",
-            basis="2",
-            issue="「オングリザという糖尿病治療剤がありますよ」という表現について、製品名の直接的な記載は薬機法上、広告と見なされる可能性がございます。",
-            suggestion="「サキサグリプチン（DPP-4阻害薬）」など一般名でのご記載を推奨いたします。対象読者が医療関係者であることも明示いただけますと安心です。",
-            correctionType="必須"
-        ),
-        AnalysisItem(
-            slideNumber=1,
-            category="出典",
-            basis="3",
-            issue="本スライドには出典情報や作成者名の記載が確認できませんでした。",
-            suggestion="承認時評価資料、添付文書、学術論文などの出典を明記いただき、加えて作成者名や所属もご記載いただけますと、資料の信頼性が一層高まるかと存じます。",
-            correctionType="任意"
-        ),
-        AnalysisItem(
-            slideNumber=2,
-            category="誤植",
-            basis="1",
-            issue="「C18He25N3O2・H2O」との表記について、元素記号に誤りがあるようでございます。",
-            suggestion="正しくは「C18H25N3O2・H2O」かと存じます。ご確認のうえ、ご修正をお願いいたします。",
-            correctionType="必須"
-        ),
-        AnalysisItem(
-            slideNumber=2,
-            category="表現",
-            basis="2",
-            issue="「軽度の肥満であっても 糖尿病が絶対に発症してしまう」という表現は、過度に不安を与える可能性がございます。",
-            suggestion="「軽度の肥満でも発症リスクが高まる可能性がある」などの表現に見直し、あわせて根拠となる文献をご提示いただけますと説得力が増すかと存じます。",
-            correctionType="必須"
-        ),
-        AnalysisItem(
-            slideNumber=2,
-            category="表現",
-            basis="2",
-            issue="「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
-            suggestion="「血糖コントロールの改善が期待される」や「食事・運動療法と併用することで効果が見込まれる」といった、慎重な表現への修正をお勧めいたします。",
-            correctionType="任意"
-        ),
-        AnalysisItem(
-            slideNumber=2,
-            category="出典",
-            basis="3",
-            issue="本スライドにも、出典や作成者の記載が見受けられませんでした。",
-            suggestion="添付文書やPMDA資料、査読付き論文など、信頼性の高い出典を明記いただくことで、資料の正確性がより一層高まるものと存じます。",
-            correctionType="任意"
-        )
-    ]
+@router.get("/pptx/xml/cache")
+def pptx_xml_cache_stats():
+    return get_xml_cache().stats()
+
 
+def _resolve_rules(db: Session, rules: Optional[str], rule_set_id: Optional[int]) -> Optional[str]:
+    """rule_set_id が指定されていればその現在の版の本文を返す（rules との同時指定は不可）。"""
+    if rule_set_id is None:
+        return rules
+    if rules and rules.strip():
+        raise HTTPException(400, "rules と rule_set_id は同時に指定できません")
+    rs = get_rule_set(db, rule_set_id)
+    if not rs or rs.user_id != FAKE_USER_ID:
+        raise HTTPException(404, "rule set not found")
+    v = get_rule_set_version(db, rule_set_id=rs.id, version=rs.current_version)
+    return v.rules
 
 
 @router.post("/analyze", response_model=List[AnalysisItem])
 async def analyze(
     file_id: int = Form(...),
     rules: Optional[str] = Form(None),
-    mode: Optional[str] = Form(None),  # auto | mock | llm （省略時は設定の ANALYZE_MODE または auto）
+    rule_set_id: Optional[int] = Form(None),  # rules の代わりに登録済みルールセット（現在の版）を使う
+    mode: Optional[str] = Form(None),  # auto | mock | llm | rules（省略時は設定の ANALYZE_MODE または auto）
+    force: Optional[bool] = Form(False),  # true でキャッシュを無視して再解析
+    sharded: Optional[bool] = Form(None),  # スライド単位の並列解析（省略時は設定の ANALYZE_SHARDED）
+    incremental: Optional[bool] = Form(None),  # 改訂版の差分解析（省略時は設定の ANALYZE_INCREMENTAL）
+    async_mode: bool = Query(False, alias="async"),  # true でジョブとして受け付けて 202 を返す
     db: Session = Depends(get_db),
 ):
-    f = get_file(db, file_id)
+    # 同期の DB 操作はスレッドで行い、イベントループを止めない
+    f = await run_in_threadpool(get_file, db, file_id)
     if not f or f.user_id != FAKE_USER_ID:
         raise HTTPException(404, "file not found")
+    rules = await run_in_threadpool(_resolve_rules, db, rules, rule_set_id)
 
-    abs_path = os.path.join(settings.STORAGE_DIR, f.path)
-    xml_str = PptxConverter.convert_to_xml(abs_path, pretty=False)
+    if async_mode:
+        try:
+            req_mode = resolve_mode(mode, rules)
+        except AnalysisError as e:
+            raise HTTPException(e.status_code, e.detail)
+        if req_mode == "llm" and not settings.GEMINI_API_KEY:
+            raise HTTPException(400, "GEMINI_API_KEY が未設定のため LLM モードは利用できません")
+        analysis = await run_in_threadpool(
+            create_analysis_job,
+            db,
+            user_id=FAKE_USER_ID,
+            file_id=file_id,
+            model=expected_model(req_mode),
+            rules_version=rules_hash(rules),
+            params={
+                "rules": rules,
+                "mode": req_mode,
+                "force": bool(force),
+                "sharded": sharded,
+                "incremental": incremental,
+            },
+        )
+        notify_new_job()
+        return JSONResponse(
+            status_code=202,
+            content={"analysis_id": analysis.id, "status": analysis.status},
+            headers={"X-Analysis-Id": str(analysis.id)},
+        )
 
-    # 実行モードの決定
-    req_mode = (mode or settings.ANALYZE_MODE or "auto").lower()
-    if req_mode not in {"auto", "mock", "llm"}:
-        raise HTTPException(400, "mode は auto/mock/llm のいずれかを指定してください")
+    try:
+        outcome = await run_analysis(
+            db, f, rules=rules, mode=mode, force=bool(force), sharded=sharded, incremental=incremental
+        )
+    except AnalysisError as e:
+        raise HTTPException(e.status_code, e.detail)
 
-    items: list[AnalysisItem]
-    model_name = "gemini-2.5-flash"
-
-    if req_mode == "mock":
-        items = _mock_items_from_xml(xml_str)
-        model_name = "mock"
-    elif req_mode == "llm":
-        if not settings.GEMINI_API_KEY:
-            raise HTTPException(400, "GEMINI_API_KEY が未設定のため LLM モードは利用できません")
-        try:
-            items = analyze_xml(xml_str, rules)
-        except Exception as e:
-            logger.exception("LLM analyze failed in llm mode")
-            raise HTTPException(502, f"LLM 解析に失敗しました: {e}")
-    else:  # auto
-        try:
-            if settings.GEMINI_API_KEY:
-                items = analyze_xml(xml_str, rules)
-            else:
-                raise RuntimeError("GEMINI_API_KEY is not set")
-        except Exception as e:
-            logger.warning("LLM analyze failed; fallback to mock: %s", e)
-            items = _mock_items_from_xml(xml_str)
-            model_name = "mock"
-
-    for i in items:
-        if getattr(i, "correctionType", None) is None:
-            setattr(i, "correctionType", "任意")
-
-    payload = [i.model_dump() for i in items]
-
-    analysis = create_analysis(
-        db,
-        user_id=FAKE_USER_ID,
-        file_id=file_id,
-        model=model_name,
-        rules_version=None,
-        result_json=payload,
-    )
-    bulk_create_analysis_items(db, analysis_id=analysis.id, items=items)
+    analysis = await run_in_threadpool(save_outcome, db, user_id=FAKE_USER_ID, file_id=file_id, outcome=outcome)
 
     return JSONResponse(
-        content=payload,
+        content=outcome.payload,
         headers={
             "X-Analysis-Id": str(analysis.id),
-            "X-Analysis-Mode": model_name,
+            "X-Analysis-Mode": f"{outcome.model}; cache={outcome.cache_status}",
+            "X-Slides-Reused": str(outcome.slides_reused),
+            "X-Slides-Analyzed": str(outcome.slides_analyzed),
         },
     )
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/analyze/stream")
+async def analyze_stream(
+    file_id: int = Query(...),
+    rules: Optional[str] = Query(None),
+    rule_set_id: Optional[int] = Query(None),
+    mode: Optional[str] = Query(None),  # auto | mock | llm | rules
+    force: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """Server-Sent Events で指摘をスライド単位に逐次返す（start → item… → done / error）。"""
+    f = await run_in_threadpool(get_file, db, file_id)
+    if not f or f.user_id != FAKE_USER_ID:
+        raise HTTPException(404, "file not found")
+    rules = await run_in_threadpool(_resolve_rules, db, rules, rule_set_id)
+    try:
+        req_mode = resolve_mode(mode, rules)
+    except AnalysisError as e:
+        raise HTTPException(e.status_code, e.detail)
+    if req_mode == "llm" and not settings.GEMINI_API_KEY:
+        raise HTTPException(400, "GEMINI_API_KEY が未設定のため LLM モードは利用できません")
+
+    # レスポンス送信中も使うため、リクエストのセッションとは別に開く
+    async def events():
+        with SessionLocal() as sdb:
+            sf = await run_in_threadpool(get_file, sdb, file_id)
+            async for event, data in stream_analysis(
+                sdb, sf, user_id=FAKE_USER_ID, rules=rules, mode=req_mode, force=force
+            ):
+                yield _sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    req: AnalyzeBatchRequest,
+    async_mode: bool = Query(False, alias="async"),  # true なら各ファイルをジョブとして登録して 202
+    db: Session = Depends(get_db),
+):
+    rules = await run_in_threadpool(_resolve_rules, db, req.rules, req.rule_set_id)
+    try:
+        req_mode = resolve_mode(req.mode, rules)
+    except AnalysisError as e:
+        raise HTTPException(e.status_code, e.detail)
+    if req_mode == "llm" and not settings.GEMINI_API_KEY:
+        raise HTTPException(400, "GEMINI_API_KEY が未設定のため LLM モードは利用できません")
+    file_ids = list(dict.fromkeys(req.file_ids))
+
+    def load_files() -> dict:
+        # ファイルは 1 回のクエリでまとめて読み、リクエストのセッションの接続はすぐに返す。
+        # 読み込んだ属性が失効しないよう、トランザクションを終える前にセッションから切り離す
+        files = get_files_by_ids(db, file_ids)
+        db.expunge_all()
+        db.commit()
+        return {i: f for i, f in files.items() if f.user_id == FAKE_USER_ID}
+
+    if async_mode:
+        def enqueue() -> list[dict]:
+            files = load_files()
+            results = []
+            for file_id in file_ids:
+                if file_id not in files:
+                    results.append(
+                        {"file_id": file_id, "analysis_id": None, "status": "failed", "error": "file not found"}
+                    )
+                    continue
+                a = create_analysis_job(
+                    db,
+                    user_id=FAKE_USER_ID,
+                    file_id=file_id,
+                    model=expected_model(req_mode),
+                    rules_version=rules_hash(rules),
+                    params={
+                        "rules": rules,
+                        "mode": req_mode,
+                        "force": req.force,
+                        "sharded": req.sharded,
+                        "incremental": req.incremental,
+                    },
+                )
+                results.append({"file_id": file_id, "analysis_id": a.id, "status": a.status, "error": None})
+            return results
+
+        results = await run_in_threadpool(enqueue)
+        notify_new_job()
+        return JSONResponse(status_code=202, content={"results": results})
+
+    files = await run_in_threadpool(load_files)
+    # 解析中のファイルはそれぞれ DB 接続を 1 本持つので、同時に走らせる数は接続プールの大きさまでにする。
+    # 解析（プロセスプール・LLM）全体の同時実行数はさらに analysis_slot（ANALYZE_MAX_CONCURRENCY）で制限される
+    fan_out = asyncio.Semaphore(max(1, settings.DB_POOL_SIZE))
+
+    async def run_one(file_id: int) -> dict:
+        if file_id not in files:
+            return {"file_id": file_id, "analysis_id": None, "status": "failed", "error": "file not found"}
+        async with fan_out:
+            with SessionLocal() as fdb:
+                try:
+                    f = fdb.merge(files[file_id], load=False)
+                    outcome = await run_analysis(
+                        fdb,
+                        f,
+                        rules=rules,
+                        mode=req_mode,
+                        force=req.force,
+                        sharded=req.sharded,
+                        incremental=req.incremental,
+                    )
+                    a = await run_in_threadpool(
+                        save_outcome, fdb, user_id=FAKE_USER_ID, file_id=file_id, outcome=outcome
+                    )
+                except AnalysisError as e:
+                    await run_in_threadpool(fdb.rollback)
+                    return {"file_id": file_id, "analysis_id": None, "status": "failed", "error": e.detail}
+                except Exception as e:
+                    # DB のタイムアウトなども含め、1 ファイルの失敗でバッチ全体を失敗させない
+                    logger.exception("batch analyze failed for file %s", file_id)
+                    await run_in_threadpool(fdb.rollback)
+                    return {"file_id": file_id, "analysis_id": None, "status": "failed", "error": str(e)}
+                return {
+                    "file_id": file_id,
+                    "analysis_id": a.id,
+                    "status": a.status,
+                    "model": outcome.model,
+                    "cache": outcome.cache_status,
+                    "items_count": len(outcome.items),
+                    "error": None,
+                }
+
+    results = await asyncio.gather(*(run_one(i) for i in file_ids))
+    return {"results": results}
+
+
+@router.get("/analyses/{analysis_id}/status")
+def get_analysis_status(analysis_id: int, db: Session = Depends(get_db)):
+    a = db.get(Analysis, analysis_id)
+    if not a or a.user_id != FAKE_USER_ID:
+        raise HTTPException(404, "analysis not found")
+    job = a.job
+    return {
+        "id": a.id,
+        "file_id": a.file_id,
+        "status": a.status,
+        "model": a.model,
+        "created_at": str(a.created_at),
+        "started_at": str(job.started_at) if job and job.started_at else None,
+        "finished_at": str(job.finished_at) if job and job.finished_at else None,
+        "attempts": job.attempts if job else None,
+        "error": job.error if job else None,
+    }
+
+
 @router.get("/files/{file_id}/analyses")
 def list_analyses(file_id: int, db: Session = Depends(get_db)):
     f = get_file(db, file_id)
     if not f or f.user_id != FAKE_USER_ID:
         raise HTTPException(404, "not found")
     lst = list_analyses_by_file(db, file_id=file_id, user_id=FAKE_USER_ID)
+    counts = count_items_by_file(db, file_id=file_id, user_id=FAKE_USER_ID)
     return [
         {
             "id": a.id,
             "created_at": str(a.created_at),
             "model": a.model,
             "status": a.status,
-            "items_count": len(a.items),
+            "rules_version": a.rules_version,
+            "items_count": counts.get(a.id, 0),
         }
         for a in lst
     ]
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 弱い比較（W/ の有無は問わない）
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+
+def _analysis_response(request: Request, a: Analysis, key: tuple, build) -> Response:
+    """版つきの ETag で条件付き GET に応え、ボディはプロセス内 LRU から返す。
+
+    ボディの組み立て（指摘の読み込みとシリアライズ）は 304 でもキャッシュヒットでもないときだけ行う。
+    """
+    etag = f'"a{a.id}.v{a.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        RESPONSE_CACHE.inc("not_modified")
+        return Response(status_code=304, headers=headers)
+    cache = get_response_cache()
+    body = cache.get(key, a.version)
+    if body is None:
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cache.put(key, a.version, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @router.get("/analyses/{analysis_id}")
-def get_analysis(analysis_id: int, db: Session = Depends(get_db)):
-    a, rows = get_analysis_with_items(db, analysis_id)
+def get_analysis(analysis_id: int, request: Request, db: Session = Depends(get_db)):
+    a = db.get(Analysis, analysis_id)
     if not a or a.user_id != FAKE_USER_ID:
         raise HTTPException(404, "analysis not found")
-    return {
-        "id": a.id,
-        "file_id": a.file_id,
-        "created_at": str(a.created_at),
-        "model": a.model,
-        "status": a.status,
-        "rules_version": a.rules_version,
-        "result_json": a.result_json,
-        "items": [
-            {
-                "id": r.id,
-                "slideNumber": r.slide_number,
-                "category": r.category,
-                "basis": r.basis,
-                "issue": r.issue,
-                "suggestion": r.suggestion,
-                "correctionType": r.correction_type,
-            }
-            for r in rows
-        ],
-    }
+
+    def build() -> dict:
+        rows = list_analysis_items(db, a.id)
+        return {
+            "id": a.id,
+            "file_id": a.file_id,
+            "created_at": str(a.created_at),
+            "model": a.model,
+            "status": a.status,
+            "rules_version": a.rules_version,
+            "result_json": a.result_json if a.result_json is not None else derive_result_json(rows),
+            "items": [_item_dict(r) for r in rows],
+        }
+
+    return _analysis_response(request, a, ("analysis", a.id), build)
 
 
 @router.post("/files/{file_id}/analyses/latest/items")
@@ -317,6 +539,7 @@ def add_item_to_latest_analysis(
         correction_type=item.correctionType or "任意",
     )
     db.add(row)
+    bump_analysis_version(db, row.analysis_id)
     db.commit()
     db.refresh(row)
     return {
@@ -354,6 +577,7 @@ def update_analysis_item(
         row.correction_type = patch.correctionType
 
     db.add(row)
+    bump_analysis_version(db, row.analysis_id)
     db.commit()
     db.refresh(row)
     return {
@@ -375,31 +599,193 @@ def delete_analysis_item(item_id: int, db: Session = Depends(get_db)):
     if not row.analysis or row.analysis.user_id != FAKE_USER_ID:
         raise HTTPException(403, "forbidden")
     db.delete(row)
+    bump_analysis_version(db, row.analysis_id)
     db.commit()
     return {"ok": True}
 
 
+def _item_dict(row: AnalysisItemRow) -> dict:
+    return {
+        "id": row.id,
+        "slideNumber": row.slide_number,
+        "category": row.category,
+        "basis": row.basis,
+        "issue": row.issue,
+        "suggestion": row.suggestion,
+        "correctionType": row.correction_type,
+    }
+
+
+@router.post("/analyses/{analysis_id}/items:batch")
+def batch_analysis_items(analysis_id: int, req: AnalysisItemsBatchRequest, db: Session = Depends(get_db)):
+    """指摘の作成・更新・削除をまとめて 1 トランザクションで適用する（所有者の確認も 1 回）。"""
+    a = db.get(Analysis, analysis_id)
+    if not a or a.user_id != FAKE_USER_ID:
+        raise HTTPException(404, "analysis not found")
+
+    creates: list[AnalysisItemCreateOp] = []
+    updates: dict[int, dict] = {}
+    deletes: set[int] = set()
+    for op in req.operations:
+        if isinstance(op, AnalysisItemCreateOp):
+            creates.append(op)
+        elif isinstance(op, AnalysisItemUpdateOp):
+            # PATCH と同じく null のフィールドは変更しない
+            updates.setdefault(op.id, {}).update(op.model_dump(exclude_none=True, exclude={"op", "id"}))
+        else:
+            deletes.add(op.id)
+    for item_id in deletes:
+        updates.pop(item_id, None)
+
+    missing = (set(updates) | deletes) - existing_item_ids(db, analysis_id=a.id, ids=set(updates) | deletes)
+    if missing:
+        raise HTTPException(404, f"item not found: {', '.join(map(str, sorted(missing)))}")
+
+    created, updated = apply_item_operations(
+        db, analysis_id=a.id, creates=creates, updates=updates, deletes=deletes
+    )
+    return {
+        "analysis_id": a.id,
+        "created": [_item_dict(r) for r in created],
+        "updated": [_item_dict(r) for r in updated],
+        "deleted": sorted(deletes),
+    }
+
+
 @router.get("/files/{file_id}/analyses/latest")
-def get_latest_analysis_for_file(file_id: int, db: Session = Depends(get_db)):
-    latest, items = get_latest_analysis(db, file_id=file_id, user_id=FAKE_USER_ID)
+def get_latest_analysis_for_file(file_id: int, request: Request, db: Session = Depends(get_db)):
+    latest = find_latest_analysis(db, file_id=file_id, user_id=FAKE_USER_ID)
     if not latest:
         raise HTTPException(404, "no analysis found")
 
-    return {
-        "id": latest.id,
-        "created_at": str(latest.created_at),
-        "model": latest.model,
-        "status": latest.status,
-        "items": [
-            {
-                "id": r.id,
-                "slideNumber": r.slide_number,
-                "category": r.category,
-                "basis": r.basis,
-                "issue": r.issue,
-                "suggestion": r.suggestion,
-                "correctionType": r.correction_type,
-            }
-            for r in items
-        ],
+    def build() -> dict:
+        return {
+            "id": latest.id,
+            "created_at": str(latest.created_at),
+            "model": latest.model,
+            "status": latest.status,
+            "items": [_item_dict(r) for r in list_analysis_items(db, latest.id)],
+        }
+
+    # 形が異なるので /analyses/{id} とは別のキーで持つ（版は同じ Analysis.version）
+    return _analysis_response(request, latest, ("latest", latest.id), build)
+
+
+def _rule_set_dict(rs: RuleSet, rules: Optional[str] = None) -> dict:
+    d = {
+        "id": rs.id,
+        "name": rs.name,
+        "version": rs.current_version,
+        "created_at": rs.created_at.isoformat(),
+        "updated_at": rs.updated_at.isoformat(),
     }
+    if rules is not None:
+        d["rules"] = rules
+    return d
+
+
+def _own_rule_set(db: Session, rule_set_id: int) -> RuleSet:
+    rs = get_rule_set(db, rule_set_id)
+    if not rs or rs.user_id != FAKE_USER_ID:
+        raise HTTPException(404, "rule set not found")
+    return rs
+
+
+@router.get("/rule-sets")
+def get_rule_sets(db: Session = Depends(get_db)):
+    return [_rule_set_dict(rs) for rs in list_rule_sets(db, user_id=FAKE_USER_ID)]
+
+
+@router.post("/rule-sets")
+def add_rule_set(body: RuleSetCreate, db: Session = Depends(get_db)):
+    rules = body.rules.strip()
+    if not rules:
+        raise HTTPException(400, "rules が空です")
+    rs = create_rule_set(db, user_id=FAKE_USER_ID, name=body.name, rules=rules, version=rules_hash(rules))
+    return _rule_set_dict(rs, rules)
+
+
+@router.get("/rule-sets/{rule_set_id}")
+def get_rule_set_detail(
+    rule_set_id: int,
+    version: Optional[str] = Query(None),  # 省略時は現在の版
+    db: Session = Depends(get_db),
+):
+    rs = _own_rule_set(db, rule_set_id)
+    v = get_rule_set_version(db, rule_set_id=rs.id, version=version or rs.current_version)
+    if not v:
+        raise HTTPException(404, "version not found")
+    d = _rule_set_dict(rs, v.rules)
+    d["version"] = v.version
+    return d
+
+
+@router.get("/rule-sets/{rule_set_id}/versions")
+def get_rule_set_versions(rule_set_id: int, db: Session = Depends(get_db)):
+    rs = _own_rule_set(db, rule_set_id)
+    return [
+        {"version": v.version, "created_at": v.created_at.isoformat(), "current": v.version == rs.current_version}
+        for v in list_rule_set_versions(db, rule_set_id=rs.id)
+    ]
+
+
+@router.patch("/rule-sets/{rule_set_id}")
+def patch_rule_set(rule_set_id: int, body: RuleSetUpdate, db: Session = Depends(get_db)):
+    rs = _own_rule_set(db, rule_set_id)
+    rules = body.rules.strip() if body.rules is not None else None
+    if rules == "":
+        raise HTTPException(400, "rules が空です")
+    rs = update_rule_set(
+        db, rs, name=body.name, rules=rules, version=rules_hash(rules) if rules is not None else None
+    )
+    v = get_rule_set_version(db, rule_set_id=rs.id, version=rs.current_version)
+    return _rule_set_dict(rs, v.rules)
+
+
+@router.delete("/rule-sets/{rule_set_id}")
+def remove_rule_set(rule_set_id: int, db: Session = Depends(get_db)):
+    # 解析結果の rules_version は内容ハッシュなので、削除しても過去の解析はそのまま残る
+    delete_rule_set(db, _own_rule_set(db, rule_set_id))
+    return {"ok": True}
+
+
+_EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+@router.get("/exports/findings")
+def export_findings(
+    format: str = Query("csv"),  # csv | xlsx
+    file_id: Optional[List[int]] = Query(None),
+    date_from: Optional[datetime] = Query(None),  # 解析日時（UTC）の下限（含む）
+    date_to: Optional[datetime] = Query(None),  # 解析日時（UTC）の上限（含まない）
+    category: Optional[List[str]] = Query(None),
+    latest_only: bool = Query(True),  # 各ファイルの最新の解析だけを出す
+):
+    """指摘一覧を CSV / XLSX でストリーミング出力する（行はカーソルから少しずつ読む）。"""
+    if format not in _EXPORT_MEDIA_TYPES:
+        raise HTTPException(400, "format は csv / xlsx のいずれかを指定してください")
+    if date_from and date_to and date_from >= date_to:
+        raise HTTPException(400, "date_from は date_to より前を指定してください")
+
+    # レスポンス送信中もカーソルを読み続けるため、リクエストのセッションとは別に開く
+    def rows():
+        with SessionLocal() as sdb:
+            yield from iter_findings(
+                sdb,
+                user_id=FAKE_USER_ID,
+                file_ids=file_id,
+                date_from=date_from,
+                date_to=date_to,
+                categories=category,
+                latest_only=latest_only,
+            )
+
+    body = iter_csv(rows()) if format == "csv" else iter_xlsx(rows())
+    return StreamingResponse(
+        body,
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="findings.{format}"'},
+    )
@@ -6,7 +6,86 @@ class Settings(BaseSettings):
     ANALYZE_MODE: str = "mock"
     STORAGE_DIR: str = "./storage"
     DB_URL: str = ""
-    
+    GEMINI_MODEL: str = "gemini-2.5-flash"
+
+    # Gemini 呼び出し（共有クライアント・流量制限・再試行・サーキットブレーカー）
+    GEMINI_BASE_URL: str = ""  # 空なら既定のエンドポイント。偽サーバーで試験するときに指定
+    GEMINI_TIMEOUT_SECONDS: float = 120.0
+    GEMINI_RPM: int = 0  # 1 分あたりのリクエスト数上限（0 で無制限）
+    GEMINI_TPM: int = 0  # 1 分あたりの入力トークン数上限（推定値、0 で無制限）
+    GEMINI_MAX_RETRIES: int = 3
+    GEMINI_BACKOFF_BASE_SECONDS: float = 0.5
+    GEMINI_BACKOFF_MAX_SECONDS: float = 8.0
+    GEMINI_BREAKER_THRESHOLD: int = 5  # 0 で無効
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0
+
+    # DB 接続プール（SQLite のメモリ DB では使わない）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 で無効
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+
+    # SQLite 接続時の PRAGMA
+    SQLITE_WAL: bool = True
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # OFF | NORMAL | FULL | EXTRA
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 0 で無効
+
+    # false なら Analysis.result_json を保存せず、参照時に項目行から組み立てる
+    ANALYSIS_STORE_RESULT_JSON: bool = True
+
+    # 解析結果キャッシュ（sha256 + ルール + モデル）
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 1000
+    ANALYSIS_CACHE_MAX_AGE_SECONDS: int = 7 * 24 * 3600
+
+    # PPTX → XML 変換のバックエンド: python-pptx | zip（メディアを読まない高速版、出力は同一）
+    PPTX_BACKEND: str = "python-pptx"
+    PPTX_INCLUDE_NOTES: bool = False  # zip バックエンドのみ: ノートを <Notes> として出力
+
+    # 変換結果（XML）のディスクキャッシュ。既定は STORAGE_DIR/xmlcache
+    XML_CACHE_ENABLED: bool = True
+    XML_CACHE_DIR: str = ""
+    XML_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # /analyze の同時実行数（ワーカープロセスあたり）と PPTX 解析プール
+    ANALYZE_MAX_CONCURRENCY: int = 8
+    PARSE_EXECUTOR: str = "process"  # process | thread
+    PARSE_WORKERS: int = 0  # 0 で CPU コア数
+
+    # スライド単位のシャード並列解析（/analyze の sharded で個別に切替可）
+    ANALYZE_SHARDED: bool = False
+    ANALYZE_SHARD_MAX_CHARS: int = 12000
+    ANALYZE_SHARD_CONCURRENCY: int = 4
+    ANALYZE_SHARD_RETRIES: int = 2
+
+    # 改訂版アップロード時に変更スライドだけを再解析する
+    ANALYZE_INCREMENTAL: bool = True
+
+    # /analyze?async=true のジョブキュー（DB テーブルをキューとして使う）
+    JOB_WORKERS: int = 2  # 0 でこのプロセスではジョブを実行しない
+    JOB_TIMEOUT_SECONDS: int = 600
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 3
+
+    # 既定ルールのうち 2 を辞書でローカル判定して LLM から外し、3・4・8 は辞書/正規表現の候補（任意）を
+    # 先に出したうえで LLM にも判定させる
+    RULE_ENGINE_ENABLED: bool = False
+    RULE_DICTIONARY_PATH: str = ""  # 空なら組み込み辞書（rule_engine.DEFAULT_DICTIONARY）
+
+    # プロンプトの XML を圧縮する（複数スライドに繰り返すテキストを共有化、空の画像要素を削除）
+    PROMPT_COMPACT: bool = True
+    PROMPT_SHARED_MIN_CHARS: int = 20
+    PROMPT_SHARED_MIN_SLIDES: int = 2
+
+    # 解析結果 GET（/analyses/{id}・/files/{id}/analyses/latest）の応答ボディのプロセス内 LRU（0 で無効）
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # 段階ごとの計測（/metrics と Server-Timing ヘッダ）
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: bool = True
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -1,9 +1,13 @@
 # crud.py
-from typing import Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Sequence
 
-from app.models import Analysis, AnalysisItemRow, File
+from app.models import (Analysis, AnalysisCacheEntry, AnalysisItemRow,
+                        AnalysisJob, File, RuleSet, RuleSetVersion,
+                        SlideFingerprint, utcnow)
 from app.services.schemas import AnalysisItem
-from sqlalchemy import select
+from sqlalchemy import (Row, String, and_, delete, func, insert, literal, or_,
+                        select, update)
 from sqlalchemy.orm import Session
 
 
@@ -15,6 +19,7 @@ def create_file(
     path: str,
     sha256: str,
     size_bytes: int,
+    previous_file_id: int | None = None,
 ) -> File:
     f = File(
         user_id=user_id,
@@ -22,6 +27,7 @@ def create_file(
         path=path,
         sha256=sha256,
         size_bytes=size_bytes,
+        previous_file_id=previous_file_id,
     )
     db.add(f)
     db.commit()
@@ -32,9 +38,57 @@ def create_file(
 def get_file(db: Session, file_id: int) -> File | None:
     return db.get(File, file_id)
 
+
+def get_files_by_ids(db: Session, file_ids: Iterable[int]) -> dict[int, File]:
+    """file_id → File（存在するものだけ）を 1 回のクエリで返す。"""
+    ids = list(file_ids)
+    if not ids:
+        return {}
+    return {f.id: f for f in db.execute(select(File).where(File.id.in_(ids))).scalars()}
+
 def list_files(db: Session, user_id: str):
     return db.query(File).filter(File.user_id == user_id).order_by(File.created_at.desc()).all()
 
+def list_files_with_analysis_summary(
+    db: Session,
+    *,
+    user_id: str,
+    limit: int | None = None,
+    after: tuple[datetime, int] | None = None,
+) -> list[tuple[File, bool, bool, datetime | None]]:
+    """ファイル一覧と解析状況（成功した解析の有無・実行中の有無・最新解析日時）を 1 クエリで返す。
+
+    並びは (created_at, id) の降順。after には前ページ最後の (created_at, id) を渡す（キーセットページング）。
+    """
+    # ページ内の行についてだけ評価される相関サブクエリ（analyses の file_id インデックスを使う）
+    own = and_(Analysis.file_id == File.id, Analysis.user_id == user_id)
+    q = (
+        select(
+            File,
+            select(Analysis.id).where(own, Analysis.status == "succeeded").exists(),
+            select(Analysis.id).where(own, Analysis.status.in_(("queued", "running"))).exists(),
+            select(func.max(Analysis.created_at)).where(own).scalar_subquery(),
+        )
+        .where(File.user_id == user_id)
+        .order_by(File.created_at.desc(), File.id.desc())
+    )
+    if after is not None:
+        created_at, file_id = after
+        # 比較値は DB 上の値を使う（SQLite では server_default と Python 側で日時の文字列表現が異なるため）。
+        # その行が削除済みなら、CURRENT_TIMESTAMP と同じ "YYYY-MM-DD HH:MM:SS[.ffffff]" の文字列で比べる
+        anchor = func.coalesce(
+            select(File.created_at).where(File.id == file_id).scalar_subquery(),
+            literal(created_at.isoformat(sep=" "), String),
+        )
+        q = q.where(or_(File.created_at < anchor, and_(File.created_at == anchor, File.id < file_id)))
+    if limit is not None:
+        q = q.limit(limit)
+    return [tuple(row) for row in db.execute(q).all()]
+
+def count_files_by_sha256(db: Session, sha256: str) -> int:
+    q = select(func.count(File.id)).where(File.sha256 == sha256)
+    return db.execute(q).scalar_one()
+
 def delete_file(db: Session, file_id: int) -> None:
     f = db.get(File, file_id)
     if f:
@@ -50,6 +104,7 @@ def create_analysis(
     model: str,
     rules_version: str | None = None,
     result_json: list[dict] | None = None,
+    status: str = "succeeded",
 ) -> Analysis:
     a = Analysis(
         user_id=user_id,
@@ -57,7 +112,7 @@ def create_analysis(
         model=model,
         rules_version=rules_version,
         result_json=result_json,
-        status="succeeded",
+        status=status,
     )
     db.add(a)
     db.commit()
@@ -65,36 +120,205 @@ def create_analysis(
     return a
 
 
+def bump_analysis_version(db: Session, analysis_id: int) -> None:
+    """Analysis.version を 1 増やす（commit はしない）。状態・指摘を変えたら同じトランザクションで呼ぶ。"""
+    db.execute(update(Analysis).where(Analysis.id == analysis_id).values(version=Analysis.version + 1))
+
+
+def _item_params(analysis_id: int, items: Iterable[AnalysisItem]) -> list[dict]:
+    return [
+        {
+            "analysis_id": analysis_id,
+            "slide_number": i.slideNumber,
+            "category": i.category,
+            "basis": i.basis,
+            "issue": i.issue,
+            "suggestion": i.suggestion,
+            "correction_type": i.correctionType or "任意",
+        }
+        for i in items
+    ]
+
+
+def _insert_items(db: Session, analysis_id: int, items: Iterable[AnalysisItem]) -> list[AnalysisItemRow] | None:
+    """1 回の bulk INSERT で項目を追加する（commit はしない）。
+
+    RETURNING に対応した方言（Postgres / SQLite 3.35+）では挿入した行をそのまま返す。
+    未対応なら executemany で挿入して None を返す。
+    """
+    params = _item_params(analysis_id, items)
+    if not params:
+        return []
+    if db.get_bind().dialect.insert_executemany_returning:
+        # sort_by_parameter_order を付けると SQLite では 1 行ずつの INSERT になるため、id 順に並べ直す
+        stmt = insert(AnalysisItemRow).returning(AnalysisItemRow)
+        return sorted(db.scalars(stmt, params).all(), key=lambda r: r.id)
+    db.execute(insert(AnalysisItemRow), params)
+    return None
+
+
 def bulk_create_analysis_items(
     db: Session, *, analysis_id: int, items: Iterable[AnalysisItem]
 ) -> Sequence[AnalysisItemRow]:
-    rows = [
-        AnalysisItemRow(
-            analysis_id=analysis_id,
-            slide_number=i.slideNumber,
-            category=i.category,
-            basis=i.basis,
-            issue=i.issue,
-            suggestion=i.suggestion,
-            correction_type=(i.correctionType or "任意"),
-        )
-        for i in items
-    ]
-    db.add_all(rows)
+    rows = _insert_items(db, analysis_id, items)
+    bump_analysis_version(db, analysis_id)
     db.commit()
+    if rows is not None:
+        return rows
     q = select(AnalysisItemRow).where(AnalysisItemRow.analysis_id == analysis_id).order_by(AnalysisItemRow.id.asc())
     return db.execute(q).scalars().all()
 
 
+# API（AnalysisItemUpdate）のフィールド名 → analysis_items の列名
+_ITEM_COLUMNS = {
+    "slideNumber": "slide_number",
+    "category": "category",
+    "basis": "basis",
+    "issue": "issue",
+    "suggestion": "suggestion",
+    "correctionType": "correction_type",
+}
+
+
+def existing_item_ids(db: Session, *, analysis_id: int, ids: Iterable[int]) -> set[int]:
+    ids = set(ids)
+    if not ids:
+        return set()
+    q = select(AnalysisItemRow.id).where(AnalysisItemRow.analysis_id == analysis_id, AnalysisItemRow.id.in_(ids))
+    return set(db.execute(q).scalars().all())
+
+
+def apply_item_operations(
+    db: Session,
+    *,
+    analysis_id: int,
+    creates: Sequence[AnalysisItem],
+    updates: dict[int, dict],
+    deletes: Iterable[int],
+) -> tuple[list[AnalysisItemRow], list[AnalysisItemRow]]:
+    """項目の作成・更新・削除を 1 トランザクション（commit 1 回）でまとめて適用する。
+
+    updates は id → 変更するフィールド（AnalysisItemUpdate の名前）。削除は 1 文、更新は主キー指定の
+    executemany、作成は bulk INSERT で行うため、文の数は件数によらない。(作成した行, 更新後の行) を返す。
+    """
+    deletes = set(deletes)
+    if deletes:
+        db.execute(
+            delete(AnalysisItemRow).where(AnalysisItemRow.analysis_id == analysis_id, AnalysisItemRow.id.in_(deletes))
+        )
+    params = [
+        {"id": item_id, **{_ITEM_COLUMNS[k]: v for k, v in fields.items()}}
+        for item_id, fields in updates.items()
+        if fields
+    ]
+    if params:
+        db.execute(update(AnalysisItemRow), params)
+    created_ids: list[int] = []
+    if creates:
+        rows = _insert_items(db, analysis_id, creates)
+        if rows is None:
+            # RETURNING 非対応の方言: 同じトランザクション内で今追加した分を id の降順で拾う
+            q = (
+                select(AnalysisItemRow.id)
+                .where(AnalysisItemRow.analysis_id == analysis_id)
+                .order_by(AnalysisItemRow.id.desc())
+                .limit(len(creates))
+            )
+            created_ids = sorted(db.execute(q).scalars().all())
+        else:
+            created_ids = [r.id for r in rows]
+    bump_analysis_version(db, analysis_id)
+    db.commit()
+
+    touched = set(created_ids) | set(updates)
+    if not touched:
+        return [], []
+    # commit で期限切れになった行も含め、1 回の SELECT で読み直す
+    q = select(AnalysisItemRow).where(AnalysisItemRow.id.in_(touched)).order_by(AnalysisItemRow.id.asc())
+    by_id = {r.id: r for r in db.execute(q).scalars().all()}
+    return [by_id[i] for i in created_ids], [by_id[i] for i in updates if i in by_id]
+
+
+def create_analysis_with_items(
+    db: Session,
+    *,
+    user_id: str,
+    file_id: int,
+    model: str,
+    items: Iterable[AnalysisItem],
+    rules_version: str | None = None,
+    result_json: list[dict] | None = None,
+    status: str = "succeeded",
+    fingerprints: dict[int, str] | None = None,
+) -> Analysis:
+    """Analysis・項目・スライド指紋を 1 トランザクション（commit 1 回）で保存する。"""
+    a = Analysis(
+        user_id=user_id,
+        file_id=file_id,
+        model=model,
+        rules_version=rules_version,
+        result_json=result_json,
+        status=status,
+    )
+    db.add(a)
+    db.flush()
+    _insert_items(db, a.id, items)
+    if fingerprints:
+        _add_fingerprints(db, a.id, fingerprints)
+    db.commit()
+    return a
+
+
+def append_analysis_items(
+    db: Session, *, analysis_id: int, items: Iterable[AnalysisItem]
+) -> None:
+    """解析途中の Analysis に項目を追記して commit する（ストリーミング解析用）。"""
+    _insert_items(db, analysis_id, items)
+    bump_analysis_version(db, analysis_id)
+    db.commit()
+
+
+def finish_analysis(
+    db: Session,
+    a: Analysis,
+    *,
+    status: str,
+    model: str | None = None,
+    result_json: list[dict] | None = None,
+    fingerprints: dict[int, str] | None = None,
+) -> None:
+    a.status = status
+    if model:
+        a.model = model
+    if result_json is not None:
+        a.result_json = result_json
+    a.version = Analysis.version + 1
+    if fingerprints:
+        _add_fingerprints(db, a.id, fingerprints)
+    db.commit()
+
+
 def list_analyses_by_file(db: Session, *, file_id: int, user_id: str) -> list[Analysis]:
+    # created_at は秒単位で同時刻になりうるので id で順序を確定する（ix_analyses_file_user_created_id の順）
     q = (
         select(Analysis)
         .where(Analysis.file_id == file_id, Analysis.user_id == user_id)
-        .order_by(Analysis.created_at.desc())
+        .order_by(Analysis.created_at.desc(), Analysis.id.desc())
     )
     return list(db.execute(q).scalars().all())
 
 
+def count_items_by_file(db: Session, *, file_id: int, user_id: str) -> dict[int, int]:
+    """ファイルの解析ごとの指摘数を 1 回の GROUP BY で返す（指摘のない解析はキーに含まれない）。"""
+    q = (
+        select(AnalysisItemRow.analysis_id, func.count())
+        .join(Analysis, Analysis.id == AnalysisItemRow.analysis_id)
+        .where(Analysis.file_id == file_id, Analysis.user_id == user_id)
+        .group_by(AnalysisItemRow.analysis_id)
+    )
+    return dict(db.execute(q).all())
+
+
 def get_analysis_with_items(db: Session, analysis_id: int) -> tuple[Analysis | None, list[AnalysisItemRow]]:
     a = db.get(Analysis, analysis_id)
     if not a:
@@ -104,14 +328,18 @@ def get_analysis_with_items(db: Session, analysis_id: int) -> tuple[Analysis | N
     return a, items
 
 
-def get_latest_analysis(db: Session, file_id: int, user_id: str) -> tuple[Analysis | None, list[AnalysisItemRow]]:
+def find_latest_analysis(db: Session, *, file_id: int, user_id: str) -> Analysis | None:
     q = (
         select(Analysis)
         .where(Analysis.file_id == file_id, Analysis.user_id == user_id)
-        .order_by(Analysis.created_at.desc())
+        .order_by(Analysis.created_at.desc(), Analysis.id.desc())
         .limit(1)
     )
-    latest = db.execute(q).scalar_one_or_none()
+    return db.execute(q).scalar_one_or_none()
+
+
+def get_latest_analysis(db: Session, file_id: int, user_id: str) -> tuple[Analysis | None, list[AnalysisItemRow]]:
+    latest = find_latest_analysis(db, file_id=file_id, user_id=user_id)
     if not latest:
         return None, []
 
@@ -122,3 +350,338 @@ def get_latest_analysis(db: Session, file_id: int, user_id: str) -> tuple[Analys
     )
     items = list(db.execute(q_items).scalars().all())
     return latest, items
+
+
+def iter_findings(
+    db: Session,
+    *,
+    user_id: str,
+    file_ids: Sequence[int] | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    categories: Sequence[str] | None = None,
+    latest_only: bool = True,
+    batch_size: int = 1000,
+) -> Iterator[Row]:
+    """エクスポート用に指摘行を File・Analysis と結合して少しずつ返す（全件をメモリに載せない）。
+
+    Postgres ではサーバーサイドカーソルで batch_size 行ずつ取得する。
+    latest_only なら各ファイルの最新の成功した解析だけを対象にする。
+    """
+    conds = [Analysis.user_id == user_id, Analysis.status == "succeeded"]
+    if file_ids:
+        conds.append(Analysis.file_id.in_(file_ids))
+    if date_from is not None:
+        conds.append(Analysis.created_at >= date_from)
+    if date_to is not None:
+        conds.append(Analysis.created_at < date_to)
+    if latest_only:
+        latest = (
+            select(func.max(Analysis.id))
+            .where(*conds)
+            .group_by(Analysis.file_id)
+        )
+        conds.append(Analysis.id.in_(latest))
+    if categories:
+        conds.append(AnalysisItemRow.category.in_(categories))
+
+    q = (
+        select(
+            File.id.label("file_id"),
+            File.filename,
+            Analysis.id.label("analysis_id"),
+            Analysis.created_at.label("analyzed_at"),
+            Analysis.model,
+            AnalysisItemRow.id.label("item_id"),
+            AnalysisItemRow.slide_number,
+            AnalysisItemRow.category,
+            AnalysisItemRow.basis,
+            AnalysisItemRow.correction_type,
+            AnalysisItemRow.issue,
+            AnalysisItemRow.suggestion,
+        )
+        .join(Analysis, AnalysisItemRow.analysis_id == Analysis.id)
+        .join(File, Analysis.file_id == File.id)
+        .where(*conds)
+        .order_by(Analysis.id.asc(), AnalysisItemRow.id.asc())
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db.execute(q).partitions():
+        yield from partition
+
+
+def get_cached_result(db: Session, *, cache_key: str, max_age_seconds: int) -> list[dict] | None:
+    q = select(AnalysisCacheEntry).where(AnalysisCacheEntry.cache_key == cache_key)
+    entry = db.execute(q).scalar_one_or_none()
+    if not entry:
+        return None
+    now = utcnow()
+    if entry.created_at < now - timedelta(seconds=max_age_seconds):
+        db.delete(entry)
+        db.commit()
+        return None
+    entry.hits += 1
+    entry.last_used_at = now
+    db.commit()
+    return list(entry.result_json)
+
+
+def put_cached_result(
+    db: Session,
+    *,
+    cache_key: str,
+    file_sha256: str,
+    rules_hash: str,
+    model: str,
+    result_json: list[dict],
+) -> None:
+    q = select(AnalysisCacheEntry).where(AnalysisCacheEntry.cache_key == cache_key)
+    entry = db.execute(q).scalar_one_or_none()
+    now = utcnow()
+    if entry:
+        entry.result_json = result_json
+        entry.created_at = now
+        entry.last_used_at = now
+    else:
+        db.add(
+            AnalysisCacheEntry(
+                cache_key=cache_key,
+                file_sha256=file_sha256,
+                rules_hash=rules_hash,
+                model=model,
+                result_json=result_json,
+                created_at=now,
+                last_used_at=now,
+            )
+        )
+    db.commit()
+
+
+def evict_analysis_cache(db: Session, *, max_entries: int, max_age_seconds: int) -> int:
+    """期限切れのエントリを削除し、件数上限を超えた分は最終利用が古い順に削除する。"""
+    cutoff = utcnow() - timedelta(seconds=max_age_seconds)
+    removed = db.execute(
+        delete(AnalysisCacheEntry).where(AnalysisCacheEntry.created_at < cutoff)
+    ).rowcount or 0
+    total = db.execute(select(func.count(AnalysisCacheEntry.id))).scalar_one()
+    overflow = total - max(max_entries, 0)
+    if overflow > 0:
+        oldest = (
+            select(AnalysisCacheEntry.id)
+            .order_by(AnalysisCacheEntry.last_used_at.asc(), AnalysisCacheEntry.id.asc())
+            .limit(overflow)
+        )
+        ids = list(db.execute(oldest).scalars().all())
+        removed += db.execute(
+            delete(AnalysisCacheEntry).where(AnalysisCacheEntry.id.in_(ids))
+        ).rowcount or 0
+    db.commit()
+    return removed
+
+
+def create_analysis_job(
+    db: Session, *, user_id: str, file_id: int, model: str, params: dict, rules_version: str | None = None
+) -> Analysis:
+    a = Analysis(
+        user_id=user_id, file_id=file_id, model=model, status="queued", rules_version=rules_version, result_json=None
+    )
+    a.job = AnalysisJob(status="queued", params=params)
+    db.add(a)
+    db.commit()
+    db.refresh(a)
+    return a
+
+
+def claim_next_job(db: Session) -> AnalysisJob | None:
+    """最も古い queued ジョブを running にして返す。条件付き UPDATE なので複数ワーカーでも二重取得しない。"""
+    while True:
+        q = (
+            select(AnalysisJob.id)
+            .where(AnalysisJob.status == "queued")
+            .order_by(AnalysisJob.id.asc())
+            .limit(1)
+        )
+        job_id = db.execute(q).scalar_one_or_none()
+        if job_id is None:
+            return None
+        now = utcnow()
+        claimed = db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+            .values(status="running", started_at=now, attempts=AnalysisJob.attempts + 1)
+        ).rowcount
+        if claimed:
+            job = db.get(AnalysisJob, job_id)
+            db.execute(
+                update(Analysis)
+                .where(Analysis.id == job.analysis_id)
+                .values(status="running", version=Analysis.version + 1)
+            )
+            db.commit()
+            return job
+        db.rollback()
+
+
+def finish_job(
+    db: Session,
+    job: AnalysisJob,
+    *,
+    status: str,
+    error: str | None = None,
+    model: str | None = None,
+    items: Iterable[AnalysisItem] = (),
+    result_json: list[dict] | None = None,
+    fingerprints: dict[int, str] | None = None,
+) -> None:
+    """ジョブと対応する Analysis を同じトランザクションで終了状態にする。"""
+    job.status = status
+    job.error = error
+    job.finished_at = utcnow()
+    a = db.get(Analysis, job.analysis_id)
+    if a:
+        a.status = status
+        if model:
+            a.model = model
+        if result_json is not None:
+            a.result_json = result_json
+        a.version = Analysis.version + 1
+        _insert_items(db, a.id, items)
+        if fingerprints:
+            _add_fingerprints(db, a.id, fingerprints)
+    db.commit()
+
+
+def recover_stale_jobs(db: Session, *, stale_after_seconds: int, max_attempts: int) -> int:
+    """再起動などで running のまま残ったジョブを queued に戻す（試行回数超過なら failed）。"""
+    cutoff = utcnow() - timedelta(seconds=stale_after_seconds)
+    q = select(AnalysisJob).where(AnalysisJob.status == "running", AnalysisJob.started_at < cutoff)
+    jobs = list(db.execute(q).scalars().all())
+    for job in jobs:
+        retry = job.attempts < max_attempts
+        job.status = "queued" if retry else "failed"
+        job.error = None if retry else "ジョブがタイムアウトまたは中断されました"
+        job.finished_at = None if retry else utcnow()
+        db.execute(
+            update(Analysis)
+            .where(Analysis.id == job.analysis_id)
+            .values(status=job.status, version=Analysis.version + 1)
+        )
+    db.commit()
+    return len(jobs)
+
+
+def _add_fingerprints(db: Session, analysis_id: int, fingerprints: dict[int, str]) -> None:
+    db.execute(
+        insert(SlideFingerprint),
+        [
+            {"analysis_id": analysis_id, "slide_number": n, "content_hash": h}
+            for n, h in sorted(fingerprints.items())
+        ],
+    )
+
+
+def find_base_analysis(db: Session, f: File) -> Analysis | None:
+    """改訂元（previous_file_id）または同名ファイルの、スライド指紋を持つ最新の成功解析を返す。"""
+    q = (
+        select(Analysis)
+        .join(File, Analysis.file_id == File.id)
+        .where(
+            Analysis.user_id == f.user_id,
+            Analysis.status == "succeeded",
+            select(SlideFingerprint.id).where(SlideFingerprint.analysis_id == Analysis.id).exists(),
+        )
+        .order_by(Analysis.created_at.desc(), Analysis.id.desc())
+        .limit(1)
+    )
+    if f.previous_file_id is not None:
+        q = q.where(File.id == f.previous_file_id)
+    else:
+        q = q.where(File.filename == f.filename, File.id != f.id)
+    return db.execute(q).scalar_one_or_none()
+
+
+def get_slide_fingerprints(db: Session, analysis_id: int) -> dict[int, str]:
+    q = select(SlideFingerprint.slide_number, SlideFingerprint.content_hash).where(
+        SlideFingerprint.analysis_id == analysis_id
+    )
+    return {n: h for n, h in db.execute(q).all()}
+
+
+def list_analysis_items(db: Session, analysis_id: int) -> list[AnalysisItemRow]:
+    q = select(AnalysisItemRow).where(AnalysisItemRow.analysis_id == analysis_id).order_by(AnalysisItemRow.id.asc())
+    return list(db.execute(q).scalars().all())
+
+
+def derive_result_json(rows: Iterable[AnalysisItemRow]) -> list[dict]:
+    """result_json を保存しない設定のとき、項目行から同じ形の配列を組み立てる。"""
+    return [
+        {
+            "slideNumber": r.slide_number,
+            "category": r.category,
+            "basis": r.basis,
+            "issue": r.issue,
+            "suggestion": r.suggestion,
+            "correctionType": r.correction_type,
+        }
+        for r in rows
+    ]
+
+
+def create_rule_set(db: Session, *, user_id: str, name: str, rules: str, version: str) -> RuleSet:
+    rs = RuleSet(user_id=user_id, name=name, current_version=version)
+    rs.versions.append(RuleSetVersion(version=version, rules=rules))
+    db.add(rs)
+    db.commit()
+    db.refresh(rs)
+    return rs
+
+
+def get_rule_set(db: Session, rule_set_id: int) -> RuleSet | None:
+    return db.get(RuleSet, rule_set_id)
+
+
+def list_rule_sets(db: Session, *, user_id: str) -> list[RuleSet]:
+    q = select(RuleSet).where(RuleSet.user_id == user_id).order_by(RuleSet.name.asc(), RuleSet.id.asc())
+    return list(db.execute(q).scalars().all())
+
+
+def get_rule_set_version(db: Session, *, rule_set_id: int, version: str) -> RuleSetVersion | None:
+    q = select(RuleSetVersion).where(
+        RuleSetVersion.rule_set_id == rule_set_id, RuleSetVersion.version == version
+    )
+    return db.execute(q).scalar_one_or_none()
+
+
+def list_rule_set_versions(db: Session, *, rule_set_id: int) -> list[RuleSetVersion]:
+    q = (
+        select(RuleSetVersion)
+        .where(RuleSetVersion.rule_set_id == rule_set_id)
+        .order_by(RuleSetVersion.id.desc())
+    )
+    return list(db.execute(q).scalars().all())
+
+
+def update_rule_set(
+    db: Session,
+    rs: RuleSet,
+    *,
+    name: str | None = None,
+    rules: str | None = None,
+    version: str | None = None,
+) -> RuleSet:
+    """名前・本文を更新する。本文の内容ハッシュが変わったときだけ版を追加する（過去と同じ内容なら既存の版に戻す）。"""
+    if name is not None:
+        rs.name = name
+    if rules is not None and version is not None and version != rs.current_version:
+        if get_rule_set_version(db, rule_set_id=rs.id, version=version) is None:
+            db.add(RuleSetVersion(rule_set_id=rs.id, version=version, rules=rules))
+        rs.current_version = version
+    rs.updated_at = utcnow()
+    db.commit()
+    db.refresh(rs)
+    return rs
+
+
+def delete_rule_set(db: Session, rs: RuleSet) -> None:
+    db.delete(rs)
+    db.commit()
@@ -1,33 +1,65 @@
 from pathlib import Path
 
 from app.core.settings import settings
-from app.models import Base
-from sqlalchemy import create_engine, inspect, text
+from app.migrations import migrate
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session, sessionmaker
 
-engine = create_engine(
-    settings.DB_URL,
-    echo=False,
-    future=True,
-    pool_pre_ping=True,
-)
+SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_kwargs(url) -> dict:
+    kwargs = {"echo": False, "future": True, "pool_pre_ping": True}
+    # メモリ DB の SQLite は単一接続のプールになるためサイズ指定は渡さない
+    if not _is_memory_sqlite(url):
+        kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    if url.get_backend_name() == "sqlite":
+        # ドライバ側の待ち時間も busy_timeout に揃える
+        kwargs["connect_args"] = {"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+    return kwargs
+
+
+def _set_sqlite_pragmas(dbapi_conn, _record) -> None:
+    """接続ごとに WAL・synchronous・busy_timeout・mmap を設定する。
+
+    WAL では読み取りが書き込みを待たなくなり、同時編集時の "database is locked" を避けられる。
+    """
+    sync = settings.SQLITE_SYNCHRONOUS.upper()
+    if sync not in SQLITE_SYNCHRONOUS_MODES:
+        sync = "NORMAL"
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        if settings.SQLITE_WAL:
+            cur.execute("PRAGMA journal_mode = WAL")
+        cur.execute(f"PRAGMA synchronous = {sync}")
+        if settings.SQLITE_MMAP_SIZE > 0:
+            cur.execute(f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}")
+    finally:
+        cur.close()
+
+
+_url = make_url(settings.DB_URL)
+engine = create_engine(_url, **_engine_kwargs(_url))
+if _url.get_backend_name() == "sqlite" and not _is_memory_sqlite(_url):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
 def init_db():
     Path(settings.STORAGE_DIR).mkdir(parents=True, exist_ok=True)
-    Base.metadata.create_all(bind=engine)
-    # 既存DBへの軽量マイグレーション（SQLite想定）: analysis_items.correction_type を追加
-    try:
-        inspector = inspect(engine)
-        tables = set(inspector.get_table_names())
-        if "analysis_items" in tables:
-            cols = {c["name"] for c in inspector.get_columns("analysis_items")}
-            if "correction_type" not in cols:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE analysis_items ADD COLUMN correction_type VARCHAR"))
-    except Exception:
-        # 失敗してもアプリ起動は継続（初期環境や権限の問題を考慮）
-        pass
+    # 最新の版なら schema_migrations を 1 回読むだけで終わる。失敗は起動失敗として扱う
+    migrate(engine)
+
 
 def get_db() -> Session:
     db = SessionLocal()
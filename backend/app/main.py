@@ -1,6 +1,10 @@
 # main.py
 from app.api.routes import router
 from app.db import init_db
+from app.services.gemini_client import close_gateway
+from app.services.jobs import start_job_workers, stop_job_workers
+from app.services.metrics import MetricsMiddleware
+from app.services.workers import shutdown_pools
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -9,8 +13,19 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 app.include_router(router)
 
 @app.on_event("startup")
 def _startup():
     init_db()
+
+@app.on_event("startup")
+async def _start_jobs():
+    start_job_workers()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await stop_job_workers()
+    await close_gateway()
+    shutdown_pools()
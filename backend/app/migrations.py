@@ -0,0 +1,128 @@
+"""スキーマの版管理。
+
+適用済みの版を schema_migrations に記録し、起動時は最大版を 1 回読むだけにする
+（最新なら create_all もリフレクションも行わない）。古い版の DB では create_all で
+足りないテーブルを作ってから、未適用のマイグレーションを版の順に 1 件ずつ適用する。
+
+- テーブルの追加は create_all が行うので、MIGRATIONS には版を上げるエントリだけ足す
+- 既存テーブルへの列・インデックスの追加は関数として足す。create_all で作ったばかりの
+  DB にも流れるため、何度実行しても同じ結果になるように書く
+- 複数プロセスが同時に起動しても 1 つずつ適用されるよう、各トランザクションの先頭で
+  ロックを取り（PostgreSQL は advisory lock、SQLite は BEGIN IMMEDIATE）、その中で
+  適用済みかを読み直す
+"""
+import logging
+from typing import Callable
+
+from app.models import Base, SchemaMigration
+from sqlalchemy import Connection, Engine, func, insert, inspect, select, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+
+def _add_column(table: str, column: str, ddl_type: str) -> Callable[[Connection], None]:
+    def run(conn: Connection) -> None:
+        if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+    return run
+
+
+def _create_index(name: str, table: str, columns: str) -> Callable[[Connection], None]:
+    def run(conn: Connection) -> None:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+    return run
+
+
+def _tables_only(conn: Connection) -> None:
+    # create_all 済み
+    pass
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "analysis_items.correction_type", _add_column("analysis_items", "correction_type", "VARCHAR")),
+    (2, "files.previous_file_id", _add_column("files", "previous_file_id", "INTEGER")),
+    (3, "ix_files_user_created_id", _create_index("ix_files_user_created_id", "files", "user_id, created_at, id")),
+    (4, "ix_analyses_file_id", _create_index("ix_analyses_file_id", "analyses", "file_id")),
+    (5, "rule_sets, rule_set_versions", _tables_only),
+    (6, "analyses.version", _add_column("analyses", "version", "INTEGER NOT NULL DEFAULT 0")),
+    (
+        7,
+        "ix_analyses_file_user_created_id",
+        _create_index("ix_analyses_file_user_created_id", "analyses", "file_id, user_id, created_at, id"),
+    ),
+    (8, "ix_analysis_items_analysis_id", _create_index("ix_analysis_items_analysis_id", "analysis_items", "analysis_id")),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# pg_advisory_xact_lock のキー（任意の固定値）
+_ADVISORY_LOCK_KEY = 0x70707478
+
+
+def _lock(conn: Connection) -> None:
+    """トランザクション終了まで他プロセスのマイグレーションを待たせる。"""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+    elif dialect == "sqlite":
+        # pysqlite は DDL の前に BEGIN を出さないので、書き込みロックつきで自前で始める
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _is_applied(conn: Connection, version: int) -> bool:
+    return conn.execute(select(SchemaMigration.version).where(SchemaMigration.version == version)).first() is not None
+
+
+def _applied_by_other(engine: Engine, version: int) -> bool:
+    try:
+        with engine.connect() as conn:
+            return _is_applied(conn, version)
+    except (OperationalError, ProgrammingError):
+        return False
+
+
+def current_version(engine: Engine) -> int | None:
+    """適用済みの最大版。schema_migrations がまだない（初回・版管理導入前の DB）なら None。"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def migrate(engine: Engine) -> int:
+    """未適用のマイグレーションを適用し、適用した件数を返す。"""
+    current = current_version(engine)
+    if current == SCHEMA_VERSION:
+        return 0
+    if current is not None and current > SCHEMA_VERSION:
+        # ローリング更新中に古い版のアプリが起動した場合など。新しい版の DB のまま動かす
+        logger.warning("database schema version %d is newer than this app (%d)", current, SCHEMA_VERSION)
+        return 0
+
+    with engine.begin() as conn:
+        _lock(conn)
+        Base.metadata.create_all(bind=conn)
+    applied = 0
+    for version, name, run in MIGRATIONS:
+        if version <= (current or 0):
+            continue
+        try:
+            with engine.begin() as conn:
+                _lock(conn)
+                if _is_applied(conn, version):
+                    # 同時に起動した別プロセスが先に適用した
+                    continue
+                run(conn)
+                conn.execute(insert(SchemaMigration).values(version=version, name=name))
+        except (IntegrityError, OperationalError, ProgrammingError):
+            # ロックを取れない DB では、先に適用した別プロセスと DDL や記録の挿入がぶつかる。
+            # 記録が読めれば適用済みとして進め、そうでなければ本当の失敗として上げる
+            if _applied_by_other(engine, version):
+                continue
+            raise
+        logger.info("applied schema migration %d (%s)", version, name)
+        applied += 1
+    return applied
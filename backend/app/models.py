@@ -1,13 +1,32 @@
-from sqlalchemy import JSON, DateTime, ForeignKey, Integer, String, Text, func
+from datetime import datetime, timezone
+
+from sqlalchemy import (JSON, DateTime, ForeignKey, Index, Integer, String,
+                        Text, func)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
+def utcnow() -> datetime:
+    # DB 側の now() はタイムゾーン扱いが方言ごとに異なるため、期限判定用の列は naive UTC で揃える
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Base(DeclarativeBase):
     pass
 
 
+class SchemaMigration(Base):
+    """適用済みのスキーマ版（app/migrations.py）。"""
+
+    __tablename__ = "schema_migrations"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (Index("ix_files_user_created_id", "user_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
@@ -15,6 +34,8 @@ class File(Base):
     path: Mapped[str] = mapped_column(String, nullable=False)
     sha256: Mapped[str] = mapped_column(String, nullable=False)
     size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    # 改訂版としてアップロードされた場合の元ファイル
+    previous_file_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
 
     analyses: Mapped[list["Analysis"]] = relationship(back_populates="file", cascade="all,delete")
@@ -22,25 +43,31 @@ class File(Base):
 
 class Analysis(Base):
     __tablename__ = "analyses"
+    # ファイルごとの解析一覧・最新の解析（file_id, user_id で絞って created_at, id の降順）
+    __table_args__ = (Index("ix_analyses_file_user_created_id", "file_id", "user_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
-    file_id: Mapped[int] = mapped_column(ForeignKey("files.id"))
+    file_id: Mapped[int] = mapped_column(ForeignKey("files.id"), index=True)
     status: Mapped[str] = mapped_column(String, default="succeeded")
     model: Mapped[str] = mapped_column(String, nullable=False)
     rules_version: Mapped[str | None] = mapped_column(String, nullable=True)
     result_json: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[str] = mapped_column(DateTime, server_default=func.now())
+    # 状態・指摘が変わるたびに 1 増やす（ETag と応答キャッシュの検証に使う）
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     file: Mapped[File] = relationship(back_populates="analyses")
     items: Mapped[list["AnalysisItemRow"]] = relationship(back_populates="analysis", cascade="all,delete")
+    job: Mapped["AnalysisJob | None"] = relationship(back_populates="analysis", cascade="all,delete")
+    slides: Mapped[list["SlideFingerprint"]] = relationship(cascade="all,delete")
 
 
 class AnalysisItemRow(Base):
     __tablename__ = "analysis_items"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    analysis_id: Mapped[int] = mapped_column(ForeignKey("analyses.id"))
+    analysis_id: Mapped[int] = mapped_column(ForeignKey("analyses.id"), index=True)
     slide_number: Mapped[int] = mapped_column(Integer, nullable=False)
     category: Mapped[str] = mapped_column(String, nullable=False)
     basis: Mapped[str] = mapped_column(Text, nullable=False)
@@ -49,3 +76,70 @@ class AnalysisItemRow(Base):
     correction_type: Mapped[str | None] = mapped_column(String, nullable=True)
 
     analysis: Mapped["Analysis"] = relationship(back_populates="items")
+
+
+class RuleSet(Base):
+    """名前付きのチェックルール。内容が変わるたびに RuleSetVersion を追加し、current_version を差し替える。"""
+
+    __tablename__ = "rule_sets"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    # 現在のルール本文の内容ハッシュ（rule_set_versions.version）
+    current_version: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+    versions: Mapped[list["RuleSetVersion"]] = relationship(cascade="all,delete")
+
+
+class RuleSetVersion(Base):
+    __tablename__ = "rule_set_versions"
+    __table_args__ = (Index("ux_rule_set_versions_set_version", "rule_set_id", "version", unique=True),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    rule_set_id: Mapped[int] = mapped_column(ForeignKey("rule_sets.id", ondelete="CASCADE"), nullable=False)
+    # 正規化したルール本文の sha256（analyses.rules_version・キャッシュキーと同じ値）
+    version: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    rules: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+
+
+class SlideFingerprint(Base):
+    __tablename__ = "slide_fingerprints"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    analysis_id: Mapped[int] = mapped_column(ForeignKey("analyses.id", ondelete="CASCADE"), index=True)
+    slide_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    content_hash: Mapped[str] = mapped_column(String, nullable=False)
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    analysis_id: Mapped[int] = mapped_column(ForeignKey("analyses.id", ondelete="CASCADE"), unique=True, index=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued", index=True)
+    params: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    analysis: Mapped["Analysis"] = relationship(back_populates="job")
+
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    cache_key: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)
+    file_sha256: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    rules_hash: Mapped[str] = mapped_column(String, nullable=False)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    result_json: Mapped[list] = mapped_column(JSON, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=utcnow, index=True)
@@ -1,10 +1,21 @@
+import asyncio
 import json
-from typing import List
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, List
+from xml.etree import ElementTree as ET
 
 from app.core.settings import settings
+from app.services.gemini_client import CircuitOpenError, get_gateway, is_retryable
+from app.services.metrics import LLM_REQUESTS, LLM_TOKENS, PROMPT_TOKENS, stage
+from app.services.prompt_compact import compact_xml, estimate_tokens
 from app.services.schemas import AnalysisItem
-from google import genai
-from google.genai import types
+from starlette.concurrency import run_in_threadpool
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_RULES = """
 1. 誤字脱字の確認と修正提案
@@ -18,46 +29,197 @@ DEFAULT_RULES = """
 9. 一般生活者向け広告表現の禁止（一般用医薬品等を除く）
 """.strip()
 
+# ルール本文（= ルールセットの版）ごとに一度だけ組み立てて使い回す
+@lru_cache(maxsize=128)
+def _prompt_prefix(rules: str, shared: bool) -> str:
+    """XML より前の固定部分。呼び出しごとに同じ文字列になるよう XML は末尾に置く。"""
+    shared_note = (
+        "- <Shared> の <Text id> は複数スライドに共通するテキスト。スライド内の <Text ref> は同じ id のテキストがそのスライドにあることを示す\n"
+        if shared
+        else ""
+    )
+    return (
+        "あなたは医療・製薬・ヘルスケア資料を審査するコンプライアンス担当者です。\n"
+        "薬機法および以下の「チェック対象ルール」に照らし、違反または懸念箇所を指摘してください。\n\n"
+        f"## チェック対象ルール\n{rules}\n\n"
+        "### 指摘カテゴリ\n"
+        "- 誤植 : 誤字脱字\n"
+        "- 表現 : 表現規制・薬機法違反の可能性\n"
+        "- 出典 : 出典および作成者情報が両方欠如\n\n"
+        "### 出力要件\n"
+        "- JSON 配列のみを返す（テキスト装飾・説明文は禁止）\n"
+        "- スキーマ: slideNumber, category, basis, issue, suggestion\n"
+        "- slideNumber は XML の number 属性と一致させる\n"
+        "- basis には違反根拠となるルール番号または薬機法条文を含める\n"
+        f"{shared_note}\n"
+        "## スライド XML\n"
+    )
+
 def _build_prompt(xml_str: str, rules: str) -> str:
-    return f"""
-    あなたは医療・製薬・ヘルスケア資料を審査するコンプライアンス担当者です。
-    薬機法および以下の「チェック対象ルール」に照らし、違反または懸念箇所を指摘してください。
+    if settings.PROMPT_COMPACT:
+        compacted = compact_xml(
+            xml_str, min_chars=settings.PROMPT_SHARED_MIN_CHARS, min_slides=settings.PROMPT_SHARED_MIN_SLIDES
+        )
+        if settings.METRICS_ENABLED:
+            PROMPT_TOKENS.inc("xml_raw", amount=estimate_tokens(xml_str))
+            PROMPT_TOKENS.inc("xml_sent", amount=estimate_tokens(compacted))
+        xml_str = compacted
+    return _prompt_prefix(rules, xml_str.startswith("<Document><Shared>")) + xml_str
 
-    ## チェック対象ルール
-    {rules}
+def _generate_config() -> "types.GenerateContentConfig":
+    # google.genai は読み込みが重いので、起動時ではなく最初の LLM 呼び出しで import する
+    from google.genai import types
 
-    ## スライド XML
-    {xml_str}
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=0),
+        temperature=0.1,
+        response_mime_type="application/json",
+        response_schema=list[AnalysisItem],
+    )
 
-    ### 指摘カテゴリ
-    - 誤植 : 誤字脱字
-    - 表現 : 表現規制・薬機法違反の可能性
-    - 出典 : 出典および作成者情報が両方欠如
+def _record_usage(resp) -> None:
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        n = getattr(usage, attr, None)
+        if n:
+            LLM_TOKENS.inc(settings.GEMINI_MODEL, kind, amount=n)
 
-    ### 出力要件
-    - JSON 配列のみを返す（テキスト装飾・説明文は禁止）
-    - スキーマ: slideNumber, category, basis, issue, suggestion
-    - slideNumber は XML の number 属性と一致させる
-    - basis には違反根拠となるルール番号または薬機法条文を含める
-    """.strip()
+def _parse_response(resp) -> List[AnalysisItem]:
+    if getattr(resp, "parsed", None):
+        return resp.parsed  # list[AnalysisItem]
+    data = json.loads(resp.text)
+    return [AnalysisItem.model_validate(i) for i in data]
 
 def analyze_xml(xml_str: str, rules: str | None = None) -> List[AnalysisItem]:
     if not settings.GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY is not set")
-    client = genai.Client(api_key=settings.GEMINI_API_KEY)
-    prompt = _build_prompt(xml_str, rules.strip() if rules else DEFAULT_RULES)
-    resp = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=0),
-            temperature=0.1,
-            response_mime_type="application/json",
-            response_schema=list[AnalysisItem],
-        ),
-    )
+    with stage("prompt"):
+        prompt = _build_prompt(xml_str, rules.strip() if rules else DEFAULT_RULES)
+    try:
+        with stage("gemini"):
+            resp = get_gateway().generate_sync(
+                model=settings.GEMINI_MODEL,
+                contents=prompt,
+                config=_generate_config(),
+                prompt_tokens=estimate_tokens(prompt),
+            )
+    except CircuitOpenError:
+        LLM_REQUESTS.inc(settings.GEMINI_MODEL, "circuit_open")
+        raise
+    except Exception:
+        LLM_REQUESTS.inc(settings.GEMINI_MODEL, "error")
+        raise
+    LLM_REQUESTS.inc(settings.GEMINI_MODEL, "ok")
+    _record_usage(resp)
+    return _parse_response(resp)
 
-    if getattr(resp, "parsed", None):
-        return resp.parsed  # list[AnalysisItem]
-    data = json.loads(resp.text)
-    return [AnalysisItem.model_validate(i) for i in data]
+async def analyze_xml_async(xml_str: str, rules: str | None = None) -> List[AnalysisItem]:
+    """analyze_xml の非同期版。イベントループをブロックしない aio クライアントを使う。"""
+    if not settings.GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY is not set")
+    with stage("prompt"):
+        # XML の圧縮（compact_xml）は大きなデッキで数十 ms かかるのでスレッドで行う
+        prompt = await run_in_threadpool(_build_prompt, xml_str, rules.strip() if rules else DEFAULT_RULES)
+    try:
+        with stage("gemini"):
+            resp = await get_gateway().generate(
+                model=settings.GEMINI_MODEL,
+                contents=prompt,
+                config=_generate_config(),
+                prompt_tokens=estimate_tokens(prompt),
+            )
+    except CircuitOpenError:
+        LLM_REQUESTS.inc(settings.GEMINI_MODEL, "circuit_open")
+        raise
+    except Exception:
+        LLM_REQUESTS.inc(settings.GEMINI_MODEL, "error")
+        raise
+    LLM_REQUESTS.inc(settings.GEMINI_MODEL, "ok")
+    _record_usage(resp)
+    return _parse_response(resp)
+
+
+def split_xml_by_slides(xml_str: str, max_chars: int) -> List[str]:
+    """コンバータ出力の <Document> をスライド単位でまとめ、文字数予算ごとのシャードに分割する。
+
+    各シャードは元の <Slide number=...> をそのまま保持するため slideNumber は元の番号と一致する。
+    予算を超える単一スライドはそれだけで 1 シャードになる。
+    """
+    root = ET.fromstring(xml_str.encode("utf-8") if isinstance(xml_str, str) else xml_str)
+    shards: List[List[ET.Element]] = []
+    current: List[ET.Element] = []
+    size = 0
+    for slide in root.findall("Slide"):
+        n = len(ET.tostring(slide, encoding="unicode"))
+        if current and size + n > max_chars:
+            shards.append(current)
+            current, size = [], 0
+        current.append(slide)
+        size += n
+    if current:
+        shards.append(current)
+
+    out = []
+    for slides in shards:
+        doc = ET.Element("Document")
+        doc.extend(slides)
+        out.append(ET.tostring(doc, encoding="unicode"))
+    return out
+
+async def iter_xml_shards(
+    xml_str: str,
+    rules: str | None = None,
+    *,
+    max_chars: int,
+    concurrency: int,
+    retries: int,
+) -> AsyncIterator[List[AnalysisItem]]:
+    """スライドをシャードに分けて並列に解析し、完了したシャードから順に結果を返す。
+
+    一時的な障害（429・5xx・通信エラー）で失敗したシャードはそのシャードだけを最大 ``retries`` 回
+    再試行する。出力の検証エラーやプログラムの誤りは再試行しても同じ結果になるのでそのまま上げる。
+    途中で打ち切られた場合は残りのシャードをキャンセルする。
+    """
+    shards = split_xml_by_slides(xml_str, max_chars)
+    sem = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(idx: int, shard: str) -> List[AnalysisItem]:
+        async with sem:
+            for attempt in range(retries + 1):
+                try:
+                    return await analyze_xml_async(shard, rules)
+                except Exception as e:
+                    if attempt >= retries or not is_retryable(e):
+                        raise
+                    logger.warning("shard %d/%d failed (attempt %d): %s", idx + 1, len(shards), attempt + 1, e)
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+        return []
+
+    tasks = [asyncio.ensure_future(run(i, s)) for i, s in enumerate(shards)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+async def analyze_xml_sharded(
+    xml_str: str,
+    rules: str | None = None,
+    *,
+    max_chars: int,
+    concurrency: int,
+    retries: int,
+) -> List[AnalysisItem]:
+    """スライドをシャードに分けて並列に解析し、結果をスライド順にマージする。"""
+    merged: List[AnalysisItem] = []
+    async for items in iter_xml_shards(
+        xml_str, rules, max_chars=max_chars, concurrency=concurrency, retries=retries
+    ):
+        merged.extend(items)
+    # シャード内の出力順は保ったままスライド番号で安定ソート
+    merged.sort(key=lambda i: i.slideNumber)
+    return merged
@@ -0,0 +1,19 @@
+import hashlib
+
+from app.services.analysis import DEFAULT_RULES
+
+
+def normalize_rules(rules: str | None) -> str:
+    # 空行・行頭末尾の空白の違いだけでキャッシュが外れないように正規化する
+    text = rules.strip() if rules and rules.strip() else DEFAULT_RULES
+    lines = [" ".join(ln.split()) for ln in text.splitlines()]
+    return "\n".join(ln for ln in lines if ln)
+
+
+def rules_hash(rules: str | None) -> str:
+    return hashlib.sha256(normalize_rules(rules).encode("utf-8")).hexdigest()
+
+
+def cache_key(file_sha256: str, rules: str | None, model: str) -> str:
+    raw = f"{file_sha256}:{rules_hash(rules)}:{model}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
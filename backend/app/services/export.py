@@ -0,0 +1,223 @@
+"""指摘一覧のエクスポート（CSV / XLSX）。
+
+行は crud.iter_findings から少しずつ受け取り、どちらも書いた分から小さな塊で返す。
+XLSX はシート XML を ZIP へ逐次圧縮して書くので、全体を書き終える前に最初のバイトが出る
+（大量の行でもプロキシのタイムアウトに掛からない）。どちらも結果全体をメモリに持たない。
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+
+EXPORT_COLUMNS = [
+    ("file_id", "ファイルID"),
+    ("filename", "ファイル名"),
+    ("analysis_id", "解析ID"),
+    ("analyzed_at", "解析日時"),
+    ("model", "モデル"),
+    ("item_id", "指摘ID"),
+    ("slide_number", "スライド"),
+    ("category", "カテゴリ"),
+    ("basis", "根拠"),
+    ("correction_type", "修正区分"),
+    ("issue", "指摘内容"),
+    ("suggestion", "修正案"),
+]
+
+CHUNK_SIZE = 1024 * 1024
+# Excel の 1 シートの最大行数（見出し行を含む）
+XLSX_MAX_ROWS = 1_048_576
+
+
+def _values(row) -> list:
+    m = row._mapping
+    return [m[key] for key, _ in EXPORT_COLUMNS]
+
+
+def iter_csv(rows: Iterable, *, flush_rows: int = 2000) -> Iterator[bytes]:
+    """Excel でそのまま開けるよう BOM 付き UTF-8 で返す。"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([label for _, label in EXPORT_COLUMNS])
+    yield buf.getvalue().encode("utf-8-sig")
+    buf.seek(0)
+    buf.truncate()
+    for n, row in enumerate(rows, 1):
+        values = _values(row)
+        if values[3] is not None:
+            values[3] = values[3].isoformat(sep=" ", timespec="seconds")
+        writer.writerow(values)
+        if n % flush_rows == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+_XLSX_MEDIA = "application/vnd.openxmlformats-officedocument"
+_XLSX_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+# XML 1.0 で使えない制御文字（セルに入っていると Excel が開けない）
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+
+class _Sink:
+    """ZipFile の書き込み先。書かれたバイトを溜めておき take() で取り出す（シークしない）。"""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _col(idx: int) -> str:
+    name = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        name = chr(65 + rem) + name
+    return name
+
+
+_COLS = [_col(i) for i in range(len(EXPORT_COLUMNS))]
+
+
+def _cell(ref: str, value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        # 日時はシリアル値 + 日時の表示形式（styles.xml の s="1"）
+        serial = (value.replace(tzinfo=None) - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}" s="1"><v>{serial:.10f}</v></c>'
+    text = escape(_ILLEGAL_XML.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row_xml(n: int, values: list) -> str:
+    return f'<row r="{n}">' + "".join(_cell(f"{c}{n}", v) for c, v in zip(_COLS, values)) + "</row>"
+
+
+def _package_parts(sheets: list[str]) -> dict[str, str]:
+    """シート以外の XLSX の部品（シート数が決まってから書く）。"""
+    overrides = "".join(
+        f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+        f'ContentType="{_XLSX_MEDIA}.spreadsheetml.worksheet+xml"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+    sheet_refs = "".join(
+        f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>' for i, name in enumerate(sheets, 1)
+    )
+    sheet_rels = "".join(
+        f'<Relationship Id="rId{i}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+        for i in range(1, len(sheets) + 1)
+    )
+    styles_rel = len(sheets) + 1
+    head = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    return {
+        "[Content_Types].xml": head
+        + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        f'<Override PartName="/xl/workbook.xml" ContentType="{_XLSX_MEDIA}.spreadsheetml.sheet.main+xml"/>'
+        f'<Override PartName="/xl/styles.xml" ContentType="{_XLSX_MEDIA}.spreadsheetml.styles+xml"/>'
+        f"{overrides}</Types>",
+        "_rels/.rels": head
+        + f'<Relationships xmlns="{_PKG_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>",
+        "xl/workbook.xml": head
+        + f'<workbook xmlns="{_XLSX_NS}" xmlns:r="{_REL_NS}"><sheets>{sheet_refs}</sheets></workbook>',
+        "xl/_rels/workbook.xml.rels": head
+        + f'<Relationships xmlns="{_PKG_REL_NS}">{sheet_rels}'
+        f'<Relationship Id="rId{styles_rel}" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        "</Relationships>",
+        # s="0" は標準、s="1" は日時（組み込みの表示形式 22: yyyy/m/d h:mm）
+        "xl/styles.xml": head
+        + f'<styleSheet xmlns="{_XLSX_NS}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        "</styleSheet>",
+    }
+
+
+def iter_xlsx(rows: Iterable, *, flush_rows: int = 2000) -> Iterator[bytes]:
+    """シート XML を ZIP へ逐次圧縮しながら書き、flush_rows 行ごとにそこまでのバイトを返す。
+
+    出力先はシークしないので、各エントリのサイズと CRC はデータの後ろ（data descriptor）に書かれる。
+    1 シートの行数上限を超える分は次のシートに続ける。
+    """
+    header = [label for _, label in EXPORT_COLUMNS]
+    sink = _Sink()
+    zf = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED)
+    sheets: list[str] = []
+    ws = None
+
+    def open_sheet():
+        sheets.append("findings" if not sheets else f"findings{len(sheets) + 1}")
+        # 100 万行のシートは 4 GiB を超えうるので ZIP64 で書く
+        fh = zf.open(f"xl/worksheets/sheet{len(sheets)}.xml", "w", force_zip64=True)
+        fh.write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<worksheet xmlns="{_XLSX_NS}"><sheetData>{_row_xml(1, header)}'.encode("utf-8")
+        )
+        return fh
+
+    def close_sheet(fh) -> None:
+        fh.write(b"</sheetData></worksheet>")
+        fh.close()
+
+    try:
+        ws = open_sheet()
+        used = 1
+        pending: list[str] = []
+        for n, row in enumerate(rows, 1):
+            if used >= XLSX_MAX_ROWS:
+                ws.write("".join(pending).encode("utf-8"))
+                pending.clear()
+                close_sheet(ws)
+                ws = open_sheet()
+                used = 1
+            used += 1
+            pending.append(_row_xml(used, _values(row)))
+            if n % flush_rows == 0:
+                ws.write("".join(pending).encode("utf-8"))
+                pending.clear()
+                data = sink.take()
+                if data:
+                    yield data
+        ws.write("".join(pending).encode("utf-8"))
+        close_sheet(ws)
+        ws = None
+        for name, xml in _package_parts(sheets).items():
+            zf.writestr(name, xml)
+        zf.close()
+        yield sink.take()
+    finally:
+        if ws is not None:
+            ws.close()
@@ -0,0 +1,225 @@
+"""プロセス共通の Gemini クライアントと、その呼び出しの保護（流量制限・再試行・サーキットブレーカー）。
+
+- クライアントは 1 つを使い回し、HTTP のコネクションプールを再利用する
+- GEMINI_RPM / GEMINI_TPM（0 で無制限）のトークンバケットで送信前に待つ
+- 429・5xx・通信エラーは指数バックオフ（フルジッター）で GEMINI_MAX_RETRIES 回まで再試行する
+- 再試行し尽くした失敗が GEMINI_BREAKER_THRESHOLD 回続くと GEMINI_BREAKER_RESET_SECONDS の間は
+  呼び出さずに CircuitOpenError を返し、その後 1 件だけ試して回復を確認する
+
+GEMINI_BASE_URL を指定するとローカルの偽サーバー（benchmarks/fake_gemini.py）に向けられる。
+google.genai は import に 0.3 秒ほどかかるため、起動を遅くしないよう使う時点で読み込む。
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from app.core.settings import settings
+from app.services.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+RETRIES = Counter("rulecheck_llm_retries_total", "Gemini calls retried after a transient error.", ("reason",))
+BREAKER_STATE = Gauge("rulecheck_llm_circuit_open", "1 while the Gemini circuit breaker is open.")
+RATE_LIMIT_WAIT = Counter("rulecheck_llm_rate_limit_wait_seconds_total", "Time spent waiting for the client-side rate limiter.")
+
+
+class CircuitOpenError(RuntimeError):
+    """Gemini の障害が続いているため呼び出しを行わずに失敗させた。"""
+
+
+class TokenBucket:
+    """1 分あたり per_minute 単位を補充するトークンバケット（容量も per_minute）。"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """amount を予約し、送信まで待つべき秒数を返す（前借りした分は後続の待ち時間になる）。"""
+        if self.per_minute <= 0:
+            return 0.0
+        amount = min(amount, self.per_minute)
+        with self._lock:
+            now = time.monotonic()
+            rate = self.per_minute / 60.0
+            self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / rate
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def before_call(self) -> None:
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            # 確認中の呼び出しがキャンセル等で戻らなかった場合に備え、確認も reset_seconds で打ち切る
+            probing = self._probing and now - self._probe_started < self.reset_seconds
+            if now - self._opened_at < self.reset_seconds or probing:
+                raise CircuitOpenError("Gemini circuit breaker is open")
+            # half-open: 1 件だけ通して回復を確認する
+            self._probing = True
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+        BREAKER_STATE.set(0)
+
+    def record_failure(self) -> None:
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning("Gemini circuit breaker opened after %d failures", self._failures)
+                self._opened_at = time.monotonic()
+                self._probing = False
+                BREAKER_STATE.set(1)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    import httpx
+    from google.genai import errors
+
+    if isinstance(exc, errors.APIError):
+        return exc.code == 429 or (exc.code or 0) >= 500
+    return isinstance(exc, (httpx.TransportError, asyncio.TimeoutError, TimeoutError))
+
+
+def backoff_seconds(attempt: int) -> float:
+    cap = min(settings.GEMINI_BACKOFF_MAX_SECONDS, settings.GEMINI_BACKOFF_BASE_SECONDS * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+class GeminiGateway:
+    """共有クライアントに流量制限・再試行・サーキットブレーカーを掛けて generate_content を呼ぶ。"""
+
+    def __init__(self):
+        from google import genai
+        from google.genai import types
+
+        http_options = types.HttpOptions(
+            base_url=settings.GEMINI_BASE_URL or None,
+            timeout=int(settings.GEMINI_TIMEOUT_SECONDS * 1000) if settings.GEMINI_TIMEOUT_SECONDS > 0 else None,
+        )
+        self.client = genai.Client(api_key=settings.GEMINI_API_KEY, http_options=http_options)
+        self.requests = TokenBucket(settings.GEMINI_RPM)
+        self.tokens = TokenBucket(settings.GEMINI_TPM)
+        self.breaker = CircuitBreaker(settings.GEMINI_BREAKER_THRESHOLD, settings.GEMINI_BREAKER_RESET_SECONDS)
+
+    def _wait_for(self, prompt_tokens: int) -> float:
+        wait = max(self.requests.reserve(1), self.tokens.reserve(prompt_tokens))
+        if wait > 0:
+            RATE_LIMIT_WAIT.inc(amount=wait)
+        return wait
+
+    def _on_error(self, exc: Exception, attempt: int) -> float | None:
+        """再試行するならその待ち秒数を、しないなら None を返す。"""
+        if not is_retryable(exc):
+            # 4xx などは Gemini 自体は応答しているので障害として数えない
+            self.breaker.record_success()
+            return None
+        if attempt >= settings.GEMINI_MAX_RETRIES:
+            self.breaker.record_failure()
+            return None
+        from google.genai import errors
+
+        reason = str(exc.code) if isinstance(exc, errors.APIError) else type(exc).__name__
+        RETRIES.inc(reason)
+        delay = backoff_seconds(attempt)
+        logger.warning("Gemini call failed (%s); retry %d in %.2fs", reason, attempt + 1, delay)
+        return delay
+
+    async def generate(self, *, model: str, contents: str, config, prompt_tokens: int = 0):
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            wait = self._wait_for(prompt_tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                resp = await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return resp
+
+    def generate_sync(self, *, model: str, contents: str, config, prompt_tokens: int = 0):
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            wait = self._wait_for(prompt_tokens)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                resp = self.client.models.generate_content(model=model, contents=contents, config=config)
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return resp
+
+
+_gateway: GeminiGateway | None = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> GeminiGateway:
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = GeminiGateway()
+        return _gateway
+
+
+async def close_gateway() -> None:
+    """共有クライアントの HTTP 接続を閉じる（シャットダウン時・設定変更後）。"""
+    global _gateway
+    with _gateway_lock:
+        gw, _gateway = _gateway, None
+    if gw is not None:
+        try:
+            await gw.client.aio.aclose()
+        except Exception:
+            logger.debug("failed to close Gemini client", exc_info=True)
+        try:
+            gw.client.close()
+        except Exception:
+            logger.debug("failed to close Gemini client", exc_info=True)
@@ -0,0 +1,57 @@
+import hashlib
+from dataclasses import dataclass, field
+from xml.etree import ElementTree as ET
+
+
+@dataclass
+class SlidePlan:
+    # 新スライド番号 → 旧スライド番号（指摘を引き継ぐスライド）
+    reused: dict[int, int] = field(default_factory=dict)
+    # LLM に送るスライド番号（変更・追加されたもの）
+    changed: list[int] = field(default_factory=list)
+
+
+def _parse(xml_str: str) -> ET.Element:
+    return ET.fromstring(xml_str.encode("utf-8") if isinstance(xml_str, str) else xml_str)
+
+
+def slide_fingerprints(xml_str: str, salt: str = "") -> dict[int, str]:
+    """コンバータ出力の各 <Slide> についてテキストと画像キャプションから内容ハッシュを作る。
+
+    salt にはルールとモデルを渡し、条件の違う解析同士で指摘を使い回さないようにする。
+    """
+    out: dict[int, str] = {}
+    for slide in _parse(xml_str).findall("Slide"):
+        h = hashlib.sha256(salt.encode("utf-8"))
+        for el in slide:
+            if el.tag == "Text":
+                h.update(b"\x1eT" + (el.text or "").encode("utf-8"))
+            elif el.tag == "Image":
+                h.update(b"\x1eI" + (el.get("caption") or "").encode("utf-8"))
+        out[int(slide.get("number"))] = h.hexdigest()
+    return out
+
+
+def plan_slides(new: dict[int, str], old: dict[int, str]) -> SlidePlan:
+    # 同じ内容のスライドが複数ある場合は番号の近いものを優先して対応付ける
+    by_hash: dict[str, list[int]] = {}
+    for num, digest in sorted(old.items()):
+        by_hash.setdefault(digest, []).append(num)
+    plan = SlidePlan()
+    for num, digest in sorted(new.items()):
+        candidates = by_hash.get(digest)
+        if candidates:
+            best = min(candidates, key=lambda n: abs(n - num))
+            candidates.remove(best)
+            plan.reused[num] = best
+        else:
+            plan.changed.append(num)
+    return plan
+
+
+def subset_xml(xml_str: str, numbers: list[int]) -> str:
+    """指定スライドだけを含む <Document> を返す（number 属性は元のまま）。"""
+    wanted = {str(n) for n in numbers}
+    doc = ET.Element("Document")
+    doc.extend(s for s in _parse(xml_str).findall("Slide") if s.get("number") in wanted)
+    return ET.tostring(doc, encoding="unicode")
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+
+from app.core.settings import settings
+from app.crud import claim_next_job, finish_job, get_file, recover_stale_jobs
+from app.db import SessionLocal
+from app.models import Analysis, AnalysisJob, File
+from app.services.pipeline import AnalysisError, run_analysis
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# 実行中ジョブがタイムアウトした後、回収対象とみなすまでの猶予
+STALE_GRACE_SECONDS = 60
+
+_tasks: list[asyncio.Task] = []
+_wakeup: asyncio.Event | None = None
+_stopping = False
+
+
+def notify_new_job() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def recover_jobs() -> int:
+    with SessionLocal() as db:
+        n = recover_stale_jobs(
+            db,
+            stale_after_seconds=settings.JOB_TIMEOUT_SECONDS + STALE_GRACE_SECONDS,
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+        )
+    if n:
+        logger.warning("recovered %d stale analysis job(s)", n)
+    return n
+
+
+# ジョブワーカーは HTTP と同じイベントループで動くため、DB 操作はすべてスレッドで行う
+# （SQLite の busy_timeout 待ちや大量の指摘の INSERT で /health や他のリクエストを止めない）
+
+
+def _claim() -> int | None:
+    with SessionLocal() as db:
+        job = claim_next_job(db)
+        return job.id if job is not None else None
+
+
+def _load(db: Session, job_id: int) -> tuple[AnalysisJob, File] | None:
+    job = db.get(AnalysisJob, job_id)
+    a = db.get(Analysis, job.analysis_id) if job else None
+    f = get_file(db, a.file_id) if a else None
+    if not a or not f:
+        return None
+    return job, f
+
+
+def _fail(job_id: int, error: str) -> None:
+    with SessionLocal() as db:
+        job = db.get(AnalysisJob, job_id)
+        if job is not None:
+            finish_job(db, job, status="failed", error=error)
+
+
+async def _execute(job_id: int) -> None:
+    db = SessionLocal()
+    try:
+        loaded = await run_in_threadpool(_load, db, job_id)
+        if loaded is None:
+            await run_in_threadpool(_fail, job_id, "file not found")
+            return
+        job, f = loaded
+        p = job.params or {}
+        try:
+            outcome = await asyncio.wait_for(
+                run_analysis(
+                    db,
+                    f,
+                    rules=p.get("rules"),
+                    mode=p.get("mode"),
+                    force=bool(p.get("force")),
+                    sharded=p.get("sharded"),
+                    incremental=p.get("incremental"),
+                ),
+                timeout=settings.JOB_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            error = f"timeout after {settings.JOB_TIMEOUT_SECONDS}s"
+        except AnalysisError as e:
+            error = e.detail
+        except Exception as e:
+            logger.exception("analysis job %s failed", job_id)
+            error = str(e)
+        else:
+            await run_in_threadpool(
+                finish_job,
+                db,
+                job,
+                status="succeeded",
+                model=outcome.model,
+                items=outcome.items,
+                result_json=outcome.payload if settings.ANALYSIS_STORE_RESULT_JSON else None,
+                fingerprints=outcome.fingerprints,
+            )
+            return
+        # 打ち切られた解析のセッションは途中の状態のままなので、失敗の記録は新しいセッションで行う
+        await run_in_threadpool(_fail, job_id, error)
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def _recover(idx: int) -> None:
+    try:
+        await run_in_threadpool(recover_jobs)
+    except Exception:
+        logger.exception("job worker %d: recovery failed", idx)
+
+
+async def _worker_loop(idx: int) -> None:
+    if idx == 0:
+        await _recover(idx)
+
+    while not _stopping:
+        try:
+            job_id = await run_in_threadpool(_claim)
+        except Exception:
+            logger.exception("job worker %d: claim failed", idx)
+            job_id = None
+
+        if job_id is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                if idx == 0:
+                    await _recover(idx)
+            continue
+
+        try:
+            await _execute(job_id)
+        except Exception:
+            logger.exception("job worker %d: job %s crashed", idx, job_id)
+
+
+def start_job_workers() -> None:
+    global _wakeup, _stopping
+    if _tasks or settings.JOB_WORKERS <= 0:
+        return
+    _stopping = False
+    _wakeup = asyncio.Event()
+    for i in range(settings.JOB_WORKERS):
+        _tasks.append(asyncio.create_task(_worker_loop(i), name=f"analysis-job-{i}"))
+
+
+async def stop_job_workers() -> None:
+    global _stopping
+    _stopping = True
+    for t in _tasks:
+        t.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,203 @@
+"""処理段階ごとの計測と Prometheus 形式のメトリクス。
+
+- ``stage("parse")`` で囲んだ区間の所要時間を、リクエスト単位で集計して ``Server-Timing``
+  ヘッダに出し、同時に ``rulecheck_stage_seconds`` ヒストグラムにも記録する。
+- ``MetricsMiddleware`` がリクエスト数・処理中リクエスト数・応答時間を記録する。
+- ``render()`` が ``/metrics`` 用のテキスト形式を返す。
+
+依存ライブラリは増やさず、プロセス内で集計する（gunicorn の複数ワーカーでは
+ワーカーごとの値になる）。記録は perf_counter とロック付きの加算だけなので常時有効にしてよい。
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from app.core.settings import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# リクエストごとの {段階名: 合計秒}。ミドルウェアが設定し、stage() が加算する
+_timings: ContextVar[dict[str, float] | None] = ContextVar("stage_timings", default=None)
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, doc, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values: str) -> None:
+        if not settings.METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, doc: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 → [バケットごとの件数..., +Inf の件数, 合計]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        if not settings.METRICS_ENABLED:
+            return
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(label_values)
+            if row is None:
+                row = self._values[label_values] = [0.0] * (len(self.buckets) + 2)
+            row[idx] += 1
+            row[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted((k, list(v)) for k, v in self._values.items())
+        lines = self._header()
+        for key, row in values:
+            cumulative = 0.0
+            for bound, n in zip(self.buckets + (float("inf"),), row):
+                cumulative += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+REQUESTS = Counter("rulecheck_http_requests_total", "HTTP requests.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("rulecheck_http_request_seconds", "HTTP request duration.", ("method", "route"))
+IN_FLIGHT = Gauge("rulecheck_http_requests_in_flight", "HTTP requests in progress.")
+STAGE_SECONDS = Histogram("rulecheck_stage_seconds", "Duration of analysis stages.", ("stage",))
+LLM_TOKENS = Counter("rulecheck_llm_tokens_total", "Gemini tokens reported by usage metadata.", ("model", "kind"))
+LLM_REQUESTS = Counter("rulecheck_llm_requests_total", "Gemini generate_content calls.", ("model", "outcome"))
+PROMPT_TOKENS = Counter(
+    "rulecheck_prompt_tokens_estimated_total", "Estimated tokens of slide XML before/after compaction.", ("kind",)
+)
+FALLBACKS = Counter("rulecheck_analysis_fallback_total", "Analyses that fell back to mock results.", ("reason",))
+ANALYSES_IN_FLIGHT = Gauge("rulecheck_analyses_in_flight", "Analyses holding an analysis slot.")
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """with ブロックの所要時間を段階 name として記録する（例外時も記録する）。"""
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - t0)
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """リクエスト数・処理中数・応答時間を記録し、段階計測を Server-Timing ヘッダで返す ASGI ミドルウェア。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _timings.set(timings)
+        method = scope["method"]
+        status = "500"
+        t0 = time.perf_counter()
+        IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if settings.SERVER_TIMING_ENABLED:
+                    timings["total"] = time.perf_counter() - t0
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUESTS.inc(method, path, status)
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, method, path)
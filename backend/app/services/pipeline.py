@@ -0,0 +1,563 @@
+import logging
+import os
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import AsyncIterator, List
+
+from app.core.settings import settings
+from app.crud import (append_analysis_items, create_analysis,
+                      create_analysis_with_items, evict_analysis_cache,
+                      find_base_analysis, finish_analysis, get_cached_result,
+                      get_slide_fingerprints, put_cached_result)
+from app.models import Analysis, File
+from app.services.analysis import (DEFAULT_RULES, analyze_xml_async,
+                                   analyze_xml_sharded, iter_xml_shards)
+from app.services.analysis_cache import cache_key, normalize_rules, rules_hash
+from app.services.gemini_client import CircuitOpenError
+from app.services.incremental import (SlidePlan, plan_slides, slide_fingerprints,
+                                      subset_xml)
+from app.services.metrics import FALLBACKS, stage
+from app.services.rule_engine import (engine_fingerprint, get_rule_engine,
+                                      remaining_rules)
+from app.services.schemas import AnalysisItem
+from app.services.workers import analysis_slot, convert_to_xml_async
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+MODES = {"auto", "mock", "llm", "rules"}
+
+
+class AnalysisError(Exception):
+    """解析パイプラインの失敗。status_code は HTTP 応答にそのまま使える値。"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def _convert(abs_path: str, sha256: str) -> str:
+    try:
+        return await convert_to_xml_async(abs_path, pretty=False, sha256=sha256)
+    except BrokenProcessPool:
+        # プールの作り直し後も失敗した（巨大なデッキでワーカーが続けて落ちた等）。このリクエストだけ失敗させる
+        raise AnalysisError(503, "スライドの解析ワーカーが異常終了しました。時間をおいて再度お試しください")
+
+
+@dataclass
+class AnalysisOutcome:
+    items: List[AnalysisItem]
+    model: str
+    cache_status: str  # hit | miss | bypass
+    payload: list[dict] = field(default_factory=list)
+    # スライド番号 → 内容ハッシュ（次の改訂版の差分解析に使う）
+    fingerprints: dict[int, str] = field(default_factory=dict)
+    slides_reused: int = 0
+    slides_analyzed: int = 0
+    # 正規化したルール本文の sha256（Analysis.rules_version）
+    rules_version: str | None = None
+
+
+def rule_engine_applies(rules: str | None) -> bool:
+    # ルール番号の意味が分かるのは既定ルールのときだけ
+    return settings.RULE_ENGINE_ENABLED and normalize_rules(rules) == normalize_rules(None)
+
+
+def resolve_mode(mode: str | None, rules: str | None = None) -> str:
+    req_mode = (mode or settings.ANALYZE_MODE or "auto").lower()
+    if req_mode not in MODES:
+        raise AnalysisError(400, "mode は auto/mock/llm/rules のいずれかを指定してください")
+    if req_mode == "rules" and not rule_engine_applies(rules):
+        raise AnalysisError(400, "rules モードはルールエンジン有効かつ既定ルールの場合のみ利用できます")
+    return req_mode
+
+
+def expected_model(req_mode: str) -> str:
+    if req_mode == "rules":
+        return "rules"
+    # auto でキー未設定なら mock 結果になる
+    if req_mode == "mock" or (req_mode == "auto" and not settings.GEMINI_API_KEY):
+        return "mock"
+    return settings.GEMINI_MODEL
+
+
+def _cache_model(want_model: str, use_engine: bool) -> str:
+    # ルールエンジンの結果を含む場合は辞書のハッシュもキーに含める
+    if use_engine and want_model != "mock":
+        return f"{want_model}+rules:{engine_fingerprint()}"
+    return want_model
+
+
+def _local_items(xml_str: str) -> list[AnalysisItem]:
+    with stage("rules"):
+        return get_rule_engine().scan_xml(xml_str)
+
+
+def _mock_items_from_xml(_: str) -> list[AnalysisItem]:
+    return [
+        AnalysisItem(
+            slideNumber=1,
+            category="誤植",
+            basis="1",
+            issue="「こんな事をる患者さんがよくいます」という表現は、助詞の使い方に誤りがあるように見受けられます。読者に違和感を与える可能性がございます。",
+            suggestion="「こんなことを言う患者さんがよくいます」など、自然な表現へご修正いただけますと幸いです。",
+            correctionType="必須"
+        ),
+        AnalysisItem(
+            slideNumber=1,
+            category="表現",
+            basis="2",
+            issue="「オングリザという糖尿病治療剤がありますよ」という表現について、製品名の直接的な記載は薬機法上、広告と見なされる可能性がございます。",
+            suggestion="「サキサグリプチン（DPP-4阻害薬）」など一般名でのご記載を推奨いたします。対象読者が医療関係者であることも明示いただけますと安心です。",
+            correctionType="必須"
+        ),
+        AnalysisItem(
+            slideNumber=1,
+            category="出典",
+            basis="3",
+            issue="本スライドには出典情報や作成者名の記載が確認できませんでした。",
+            suggestion="承認時評価資料、添付文書、学術論文などの出典を明記いただき、加えて作成者名や所属もご記載いただけますと、資料の信頼性が一層高まるかと存じます。",
+            correctionType="任意"
+        ),
+        AnalysisItem(
+            slideNumber=2,
+            category="誤植",
+            basis="1",
+            issue="「C18He25N3O2・H2O」との表記について、元素記号に誤りがあるようでございます。",
+            suggestion="正しくは「C18H25N3O2・H2O」かと存じます。ご確認のうえ、ご修正をお願いいたします。",
+            correctionType="必須"
+        ),
+        AnalysisItem(
+            slideNumber=2,
+            category="表現",
+            basis="2",
+            issue="「軽度の肥満であっても 糖尿病が絶対に発症してしまう」という表現は、過度に不安を与える可能性がございます。",
+            suggestion="「軽度の肥満でも発症リスクが高まる可能性がある」などの表現に見直し、あわせて根拠となる文献をご提示いただけますと説得力が増すかと存じます。",
+            correctionType="必須"
+        ),
+        AnalysisItem(
+            slideNumber=2,
+            category="表現",
+            basis="2",
+            issue="「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
+            suggestion="「血糖コントロールの改善が期待される」や「食事・運動療法と併用することで効果が見込まれる」といった、慎重な表現への修正をお勧めいたします。",
+            correctionType="任意"
+        ),
+        AnalysisItem(
+            slideNumber=2,
+            category="出典",
+            basis="3",
+            issue="本スライドにも、出典や作成者の記載が見受けられませんでした。",
+            suggestion="添付文書やPMDA資料、査読付き論文など、信頼性の高い出典を明記いただくことで、資料の正確性がより一層高まるものと存じます。",
+            correctionType="任意"
+        )
+    ]
+
+
+def _base_result(db: Session, base: Analysis, *, rules: str | None, key_model: str) -> list[dict] | None:
+    """改訂元の解析のモデル出力そのもの（保存した result_json か、その内容のキャッシュ）。
+
+    analysis_items は手動の追加・編集を含むので使わない（キャッシュにモデル出力として混ざるため）。
+    """
+    if base.result_json is not None:
+        return base.result_json
+    if not settings.ANALYSIS_CACHE_ENABLED:
+        return None
+    return get_cached_result(
+        db,
+        cache_key=cache_key(base.file.sha256, rules, key_model),
+        max_age_seconds=settings.ANALYSIS_CACHE_MAX_AGE_SECONDS,
+    )
+
+
+def _plan_incremental(
+    db: Session, f: File, xml_str: str, *, rules: str | None, key_model: str, salt: str, enabled: bool
+) -> tuple[dict[int, str], SlidePlan | None, list[AnalysisItem], str | None]:
+    """スライド指紋を取り、改訂元の解析があれば差分解析の計画を立てる（同期。スレッドで呼ぶ）。
+
+    (指紋, 計画, 引き継ぐ指摘, 解析対象の XML) を返す。計画がなければ XML 全体が解析対象。
+    変更スライドがなければ解析対象は None。改訂元のモデル出力が残っていなければ全体を解析する。
+    """
+    fingerprints = slide_fingerprints(xml_str, salt=salt)
+    base = find_base_analysis(db, f) if enabled else None
+    if base is None:
+        return fingerprints, None, [], xml_str
+    plan = plan_slides(fingerprints, get_slide_fingerprints(db, base.id))
+    if not plan.reused:
+        return fingerprints, None, [], xml_str
+    previous = _base_result(db, base, rules=rules, key_model=key_model)
+    if previous is None:
+        return fingerprints, None, [], xml_str
+
+    # 改訂版なら変更・追加スライドだけを解析し、残りは前回の指摘をスライド番号を付け替えて引き継ぐ
+    old_to_new: dict[int, list[int]] = {}
+    for new_num, old_num in plan.reused.items():
+        old_to_new.setdefault(old_num, []).append(new_num)
+    carried: list[AnalysisItem] = []
+    for d in previous:
+        item = AnalysisItem.model_validate(d)
+        for new_num in old_to_new.get(item.slideNumber, []):
+            carried.append(item.model_copy(update={"slideNumber": new_num}))
+    target_xml = subset_xml(xml_str, plan.changed) if plan.changed else None
+    return fingerprints, plan, carried, target_xml
+
+
+def _store_cached_result(
+    db: Session, *, cache_key: str, file_sha256: str, rules_hash: str, model: str, payload: list[dict]
+) -> None:
+    put_cached_result(
+        db,
+        cache_key=cache_key,
+        file_sha256=file_sha256,
+        rules_hash=rules_hash,
+        model=model,
+        result_json=payload,
+    )
+    evict_analysis_cache(
+        db,
+        max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+        max_age_seconds=settings.ANALYSIS_CACHE_MAX_AGE_SECONDS,
+    )
+
+
+async def run_analysis(
+    db: Session,
+    f: File,
+    *,
+    rules: str | None = None,
+    mode: str | None = None,
+    force: bool = False,
+    sharded: bool | None = None,
+    incremental: bool | None = None,
+) -> AnalysisOutcome:
+    """キャッシュ参照 → PPTX 解析 → LLM/mock → キャッシュ保存までを行う（Analysis の保存は呼び出し側）。"""
+    req_mode = resolve_mode(mode, rules)
+    model_name = settings.GEMINI_MODEL
+    want_model = expected_model(req_mode)
+    use_engine = rule_engine_applies(rules)
+    # ルールエンジンだけで判定するルール（既定では 2）は LLM のプロンプトから外す（残りがなければ LLM を呼ばない）
+    llm_rules = remaining_rules(DEFAULT_RULES, get_rule_engine().decided_rules) if use_engine else rules
+    key_model = _cache_model(want_model, use_engine)
+    key = cache_key(f.sha256, rules, key_model)
+    version = rules_hash(rules)
+    fingerprints: dict[int, str] = {}
+    slides_reused = 0
+    slides_analyzed = 0
+
+    # DB 操作と CPU 処理はスレッドで行い、イベントループ（/health や他のリクエスト）を止めない
+    cached = None
+    if settings.ANALYSIS_CACHE_ENABLED and not force:
+        with stage("cache"):
+            cached = await run_in_threadpool(
+                get_cached_result, db, cache_key=key, max_age_seconds=settings.ANALYSIS_CACHE_MAX_AGE_SECONDS
+            )
+
+    if cached is not None:
+        items = [AnalysisItem.model_validate(i) for i in cached]
+        model_name = want_model
+        cache_status = "hit"
+    else:
+        cache_status = "bypass" if force else "miss"
+        if req_mode == "llm" and not settings.GEMINI_API_KEY:
+            raise AnalysisError(400, "GEMINI_API_KEY が未設定のため LLM モードは利用できません")
+        abs_path = os.path.join(settings.STORAGE_DIR, f.path)
+        use_shards = settings.ANALYZE_SHARDED if sharded is None else bool(sharded)
+        use_incremental = (settings.ANALYZE_INCREMENTAL if incremental is None else bool(incremental)) and not force
+
+        async def run_llm(xml_str: str) -> list[AnalysisItem]:
+            local = await run_in_threadpool(_local_items, xml_str) if use_engine else []
+            if use_engine and llm_rules is None:
+                return local
+            if use_shards:
+                items = await analyze_xml_sharded(
+                    xml_str,
+                    llm_rules,
+                    max_chars=settings.ANALYZE_SHARD_MAX_CHARS,
+                    concurrency=settings.ANALYZE_SHARD_CONCURRENCY,
+                    retries=settings.ANALYZE_SHARD_RETRIES,
+                )
+            else:
+                items = await analyze_xml_async(xml_str, llm_rules)
+            if use_engine:
+                # LLM も同じスライド・同じルールで指摘した候補（ルール 3/4/8）は二重になるので除く
+                items = get_rule_engine().drop_confirmed(local, items) + items
+                items.sort(key=lambda i: i.slideNumber)
+            return items
+
+        # 解析・LLM 呼び出しはイベントループ外／非同期で行い、同時実行数は全体で制限する
+        async with analysis_slot():
+            xml_str = await _convert(abs_path, f.sha256)
+            fingerprints, plan, carried, target_xml = await run_in_threadpool(
+                _plan_incremental,
+                db,
+                f,
+                xml_str,
+                rules=rules,
+                key_model=key_model,
+                salt=f"{version}:{key_model}",
+                enabled=use_incremental,
+            )
+            if plan is not None:
+                slides_reused = len(plan.reused)
+            slides_analyzed = len(plan.changed) if plan is not None else len(fingerprints)
+
+            if target_xml is None:
+                items = []
+                model_name = want_model
+            elif req_mode == "mock":
+                items = _mock_items_from_xml(target_xml)
+                model_name = "mock"
+            elif req_mode == "rules":
+                items = await run_in_threadpool(_local_items, target_xml)
+                model_name = "rules"
+            elif req_mode == "llm":
+                try:
+                    items = await run_llm(target_xml)
+                except CircuitOpenError:
+                    raise AnalysisError(503, "Gemini の障害が続いているため一時的に LLM 解析を停止しています")
+                except Exception as e:
+                    logger.exception("LLM analyze failed in llm mode")
+                    raise AnalysisError(502, f"LLM 解析に失敗しました: {e}")
+            else:  # auto
+                try:
+                    if settings.GEMINI_API_KEY:
+                        items = await run_llm(target_xml)
+                    else:
+                        raise RuntimeError("GEMINI_API_KEY is not set")
+                except Exception as e:
+                    logger.warning("LLM analyze failed; fallback to mock: %s", e)
+                    if not settings.GEMINI_API_KEY:
+                        FALLBACKS.inc("no_api_key")
+                    else:
+                        FALLBACKS.inc("circuit_open" if isinstance(e, CircuitOpenError) else "llm_error")
+                    items = _mock_items_from_xml(xml_str)
+                    model_name = "mock"
+
+            if plan is not None and model_name == want_model:
+                changed = set(plan.changed)
+                items = carried + [i for i in items if i.slideNumber in changed]
+                items.sort(key=lambda i: i.slideNumber)
+            elif plan is not None:
+                # フォールバックで別モデルの結果になった場合は引き継ぎをやめて全体結果とする
+                slides_reused, slides_analyzed = 0, len(fingerprints)
+
+    for i in items:
+        if getattr(i, "correctionType", None) is None:
+            setattr(i, "correctionType", "任意")
+
+    payload = [i.model_dump() for i in items]
+
+    # 一時的な LLM 失敗による mock フォールバック結果は LLM のキーで保存しない
+    if settings.ANALYSIS_CACHE_ENABLED and cache_status != "hit" and model_name == want_model:
+        with stage("cache"):
+            await run_in_threadpool(
+                _store_cached_result,
+                db,
+                cache_key=key,
+                file_sha256=f.sha256,
+                rules_hash=version,
+                model=model_name,
+                payload=payload,
+            )
+
+    if model_name != want_model:
+        fingerprints = {}
+
+    return AnalysisOutcome(
+        items=items,
+        model=model_name,
+        cache_status=cache_status,
+        payload=payload,
+        fingerprints=fingerprints,
+        slides_reused=slides_reused,
+        slides_analyzed=slides_analyzed,
+        rules_version=version,
+    )
+
+
+def save_outcome(db: Session, *, user_id: str, file_id: int, outcome: AnalysisOutcome) -> Analysis:
+    with stage("db"):
+        return create_analysis_with_items(
+            db,
+            user_id=user_id,
+            file_id=file_id,
+            model=outcome.model,
+            items=outcome.items,
+            rules_version=outcome.rules_version,
+            result_json=outcome.payload if settings.ANALYSIS_STORE_RESULT_JSON else None,
+            fingerprints=outcome.fingerprints,
+        )
+
+
+def _mark_failed(db: Session, a: Analysis) -> None:
+    db.rollback()
+    finish_analysis(db, a, status="failed")
+
+
+def _by_slide(items: List[AnalysisItem]) -> list[List[AnalysisItem]]:
+    items = sorted(items, key=lambda i: i.slideNumber)
+    return [list(g) for _, g in groupby(items, key=lambda i: i.slideNumber)]
+
+
+async def stream_analysis(
+    db: Session,
+    f: File,
+    *,
+    user_id: str,
+    rules: str | None = None,
+    mode: str | None = None,
+    force: bool = False,
+) -> AsyncIterator[tuple[str, dict]]:
+    """解析結果をスライド（シャード）単位で逐次返す。
+
+    ``(event, data)`` を yield する。最初に ``start``、指摘ごとに ``item``、
+    最後に ``done``（失敗時は ``error``）。Analysis は先に running で作成し、
+    届いた指摘はその都度保存するため、途中で切断されてもそこまでの結果は残る。
+    差分解析は行わず、常にファイル全体を解析する。
+    """
+    req_mode = resolve_mode(mode, rules)
+    want_model = expected_model(req_mode)
+    use_engine = rule_engine_applies(rules)
+    llm_rules = remaining_rules(DEFAULT_RULES, get_rule_engine().decided_rules) if use_engine else rules
+    key_model = _cache_model(want_model, use_engine)
+    key = cache_key(f.sha256, rules, key_model)
+    version = rules_hash(rules)
+    a = await run_in_threadpool(
+        create_analysis, db, user_id=user_id, file_id=f.id, model=want_model, rules_version=version, status="running"
+    )
+    yield "start", {"analysis_id": a.id, "model": want_model}
+
+    model_name = want_model
+    cache_status = "bypass" if force else "miss"
+    fingerprints: dict[int, str] = {}
+    payload: list[dict] = []
+    finished = False
+
+    async def emit(batch: List[AnalysisItem]) -> list[dict]:
+        for i in batch:
+            if getattr(i, "correctionType", None) is None:
+                setattr(i, "correctionType", "任意")
+        await run_in_threadpool(append_analysis_items, db, analysis_id=a.id, items=batch)
+        dumped = [i.model_dump() for i in batch]
+        payload.extend(dumped)
+        return dumped
+
+    try:
+        cached = None
+        if settings.ANALYSIS_CACHE_ENABLED and not force:
+            cached = await run_in_threadpool(
+                get_cached_result, db, cache_key=key, max_age_seconds=settings.ANALYSIS_CACHE_MAX_AGE_SECONDS
+            )
+
+        if cached is not None:
+            cache_status = "hit"
+            for batch in _by_slide([AnalysisItem.model_validate(i) for i in cached]):
+                for d in await emit(batch):
+                    yield "item", d
+        else:
+            if req_mode == "llm" and not settings.GEMINI_API_KEY:
+                raise AnalysisError(400, "GEMINI_API_KEY が未設定のため LLM モードは利用できません")
+            abs_path = os.path.join(settings.STORAGE_DIR, f.path)
+            async with analysis_slot():
+                xml_str = await _convert(abs_path, f.sha256)
+                fingerprints = await run_in_threadpool(slide_fingerprints, xml_str, salt=f"{version}:{key_model}")
+
+                if want_model == "mock":
+                    for batch in _by_slide(_mock_items_from_xml(xml_str)):
+                        for d in await emit(batch):
+                            yield "item", d
+                else:
+                    call_llm = req_mode != "rules" and not (use_engine and llm_rules is None)
+                    local = await run_in_threadpool(_local_items, xml_str) if use_engine else []
+                    candidates: list[AnalysisItem] = []
+                    if call_llm and local:
+                        # 候補のみのルール（3/4/8）の指摘は、LLM が同じスライド・同じルールで指摘したら除くので最後に送る
+                        decided = get_rule_engine().decided_rules
+                        candidates = [i for i in local if i.basis not in decided]
+                        local = [i for i in local if i.basis in decided]
+                    # ルールエンジンの指摘は LLM を待たずに先に送る。ただし auto で mock に切り替わりうる間は
+                    # 送らずに持っておき（非ストリームと同じく mock だけの結果にするため）、LLM の最初の指摘と一緒に送る
+                    if req_mode != "auto" or not call_llm:
+                        for batch in _by_slide(local):
+                            for d in await emit(batch):
+                                yield "item", d
+                        local = []
+                    llm_items: list[AnalysisItem] = []
+                    try:
+                        if call_llm:
+                            async for batch in iter_xml_shards(
+                                xml_str,
+                                llm_rules,
+                                max_chars=settings.ANALYZE_SHARD_MAX_CHARS,
+                                concurrency=settings.ANALYZE_SHARD_CONCURRENCY,
+                                retries=settings.ANALYZE_SHARD_RETRIES,
+                            ):
+                                if not batch:
+                                    continue
+                                llm_items.extend(batch)
+                                if local:
+                                    batch = local + batch
+                                    local = []
+                                for d in await emit(batch):
+                                    yield "item", d
+                        rest = local + get_rule_engine().drop_confirmed(candidates, llm_items)
+                        for batch in _by_slide(sorted(rest, key=lambda i: i.slideNumber)):
+                            for d in await emit(batch):
+                                yield "item", d
+                    except Exception as e:
+                        # LLM の指摘を送信済みなら mock に差し替えられないので失敗とする
+                        if req_mode == "llm" or llm_items:
+                            if isinstance(e, CircuitOpenError):
+                                raise AnalysisError(503, "Gemini の障害が続いているため一時的に LLM 解析を停止しています")
+                            logger.exception("LLM stream analyze failed")
+                            raise AnalysisError(502, f"LLM 解析に失敗しました: {e}")
+                        logger.warning("LLM analyze failed; fallback to mock: %s", e)
+                        FALLBACKS.inc("circuit_open" if isinstance(e, CircuitOpenError) else "llm_error")
+                        model_name = "mock"
+                        for batch in _by_slide(_mock_items_from_xml(xml_str)):
+                            for d in await emit(batch):
+                                yield "item", d
+
+        payload.sort(key=lambda d: d["slideNumber"])
+        if settings.ANALYSIS_CACHE_ENABLED and cache_status != "hit" and model_name == want_model:
+            await run_in_threadpool(
+                _store_cached_result,
+                db,
+                cache_key=key,
+                file_sha256=f.sha256,
+                rules_hash=version,
+                model=model_name,
+                payload=payload,
+            )
+        await run_in_threadpool(
+            finish_analysis,
+            db,
+            a,
+            status="succeeded",
+            model=model_name,
+            result_json=payload if settings.ANALYSIS_STORE_RESULT_JSON else None,
+            fingerprints=fingerprints if model_name == want_model else None,
+        )
+        finished = True
+        yield "done", {
+            "analysis_id": a.id,
+            "model": model_name,
+            "cache": cache_status,
+            "items_count": len(payload),
+        }
+    except AnalysisError as e:
+        await run_in_threadpool(_mark_failed, db, a)
+        finished = True
+        yield "error", {"analysis_id": a.id, "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        logger.exception("stream analyze failed for file %s", f.id)
+        await run_in_threadpool(_mark_failed, db, a)
+        finished = True
+        yield "error", {"analysis_id": a.id, "status_code": 500, "detail": str(e)}
+    finally:
+        # クライアント切断などで途中終了した場合
+        if not finished:
+            await run_in_threadpool(_mark_failed, db, a)
@@ -1,11 +1,16 @@
 from io import BytesIO
 from pathlib import Path
-from typing import IO, Union
+from typing import IO, TYPE_CHECKING, Union
 from xml.etree import ElementTree as ET
 
+from app.core.settings import settings
+from app.services import pptx_zip
 from fastapi import UploadFile
-from pptx import Presentation
-from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+if TYPE_CHECKING:
+    from pptx.presentation import Presentation as PresentationType
+
+BACKENDS = ("python-pptx", "zip")
 
 
 class PptxConverter:
@@ -15,7 +20,10 @@ class PptxConverter:
     @staticmethod
     def _load_presentation(
         src: Union[str, Path, bytes, bytearray, memoryview, IO[bytes], UploadFile],
-    ) -> Presentation:
+    ) -> "PresentationType":
+        # python-pptx は import が重い（起動時間に効く）ため、使う時点で読み込む
+        from pptx import Presentation
+
         if isinstance(src, UploadFile):
             f = src.file
             try: f.seek(0)
@@ -38,12 +46,53 @@ class PptxConverter:
             return Presentation(src)
         raise PptxConverter.UnsupportedInput(type(src))
 
+    @staticmethod
+    def _zip_source(
+        src: Union[str, Path, bytes, bytearray, memoryview, IO[bytes], UploadFile],
+    ) -> Union[str, IO[bytes]]:
+        if isinstance(src, UploadFile):
+            src = src.file
+        if isinstance(src, (str, Path)):
+            p = Path(src)
+            if not p.exists():
+                raise FileNotFoundError(p)
+            return str(p)
+        if isinstance(src, (bytes, bytearray, memoryview)):
+            return BytesIO(bytes(src))
+        if hasattr(src, "read"):
+            try:
+                src.seek(0)
+            except Exception:
+                pass
+            return src
+        raise PptxConverter.UnsupportedInput(type(src))
+
     @staticmethod
     def convert_to_xml(
         src: Union[str, Path, bytes, bytearray, memoryview, IO[bytes], UploadFile],
         encoding: str = "utf-8",
         pretty: bool = True,
+        backend: str | None = None,
+        include_notes: bool | None = None,
     ) -> str:
+        # backend: "python-pptx"（既定）| "zip"（python-pptx を使わず ZIP から直接抽出する高速版）
+        backend = (backend or settings.PPTX_BACKEND or "python-pptx").lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown pptx backend: {backend}")
+        if include_notes is None:
+            include_notes = settings.PPTX_INCLUDE_NOTES
+        if backend == "zip":
+            root = pptx_zip.build_document(PptxConverter._zip_source(src), include_notes=include_notes)
+        else:
+            root = PptxConverter._build_document(src)
+        return PptxConverter._serialize(root, encoding, pretty)
+
+    @staticmethod
+    def _build_document(
+        src: Union[str, Path, bytes, bytearray, memoryview, IO[bytes], UploadFile],
+    ) -> ET.Element:
+        from pptx.enum.shapes import MSO_SHAPE_TYPE
+
         prs = PptxConverter._load_presentation(src)
         root = ET.Element("Document")
         for idx, slide in enumerate(prs.slides, 1):
@@ -68,6 +117,10 @@ class PptxConverter:
                         pass
                     name = getattr(getattr(shape, "image", None), "filename", "image")
                     ET.SubElement(s_el, "Image", name=name, caption=caption)
+        return root
+
+    @staticmethod
+    def _serialize(root: ET.Element, encoding: str, pretty: bool) -> str:
         if pretty and hasattr(ET, "indent"):
             ET.indent(root, space="  ", level=0)
             return ET.tostring(root, encoding=encoding, xml_declaration=True).decode(encoding)
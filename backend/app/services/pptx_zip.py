@@ -0,0 +1,170 @@
+import posixpath
+import zipfile
+from typing import IO, Union
+from xml.etree import ElementTree as ET
+
+# python-pptx を使わずに PPTX（ZIP）から直接スライドのテキストと画像キャプションを取り出す。
+# メディアや画像パーツは一切読み込まない。出力は PptxConverter（python-pptx 版）と同一になるようにしている。
+
+_NS = {
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_P = "{%s}" % _NS["p"]
+_A = "{%s}" % _NS["a"]
+_R = "{%s}" % _NS["r"]
+_REL = "{%s}" % _NS["rel"]
+
+_OFFICE_DOCUMENT = "/officeDocument"
+_NOTES_SLIDE = "/notesSlide"
+
+# python-pptx の SlideShapes が図形として扱う spTree 直下の要素
+_SHAPE_TAGS = {_P + t for t in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart")}
+_NV_PR = {_P + t for t in ("nvSpPr", "nvGrpSpPr", "nvGraphicFramePr", "nvCxnSpPr", "nvPicPr")}
+
+_PARSER = None
+
+Source = Union[str, bytes, bytearray, memoryview, IO[bytes]]
+
+
+def _parse(zf: zipfile.ZipFile, name: str):
+    # lxml は import が重い（起動時間に効く）ため、最初にパースする時点で読み込む
+    global _PARSER
+    from lxml import etree
+
+    if _PARSER is None:
+        _PARSER = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True)
+    with zf.open(name) as fh:
+        return etree.parse(fh, _PARSER).getroot()
+
+
+def _rels_name(part: str) -> str:
+    d, f = posixpath.split(part)
+    return posixpath.join(d, "_rels", f + ".rels")
+
+
+def _rels(zf: zipfile.ZipFile, part: str) -> dict[str, tuple[str, str]]:
+    """rId → (Type, 解決済みパート名)"""
+    name = _rels_name(part)
+    try:
+        root = _parse(zf, name)
+    except KeyError:
+        return {}
+    base = posixpath.dirname(part)
+    out = {}
+    for rel in root.iter(_REL + "Relationship"):
+        target = rel.get("Target") or ""
+        if rel.get("TargetMode") == "External":
+            resolved = target
+        elif target.startswith("/"):
+            resolved = target.lstrip("/")
+        else:
+            resolved = posixpath.normpath(posixpath.join(base, target))
+        out[rel.get("Id")] = (rel.get("Type") or "", resolved)
+    return out
+
+
+def _main_part(zf: zipfile.ZipFile) -> str:
+    for rel_type, target in _rels(zf, "").values():
+        if rel_type.endswith(_OFFICE_DOCUMENT):
+            return target
+    return "ppt/presentation.xml"
+
+
+def _paragraph_text(p) -> str:
+    # python-pptx の _Paragraph.text と同じく a:r / a:fld のテキストと a:br（"\v"）を連結する
+    parts = []
+    for child in p:
+        if child.tag == _A + "r" or child.tag == _A + "fld":
+            t = child.find(_A + "t")
+            parts.append((t.text or "") if t is not None else "")
+        elif child.tag == _A + "br":
+            parts.append("\v")
+    return "".join(parts)
+
+
+def _tx_body_text(tx_body) -> str:
+    return "\n".join(_paragraph_text(p) for p in tx_body.findall(_A + "p"))
+
+
+def _has_placeholder(shape) -> bool:
+    for child in shape:
+        if child.tag in _NV_PR:
+            nv_pr = child.find(_P + "nvPr")
+            return nv_pr is not None and nv_pr.find(_P + "ph") is not None
+    return False
+
+
+def _add_text(s_el: ET.Element, text: str) -> None:
+    text = text.strip()
+    if text:
+        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+        if lines:
+            ET.SubElement(s_el, "Text").text = "\n".join(lines)
+
+
+def _image_name(shape, rels: dict[str, tuple[str, str]]) -> str:
+    # 読み込み済みの画像には元ファイル名が無いため python-pptx は "image.<パート拡張子>" を返す
+    blip = shape.find(f"{_P}blipFill/{_A}blip")
+    r_id = blip.get(_R + "embed") if blip is not None else None
+    if not r_id or r_id not in rels:
+        return "image"
+    ext = posixpath.splitext(rels[r_id][1])[1]
+    return f"image.{ext[1:] if ext.startswith('.') else ext}"
+
+
+def _notes_text(zf: zipfile.ZipFile, notes_part: str) -> str:
+    root = _parse(zf, notes_part)
+    texts = []
+    for sp in root.iter(_P + "sp"):
+        ph = sp.find(f"{_P}nvSpPr/{_P}nvPr/{_P}ph")
+        if ph is None or ph.get("type") != "body":
+            continue
+        tx_body = sp.find(_P + "txBody")
+        if tx_body is not None:
+            texts.append(_tx_body_text(tx_body))
+    return "\n".join(texts)
+
+
+def _add_slide(root: ET.Element, zf: zipfile.ZipFile, idx: int, part: str, include_notes: bool) -> None:
+    s_el = ET.SubElement(root, "Slide", number=str(idx))
+    sld = _parse(zf, part)
+    rels = _rels(zf, part)
+    sp_tree = sld.find(f"{_P}cSld/{_P}spTree")
+    shapes = [] if sp_tree is None else [el for el in sp_tree if el.tag in _SHAPE_TAGS]
+    for shape in shapes:
+        if shape.tag == _P + "sp":
+            tx_body = shape.find(_P + "txBody")
+            if tx_body is not None:
+                _add_text(s_el, _tx_body_text(tx_body))
+        elif shape.tag == _P + "pic" and not _has_placeholder(shape):
+            # 動画（a:videoFile を持つ p:pic）は python-pptx では PICTURE ではない
+            if shape.find(f"{_P}nvPicPr/{_P}nvPr/{_A}videoFile") is not None:
+                continue
+            c_nv_pr = next(shape.iter(_P + "cNvPr"), None)
+            caption = (c_nv_pr.get("descr") if c_nv_pr is not None else None) or ""
+            ET.SubElement(s_el, "Image", name=_image_name(shape, rels), caption=caption)
+    if include_notes:
+        for rel_type, target in rels.values():
+            if rel_type.endswith(_NOTES_SLIDE):
+                notes = _notes_text(zf, target)
+                lines = [ln.strip() for ln in notes.strip().splitlines() if ln.strip()]
+                if lines:
+                    ET.SubElement(s_el, "Notes").text = "\n".join(lines)
+                break
+
+
+def build_document(src: Source, include_notes: bool = False) -> ET.Element:
+    """PPTX をプレゼンテーション順に走査して <Document><Slide number=...> の要素ツリーを返す。"""
+    with zipfile.ZipFile(src) as zf:
+        main = _main_part(zf)
+        prs = _parse(zf, main)
+        rels = _rels(zf, main)
+        root = ET.Element("Document")
+        sld_id_lst = prs.find(_P + "sldIdLst")
+        sld_ids = [] if sld_id_lst is None else sld_id_lst.findall(_P + "sldId")
+        for idx, sld_id in enumerate(sld_ids, 1):
+            _add_slide(root, zf, idx, rels[sld_id.get(_R + "id")][1], include_notes)
+    return root
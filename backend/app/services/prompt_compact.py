@@ -0,0 +1,60 @@
+"""LLM に渡すスライド XML を、トークン数が少なくなるよう詰め直す。
+
+- 複数スライドに繰り返し現れるテキスト（フッター・免責文・ヘッダーなど）は冒頭の
+  ``<Shared>`` に 1 回だけ置き、各スライドには ``<Text ref="t1"/>`` の参照を残す
+- キャプションのない ``<Image>`` は指摘の材料にならないため落とす
+- XML 宣言・インデントを除く
+
+コンバータの出力（キャッシュ・差分解析の指紋に使う）はそのままにし、プロンプト直前でだけ適用する。
+"""
+import re
+from collections import Counter
+from xml.etree import ElementTree as ET
+
+# ASCII はおよそ 4 文字で 1 トークン、日本語などそれ以外は 1 文字 1 トークン前後
+_ASCII_RUN = re.compile(r"[\x00-\x7f]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（Gemini のトークナイザーを呼ばずに前後比較するための目安）。"""
+    ascii_chars = sum(len(m) for m in _ASCII_RUN.findall(text))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def compact_xml(xml_str: str, *, min_chars: int = 20, min_slides: int = 2) -> str:
+    """min_slides 枚以上のスライドに出てくる min_chars 文字以上のテキストを共有ブロックにまとめる。"""
+    root = ET.fromstring(xml_str.encode("utf-8") if isinstance(xml_str, str) else xml_str)
+    slides = root.findall("Slide")
+
+    seen_in = Counter()
+    for slide in slides:
+        seen_in.update({(t.text or "").strip() for t in slide.findall("Text")})
+    ids: dict[str, str] = {}
+    for slide in slides:
+        for t in slide.findall("Text"):
+            text = (t.text or "").strip()
+            if text not in ids and len(text) >= min_chars and seen_in[text] >= min_slides:
+                ids[text] = f"t{len(ids) + 1}"
+
+    doc = ET.Element("Document")
+    if ids:
+        shared = ET.SubElement(doc, "Shared")
+        for text, ref in ids.items():
+            ET.SubElement(shared, "Text", id=ref).text = text
+    for slide in slides:
+        s_el = ET.SubElement(doc, "Slide", slide.attrib)
+        for child in slide:
+            if child.tag == "Text":
+                text = (child.text or "").strip()
+                if not text:
+                    continue
+                if text in ids:
+                    ET.SubElement(s_el, "Text", ref=ids[text])
+                else:
+                    ET.SubElement(s_el, "Text").text = text
+            elif child.tag == "Image":
+                if child.get("caption"):
+                    ET.SubElement(s_el, "Image", caption=child.get("caption"))
+            else:
+                s_el.append(child)
+    return ET.tostring(doc, encoding="unicode")
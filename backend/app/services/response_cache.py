@@ -0,0 +1,73 @@
+"""解析結果 GET のシリアライズ済み応答ボディを持つプロセス内 LRU。
+
+エントリは Analysis.version と組で保存し、取得時に現在の版と一致しなければ使わない。
+指摘の追加・更新・削除や状態の変化で版が上がるので、明示的な無効化は要らない
+（複数ワーカープロセスでも版は DB にあるため古いボディは返らない）。
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable
+
+from app.core.settings import settings
+from app.services.metrics import Counter
+
+RESPONSE_CACHE = Counter(
+    "rulecheck_response_cache_total", "Analysis read responses by cache result.", ("result",)
+)
+
+
+class ResponseCache:
+    """件数と総バイト数の上限つき LRU。キーごとに (版, ボディ) を 1 つだけ持つ。"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[int, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                RESPONSE_CACHE.inc("miss")
+                return None
+            self._entries.move_to_end(key)
+        RESPONSE_CACHE.inc("hit")
+        return entry[1]
+
+    def put(self, key: Hashable, version: int, body: bytes) -> None:
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                if old[0] > version:
+                    # 後から組み立てた古い版で新しい版を上書きしない
+                    return
+                self._bytes -= len(old[1])
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
+    return _cache
@@ -0,0 +1,311 @@
+"""機械的に判定できるルールをローカルで検査するエンジン。
+
+DEFAULT_RULES のうち次のルールを辞書・正規表現で検査し、AnalysisItem として返す。
+
+- 2: 製品名の不使用（製品名 → 成分名の辞書）。機械的に判定できるので LLM には渡さない
+- 3: 恐怖をあおる表現（候補のみ）
+- 4: 治癒・完治など断定的な治療効果表現（候補のみ）
+- 8: 特定医療機関名（候補のみ）
+
+文脈の判断が要るルールは "prescreen": true とし、ヒットを「任意」の候補として出すだけで
+判定は LLM に残す（プロンプトからも外さない）。"negations" は一致箇所から文末までに
+その語があれば打ち消し（「治癒を保証するものではありません」等）として扱わない。
+"exclude_patterns" に一致する語（「糖尿病専門病院」のような一般名）も指摘しない。
+
+語句は Aho-Corasick でまとめて、正規表現は 1 本に結合して、スライドごとに 1 回ずつ走査する。
+辞書は RULE_DICTIONARY_PATH の JSON で差し替えられる（形式は DEFAULT_DICTIONARY と同じ）。
+"""
+import hashlib
+import json
+import re
+import unicodedata
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, List
+from xml.etree import ElementTree as ET
+
+from app.core.settings import settings
+from app.services.schemas import AnalysisItem
+
+DEFAULT_DICTIONARY: dict = {
+    "rules": [
+        {
+            "rule": "2",
+            "category": "表現",
+            "correctionType": "必須",
+            "issue": "「{match}」は製品名です。製品名の直接的な記載は薬機法上、広告と見なされる可能性がございます。",
+            "suggestion": "「{replacement}」など一般名でのご記載を推奨いたします。",
+            "terms": {
+                "オングリザ": "サキサグリプチン",
+                "ジャヌビア": "シタグリプチン",
+                "グラクティブ": "シタグリプチン",
+                "ネシーナ": "アログリプチン",
+                "トラゼンタ": "リナグリプチン",
+                "テネリア": "テネリグリプチン",
+                "スイニー": "アナグリプチン",
+                "スーグラ": "イプラグリフロジン",
+                "フォシーガ": "ダパグリフロジン",
+                "ジャディアンス": "エンパグリフロジン",
+                "カナグル": "カナグリフロジン",
+                "アマリール": "グリメピリド",
+                "メトグルコ": "メトホルミン",
+                "トルリシティ": "デュラグルチド",
+                "オゼンピック": "セマグルチド",
+                "リベルサス": "セマグルチド",
+                "ビクトーザ": "リラグルチド",
+            },
+        },
+        {
+            "rule": "3",
+            "category": "表現",
+            "correctionType": "任意",
+            "prescreen": True,
+            "issue": "「{match}」という表現は、過度に不安を与える可能性がございます。",
+            "suggestion": "リスクの程度を根拠とともに客観的に示す表現へのご修正をお勧めいたします。",
+            "terms": ["絶対に発症", "必ず発症", "命を落とす", "死に至る", "手遅れ", "取り返しのつかない", "恐ろしい"],
+            "negations": ["ない", "ません"],
+        },
+        {
+            "rule": "4",
+            "category": "表現",
+            "correctionType": "任意",
+            "prescreen": True,
+            "issue": "「{match}」という表現は、治療効果を断定的に印象付ける恐れがございます。",
+            "suggestion": "「改善が期待される」など、効果を断定しない表現へのご修正をお勧めいたします。",
+            "terms": ["完治", "治癒", "根治", "必ず治る", "確実に治る", "完全に治る"],
+            "negations": ["ない", "ません", "難し", "困難"],
+        },
+        {
+            "rule": "8",
+            "category": "表現",
+            "correctionType": "任意",
+            "prescreen": True,
+            "issue": "「{match}」という特定の医療機関名の記載は、受診の誘導と受け取られる可能性がございます。",
+            "suggestion": "特定の医療機関名は削除し、「医療機関」など一般的な表現へのご修正をお勧めいたします。",
+            "patterns": [r"[一-龥ァ-ヶー々A-Za-z0-9]{1,20}(?:病院|クリニック|医院|診療所|医療センター)"],
+            "exclude": ["総合病院", "大学病院", "専門病院", "一般病院", "医療センター", "病院", "クリニック", "医院", "診療所"],
+            # 診療科・疾患名 + 種別だけの一般名（糖尿病専門病院・地域の総合病院など）
+            "exclude_patterns": [r"(?:専門|総合|一般|地域|近隣|近く|かかりつけ|基幹|指定)(?:病院|クリニック|医院|診療所)$"],
+        },
+    ]
+}
+
+
+_SENTENCE_END = re.compile(r"[。.!?\n]")
+
+
+def _norm(text: str) -> str:
+    # 全角英数・半角カナなどの表記ゆれを吸収する
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+class _AhoCorasick:
+    """語句リストをまとめて 1 回の走査で検索するオートマトン。"""
+
+    def __init__(self, words: List[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+        for idx, word in enumerate(words):
+            node = 0
+            for ch in word:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(idx)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> Iterator[tuple[int, int]]:
+        """text に現れる語句の (番号, 終了位置) を返す（重複あり）。"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                yield idx, pos + 1
+
+
+@dataclass
+class _Rule:
+    rule: str
+    category: str
+    correction_type: str
+    issue: str
+    suggestion: str
+    prescreen: bool = False
+    exclude: set[str] = field(default_factory=set)
+    exclude_pattern: re.Pattern | None = None
+    negations: tuple[str, ...] = ()
+
+    def skips(self, match: str, tail: str) -> bool:
+        """一般名として除外する語か、同じ文の後ろで打ち消されている一致なら True。"""
+        if match in self.exclude:
+            return True
+        if self.exclude_pattern is not None and self.exclude_pattern.search(match):
+            return True
+        return any(n in tail for n in self.negations)
+
+
+class RuleEngine:
+    """辞書をコンパイルし、コンバータの XML からルール違反候補を抽出する。"""
+
+    def __init__(self, dictionary: dict):
+        self._rules: list[_Rule] = []
+        words: list[str] = []
+        # 語句番号 → (ルール番号, 元の語句, 置換候補)
+        self._terms: list[tuple[int, str, str]] = []
+        regex_parts: list[str] = []
+        self._regex_rules: dict[str, int] = {}
+
+        for idx, spec in enumerate(dictionary.get("rules", [])):
+            excludes = [_norm(p) for p in spec.get("exclude_patterns", [])]
+            self._rules.append(
+                _Rule(
+                    rule=str(spec["rule"]),
+                    category=spec.get("category", "表現"),
+                    correction_type=spec.get("correctionType", "必須"),
+                    issue=spec["issue"],
+                    suggestion=spec["suggestion"],
+                    prescreen=bool(spec.get("prescreen", False)),
+                    exclude={_norm(x) for x in spec.get("exclude", [])},
+                    exclude_pattern=re.compile("|".join(excludes)) if excludes else None,
+                    negations=tuple(_norm(x) for x in spec.get("negations", [])),
+                )
+            )
+            terms = spec.get("terms", {})
+            pairs = terms.items() if isinstance(terms, dict) else ((t, "") for t in terms)
+            for term, replacement in pairs:
+                words.append(_norm(term))
+                self._terms.append((idx, term, replacement))
+            for n, pattern in enumerate(spec.get("patterns", [])):
+                group = f"r{idx}_{n}"
+                regex_parts.append(f"(?P<{group}>{pattern})")
+                self._regex_rules[group] = idx
+
+        self._automaton = _AhoCorasick(words)
+        self._regex = re.compile("|".join(regex_parts)) if regex_parts else None
+        self.rules = frozenset(r.rule for r in self._rules)
+        # エンジンだけで判定を終えるルール（LLM のプロンプトから外してよいもの）
+        self.decided_rules = frozenset(r.rule for r in self._rules if not r.prescreen)
+
+    def _matches(self, norm: str) -> Iterator[tuple[int, str, str, int]]:
+        for term_idx, end in self._automaton.find(norm):
+            rule_idx, term, replacement = self._terms[term_idx]
+            yield rule_idx, term, replacement, end
+        if self._regex is not None:
+            for m in self._regex.finditer(norm):
+                yield self._regex_rules[m.lastgroup], m.group(), "", m.end()
+
+    def scan_slide(self, slide_number: int, text: str) -> List[AnalysisItem]:
+        items: list[AnalysisItem] = []
+        seen: set[tuple[int, str]] = set()
+        norm = _norm(text)
+        for rule_idx, match, replacement, end in self._matches(norm):
+            rule = self._rules[rule_idx]
+            key = (rule_idx, _norm(match))
+            if key in seen:
+                continue
+            if rule.negations:
+                stop = _SENTENCE_END.search(norm, end)
+                tail = norm[end:stop.start() if stop else len(norm)]
+            else:
+                tail = ""
+            if rule.skips(key[1], tail):
+                continue
+            seen.add(key)
+            items.append(
+                AnalysisItem(
+                    slideNumber=slide_number,
+                    category=rule.category,
+                    basis=rule.rule,
+                    issue=rule.issue.format(match=match, replacement=replacement),
+                    suggestion=rule.suggestion.format(match=match, replacement=replacement or "成分名"),
+                    correctionType=rule.correction_type,
+                )
+            )
+        return items
+
+    def drop_confirmed(self, items: List[AnalysisItem], llm_items: List[AnalysisItem]) -> List[AnalysisItem]:
+        """候補のみのルールの指摘のうち、LLM が同じスライド・同じルール番号で指摘したものを除く。
+
+        候補は判定を LLM に任せているので、LLM も指摘していれば同じ問題が二重に並ぶ。"""
+        reported = {(i.slideNumber, basis_rule(i.basis)) for i in llm_items}
+        return [
+            i for i in items if i.basis in self.decided_rules or (i.slideNumber, i.basis) not in reported
+        ]
+
+    def scan_xml(self, xml_str: str) -> List[AnalysisItem]:
+        """コンバータの XML（<Slide number=...> の並び）を走査する。"""
+        items: list[AnalysisItem] = []
+        for slide in ET.fromstring(xml_str).iter("Slide"):
+            parts = [t.text or "" for t in slide.iter("Text")]
+            parts += [img.get("caption", "") for img in slide.iter("Image")]
+            items.extend(self.scan_slide(int(slide.get("number", "0") or 0), "\n".join(parts)))
+        return items
+
+
+_BASIS_RULE = re.compile(r"\s*(?:ルール|Rule|rule)?\s*(\d+)")
+
+
+def basis_rule(basis: str | None) -> str | None:
+    """LLM の basis（"4"、"ルール4: ..." 等）から先頭のルール番号を取り出す。"""
+    m = _BASIS_RULE.match(basis or "")
+    return m.group(1) if m else None
+
+
+def remaining_rules(rules_text: str, covered: frozenset[str]) -> str | None:
+    """番号付きルール文から covered の番号を除いたものを返す。残りがなければ None。"""
+    kept = []
+    for line in rules_text.splitlines():
+        m = re.match(r"\s*(\d+)\.", line)
+        if m and m.group(1) in covered:
+            continue
+        if line.strip():
+            kept.append(line)
+    return "\n".join(kept) if kept else None
+
+
+_engine: RuleEngine | None = None
+_fingerprint: str | None = None
+
+
+def _load_dictionary() -> dict:
+    if settings.RULE_DICTIONARY_PATH:
+        with open(settings.RULE_DICTIONARY_PATH, encoding="utf-8") as fh:
+            return json.load(fh)
+    return DEFAULT_DICTIONARY
+
+
+def get_rule_engine() -> RuleEngine:
+    global _engine, _fingerprint
+    if _engine is None:
+        dictionary = _load_dictionary()
+        _fingerprint = hashlib.sha256(
+            json.dumps(dictionary, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+        _engine = RuleEngine(dictionary)
+    return _engine
+
+
+def engine_fingerprint() -> str:
+    """辞書内容のハッシュ（キャッシュキーに含め、辞書を変えたら結果を取り直す）。"""
+    get_rule_engine()
+    return _fingerprint or ""
@@ -1,4 +1,4 @@
-from typing import Literal, Optional
+from typing import Annotated, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -33,3 +33,46 @@ class AnalysisItemUpdate(BaseModel):
     suggestion: Optional[str] = None
     correctionType: Optional[CorrectionType] = None
 
+
+class AnalysisItemCreateOp(AnalysisItemCreate):
+    op: Literal["create"]
+
+
+class AnalysisItemUpdateOp(AnalysisItemUpdate):
+    op: Literal["update"]
+    id: int
+
+
+class AnalysisItemDeleteOp(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+
+AnalysisItemOp = Annotated[
+    Union[AnalysisItemCreateOp, AnalysisItemUpdateOp, AnalysisItemDeleteOp], Field(discriminator="op")
+]
+
+
+class AnalysisItemsBatchRequest(BaseModel):
+    # 同じ id への更新は順に重ね、削除と更新が両方あれば削除する
+    operations: list[AnalysisItemOp] = Field(..., min_length=1, max_length=5000)
+
+
+class AnalyzeBatchRequest(BaseModel):
+    file_ids: list[int] = Field(..., min_length=1)
+    rules: Optional[str] = None
+    rule_set_id: Optional[int] = None  # rules の代わりに登録済みルールセットを使う
+    mode: Optional[str] = None
+    force: bool = False
+    sharded: Optional[bool] = None
+    incremental: Optional[bool] = None
+
+
+class RuleSetCreate(BaseModel):
+    name: str = Field(..., min_length=1)
+    rules: str = Field(..., min_length=1)
+
+
+class RuleSetUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1)
+    rules: Optional[str] = Field(None, min_length=1)
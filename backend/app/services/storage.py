@@ -0,0 +1,114 @@
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス内のロックだけになる
+    fcntl = None
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+
+def blob_rel_path(digest: str) -> str:
+    return f"{digest[:2]}/{digest}.pptx"
+
+
+def _open_temp(storage_dir: str):
+    tmp_dir = os.path.join(storage_dir, ".tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+_stripe_locks: dict[str, threading.Lock] = {}
+_stripe_locks_guard = threading.Lock()
+
+
+@contextmanager
+def blob_lock(storage_dir: str, digest: str):
+    """同じ blob の配置（＋File 行の作成）と削除（＋参照数の確認）を直列化する。
+
+    ロックは digest の先頭 2 文字単位。プロセス内はスレッドロック、
+    同じ STORAGE_DIR を共有する他のワーカープロセスとは flock で排他する。"""
+    stripe = digest[:2]
+    with _stripe_locks_guard:
+        lock = _stripe_locks.setdefault(stripe, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        lock_dir = os.path.join(storage_dir, ".locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{stripe}.lock"), "a+b") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def commit_blob(storage_dir: str, tmp_path: str, digest: str) -> str:
+    """一時ファイルを ``digest[:2]/digest.pptx`` へ移動して相対パスを返す。
+    既に同じ blob があれば一時ファイルは捨てる。``blob_lock`` を取った状態で呼ぶこと。"""
+    rel_path = blob_rel_path(digest)
+    abs_path = os.path.join(storage_dir, rel_path)
+    if os.path.exists(abs_path):
+        os.remove(tmp_path)
+        return rel_path
+    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    # 同一ファイルシステム内の rename はアトミック（途中状態のファイルが見えない）
+    os.replace(tmp_path, abs_path)
+    return rel_path
+
+
+def discard_temp(tmp_path: str) -> None:
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload(file: UploadFile, storage_dir: str) -> tuple[str, str, int]:
+    """アップロードをチャンク単位で一時ファイルへ書き出しながら sha256 を計算する。
+    戻り値は (一時ファイルのパス, digest, バイト数)。配置は ``commit_blob`` で行う。"""
+    h = hashlib.sha256()
+    size = 0
+    out, tmp_path = await run_in_threadpool(_open_temp, storage_dir)
+    try:
+        while True:
+            chunk = await file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            size += len(chunk)
+            await run_in_threadpool(out.write, chunk)
+        await run_in_threadpool(out.close)
+    except BaseException:
+        out.close()
+        discard_temp(tmp_path)
+        raise
+    return tmp_path, h.hexdigest(), size
+
+
+def sha256_of_stream(fh) -> str:
+    """ファイルオブジェクトを先頭からチャンクで読んで sha256 を返す（読み終えたら先頭に戻す）。"""
+    h = hashlib.sha256()
+    fh.seek(0)
+    for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+        h.update(chunk)
+    fh.seek(0)
+    return h.hexdigest()
+
+
+def remove_blob(storage_dir: str, rel_path: str) -> None:
+    """blob を消す。``blob_lock`` を取った状態で、参照する File 行が無いことを確かめてから呼ぶこと。"""
+    try:
+        os.remove(os.path.join(storage_dir, rel_path))
+    except FileNotFoundError:
+        pass
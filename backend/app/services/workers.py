@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+
+from app.core.settings import settings
+from app.services.metrics import ANALYSES_IN_FLIGHT, stage
+from app.services.pptx_parser import PptxConverter
+from app.services.xml_cache import get_xml_cache
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+_parse_pool: Executor | None = None
+_analyze_semaphore: asyncio.Semaphore | None = None
+
+
+def _convert_path(path: str, pretty: bool) -> str:
+    # プロセスプールへ渡すためモジュールレベルの関数にしておく
+    return PptxConverter.convert_to_xml(path, pretty=pretty)
+
+
+def get_parse_pool() -> Executor:
+    global _parse_pool
+    if _parse_pool is None:
+        workers = settings.PARSE_WORKERS if settings.PARSE_WORKERS > 0 else (os.cpu_count() or 1)
+        if settings.PARSE_EXECUTOR.lower() == "thread":
+            _parse_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pptx-parse")
+        else:
+            # fork だと親のスレッド・DB コネクションを引き継ぐため spawn を使う
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _parse_pool
+
+
+def shutdown_pools() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def _discard_parse_pool(broken: Executor) -> None:
+    # 同時に失敗した別のリクエストが作り直した後なら、新しいプールは閉じない
+    if _parse_pool is broken:
+        shutdown_pools()
+
+
+async def _run_in_parse_pool(path: str, pretty: bool) -> str:
+    """変換をプールで実行する。ワーカーが死んで壊れたプールは捨て、新しいプールで 1 回だけやり直す。
+
+    やり直しでも壊れた場合は BrokenProcessPool をそのまま送出する（呼び出し側でそのリクエストだけ失敗させる）。
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = get_parse_pool()
+        try:
+            return await loop.run_in_executor(pool, _convert_path, path, pretty)
+        except BrokenProcessPool:
+            logger.warning("parse worker pool is broken; recreating (attempt %d)", attempt + 1)
+            _discard_parse_pool(pool)
+            if attempt:
+                raise
+    raise AssertionError("unreachable")
+
+
+async def convert_to_xml_async(path: str, pretty: bool = False, sha256: str | None = None) -> str:
+    """PPTX → XML 変換をワーカープールで実行する（CPU バウンドのためイベントループ外で）。
+
+    sha256 を渡すと XML キャッシュを参照し、ヒットすれば PPTX を開かない。
+    """
+    with stage("parse"):
+        return await _convert_to_xml(path, pretty, sha256)
+
+
+async def _convert_to_xml(path: str, pretty: bool, sha256: str | None) -> str:
+    use_cache = bool(sha256) and settings.XML_CACHE_ENABLED
+    if use_cache:
+        cache = get_xml_cache()
+        opts = {"pretty": pretty, "include_notes": settings.PPTX_INCLUDE_NOTES}
+        cached = await run_in_threadpool(cache.get, sha256, **opts)
+        if cached is not None:
+            return cached
+    xml_str = await _run_in_parse_pool(path, pretty)
+    if use_cache:
+        await run_in_threadpool(cache.put, sha256, xml_str, **opts)
+    return xml_str
+
+
+@asynccontextmanager
+async def analysis_slot():
+    """ワーカープロセス全体での解析同時実行数を ANALYZE_MAX_CONCURRENCY に制限する。"""
+    global _analyze_semaphore
+    if _analyze_semaphore is None:
+        _analyze_semaphore = asyncio.Semaphore(max(settings.ANALYZE_MAX_CONCURRENCY, 1))
+    with stage("queue"):
+        await _analyze_semaphore.acquire()
+    ANALYSES_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        ANALYSES_IN_FLIGHT.dec()
+        _analyze_semaphore.release()
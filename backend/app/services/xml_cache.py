@@ -0,0 +1,148 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.core.settings import settings
+from app.services import pptx_parser, pptx_zip
+
+# 抽出ロジックを変えたら上げる。加えて抽出モジュールのソースハッシュもキーに含めるので、
+# コードが変わればバージョンを上げ忘れても古いエントリは参照されなくなる。
+EXTRACTOR_VERSION = "1"
+
+# 総サイズは書き込みごとに加算して追跡し、ディレクトリ走査は上限超過時とこの間隔ごとの再集計に限る
+# （他プロセスの書き込み分はこの再集計で取り込まれる）。
+RESCAN_INTERVAL_SECONDS = 300
+# 上限を超えたらこの割合まで削る。上限付近で書き込みのたびに走査が走るのを防ぐ。
+EVICT_LOW_WATERMARK = 0.9
+
+
+def _extractor_fingerprint() -> str:
+    h = hashlib.sha256(EXTRACTOR_VERSION.encode("utf-8"))
+    for mod in (pptx_parser, pptx_zip):
+        h.update(Path(mod.__file__).read_bytes())
+    return h.hexdigest()[:16]
+
+
+class XmlCache:
+    """sha256 をキーにしたコンバータ出力のディスクキャッシュ（総サイズ上限つき LRU）。
+
+    blob は sha256 で不変なので、同じ抽出器・同じオプションなら結果も不変。
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fingerprint = _extractor_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None  # 未集計なら None
+        self._scanned_at = 0.0
+
+    def _path(self, sha256: str, *, pretty: bool, include_notes: bool, encoding: str) -> str:
+        # バックエンドごとに出力が異なりうるので、PPTX_BACKEND を切り替えたら別エントリを引く
+        backend = (settings.PPTX_BACKEND or "python-pptx").lower()
+        opts = f"{self.fingerprint}-{backend}-{'p' if pretty else 'c'}{'n' if include_notes else ''}-{encoding}"
+        return os.path.join(self.root, sha256[:2], f"{sha256}.{opts}.xml")
+
+    def get(self, sha256: str, *, pretty: bool, include_notes: bool, encoding: str = "utf-8") -> str | None:
+        path = self._path(sha256, pretty=pretty, include_notes=include_notes, encoding=encoding)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path)  # LRU のため最終利用時刻を更新
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data.decode(encoding)
+
+    def put(self, sha256: str, xml_str: str, *, pretty: bool, include_notes: bool, encoding: str = "utf-8") -> None:
+        path = self._path(sha256, pretty=pretty, include_notes=include_notes, encoding=encoding)
+        data = xml_str.encode(encoding)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            replaced = os.stat(path).st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.writes += 1
+            if self._total_bytes is not None:
+                self._total_bytes += len(data) - replaced
+            need_scan = (
+                self._total_bytes is None
+                or self._total_bytes > self.max_bytes
+                or time.monotonic() - self._scanned_at >= RESCAN_INTERVAL_SECONDS
+            )
+        if need_scan:
+            self.evict()
+
+    def evict(self) -> int:
+        """キャッシュを走査して総サイズを再集計し、上限を超えていれば古い順に削除する。"""
+        entries = []
+        total = 0
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".xml"):
+                    continue
+                p = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+        removed = 0
+        if total > self.max_bytes:
+            target = int(self.max_bytes * EVICT_LOW_WATERMARK)
+            entries.sort()
+            for _, size, p in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        with self._lock:
+            self.evictions += removed
+            self._total_bytes = total
+            self._scanned_at = time.monotonic()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": settings.XML_CACHE_ENABLED,
+                "extractor": self.fingerprint,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes,
+            }
+
+
+_cache: XmlCache | None = None
+
+
+def get_xml_cache() -> XmlCache:
+    global _cache
+    if _cache is None:
+        root = settings.XML_CACHE_DIR or os.path.join(settings.STORAGE_DIR, "xmlcache")
+        _cache = XmlCache(root, settings.XML_CACHE_MAX_BYTES)
+    return _cache
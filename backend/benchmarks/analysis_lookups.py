@@ -0,0 +1,144 @@
+"""大きな DB（既定 10 万解析・500 万指摘）で解析の参照系エンドポイントを測る。
+
+  list     GET /files/{id}/analyses（指摘数つきの一覧）
+  latest   GET /files/{id}/analyses/latest
+  detail   GET /analyses/{id}
+
+応答キャッシュは毎回空にし、DB からの組み立てを測る。--drop-indexes を付けると
+analyses / analysis_items の参照用インデックスを落とした状態と比べられる。
+各クエリの EXPLAIN QUERY PLAN（SQLite のみ）も表示する。
+
+    cd backend && python -m benchmarks.analysis_lookups --analyses 100000 --items-per-analysis 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+LOOKUP_INDEXES = ("ix_analyses_file_user_created_id", "ix_analyses_file_id", "ix_analysis_items_analysis_id")
+
+
+def _seed(engine, *, files: int, analyses: int, items_per_analysis: int, chunk: int = 50_000) -> None:
+    from app.models import Analysis, AnalysisItemRow, File
+    from sqlalchemy import insert
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(File),
+            [
+                {"user_id": "localuser", "filename": f"deck{i}.pptx", "path": "x", "sha256": "0" * 64, "size_bytes": 0}
+                for i in range(files)
+            ],
+        )
+        conn.execute(
+            insert(Analysis),
+            [
+                {"user_id": "localuser", "file_id": i % files + 1, "status": "succeeded", "model": "mock"}
+                for i in range(analyses)
+            ],
+        )
+    total = analyses * items_per_analysis
+    row = {"slide_number": 1, "category": "表現", "basis": "6", "issue": "誇大な表現", "suggestion": "慎重な表現へ"}
+    for start in range(0, total, chunk):
+        with engine.begin() as conn:
+            conn.execute(
+                insert(AnalysisItemRow),
+                [{"analysis_id": n // items_per_analysis + 1, **row} for n in range(start, min(start + chunk, total))],
+            )
+
+
+def _explain(engine, file_id: int, analysis_id: int) -> None:
+    from app.crud import count_items_by_file, find_latest_analysis, list_analysis_items
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    captured: list[tuple[str, tuple]] = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, _many):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    with Session(engine) as db:
+        find_latest_analysis(db, file_id=file_id, user_id="localuser")
+        count_items_by_file(db, file_id=file_id, user_id="localuser")
+        list_analysis_items(db, analysis_id)
+    event.remove(engine, "before_cursor_execute", capture)
+    with engine.connect() as conn:
+        for statement, parameters in captured:
+            print("  " + " ".join(statement.split())[:110])
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            for r in plan:
+                print(f"      {r[-1]}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--analyses", type=int, default=100_000)
+    ap.add_argument("--items-per-analysis", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--drop-indexes", action="store_true", help="参照用インデックスを落として測る")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.db import engine, init_db
+    from app.main import app
+    from app.services.response_cache import get_response_cache
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    init_db()
+    t0 = time.perf_counter()
+    _seed(engine, files=args.files, analyses=args.analyses, items_per_analysis=args.items_per_analysis)
+    print(f"seeded {args.analyses} analyses / {args.analyses * args.items_per_analysis} items "
+          f"in {time.perf_counter() - t0:.1f} s")
+    with engine.begin() as conn:
+        if args.drop_indexes:
+            for name in LOOKUP_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("ANALYZE"))
+
+    rng = random.Random(0)
+    file_ids = [rng.randint(1, args.files) for _ in range(args.repeat)]
+    analysis_ids = [rng.randint(1, args.analyses) for _ in range(args.repeat)]
+    cache = get_response_cache()
+
+    with TestClient(app) as client:
+        def run(urls: list[str]) -> tuple[float, float]:
+            samples = []
+            for url in urls:
+                cache.clear()
+                t = time.perf_counter()
+                client.get(url).raise_for_status()
+                samples.append(time.perf_counter() - t)
+            samples.sort()
+            return statistics.median(samples) * 1000, samples[int(len(samples) * 0.95) - 1] * 1000
+
+        print(f"{engine.dialect.name}, indexes {'dropped' if args.drop_indexes else 'present'}, "
+              f"{args.repeat} requests each")
+        print(f"{'endpoint':<8} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, urls in (
+            ("list", [f"/files/{f}/analyses" for f in file_ids]),
+            ("latest", [f"/files/{f}/analyses/latest" for f in file_ids]),
+            ("detail", [f"/analyses/{a}" for a in analysis_ids]),
+        ):
+            p50, p95 = run(urls)
+            print(f"{name:<8} {p50:>9.2f} {p95:>9.2f}")
+
+    if engine.dialect.name == "sqlite":
+        print("query plans")
+        _explain(engine, file_ids[0], analysis_ids[0])
+
+
+if __name__ == "__main__":
+    main()
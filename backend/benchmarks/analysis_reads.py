@@ -0,0 +1,97 @@
+"""解析結果の GET /analyses/{id} を、指摘の多い解析 1 件で比べる。
+
+  build   応答キャッシュなし（毎回指摘を読み込んでシリアライズ）
+  cached  プロセス内 LRU にヒット（Analysis 1 行だけ読む）
+  304     If-None-Match が一致（ボディなし）
+
+    cd backend && python -m benchmarks.analysis_reads --items 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _seed(n: int) -> int:
+    from app.crud import create_analysis_with_items, create_file
+    from app.db import SessionLocal
+    from app.services.schemas import AnalysisItem
+
+    items = [
+        AnalysisItem(
+            slideNumber=i % 40 + 1,
+            category="表現",
+            basis=str(i % 9 + 1),
+            issue="「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
+            suggestion="「血糖コントロールの改善が期待される」といった、慎重な表現への修正をお勧めいたします。",
+            correctionType="任意",
+        )
+        for i in range(n)
+    ]
+    with SessionLocal() as db:
+        f = create_file(db, user_id="localuser", filename="bench.pptx", path="x", sha256="0" * 64, size_bytes=0)
+        return create_analysis_with_items(db, user_id="localuser", file_id=f.id, model="mock", items=items).id
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.db import engine
+    from app.main import app
+    from app.services.response_cache import get_response_cache
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    with TestClient(app) as client:
+        analysis_id = _seed(args.items)
+        url = f"/analyses/{analysis_id}"
+        first = client.get(url)
+        etag, size = first.headers["etag"], len(first.content)
+        cache = get_response_cache()
+
+        def run(headers: dict | None, clear: bool) -> tuple[float, int]:
+            nonlocal statements
+            samples = []
+            for _ in range(args.repeat):
+                if clear:
+                    cache.clear()
+                statements = 0
+                t0 = time.perf_counter()
+                r = client.get(url, headers=headers)
+                samples.append(time.perf_counter() - t0)
+                assert r.status_code in (200, 304), r.status_code
+            return statistics.median(samples) * 1000, statements
+
+        print(f"{engine.dialect.name}, {args.items} items, body {size / 1024:.0f} KiB, median of {args.repeat}")
+        print(f"{'case':<8} {'ms':>8} {'stmts':>6}")
+        for name, headers, clear in (
+            ("build", None, True),
+            ("cached", None, False),
+            ("304", {"If-None-Match": etag}, False),
+        ):
+            ms, stmts = run(headers, clear)
+            print(f"{name:<8} {ms:>8.2f} {stmts:>6}")
+
+
+if __name__ == "__main__":
+    main()
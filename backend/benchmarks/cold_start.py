@@ -0,0 +1,111 @@
+"""起動時間（コールドスタート）を測る。
+
+  import      新しいプロセスで `import app.main` にかかる時間と、python -X importtime の内訳上位
+  health      uvicorn を起動してから最初の GET /health が 200 を返すまで
+              （1 回目は空の DB = マイグレーションあり、2 回目以降は最新の DB = 版の確認のみ）
+
+    cd backend && python -m benchmarks.cold_start --repeat 5
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def bench_env(tmp: Path) -> dict:
+    env = dict(os.environ)
+    env.update(
+        DB_URL=f"sqlite:///{tmp}/cold.db",
+        STORAGE_DIR=str(tmp / "storage"),
+        ANALYZE_MODE="mock",
+        JOB_WORKERS="0",
+    )
+    return env
+
+
+def import_seconds(env: dict) -> float:
+    """新しいインタプリタで app.main を import する時間（インタプリタ自体の起動は除く）。"""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(env: dict, top: int) -> list[tuple[str, float]]:
+    """python -X importtime の結果から、app 以外のトップレベルパッケージを累積時間の順に返す（ms）。"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    )
+    totals: dict[str, float] = {}
+    for line in out.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        # トップレベルのパッケージだけ（サブモジュールはその累積時間に含まれる）
+        if m and "." not in m.group(3) and m.group(3) != "app":
+            totals[m.group(3)] = int(m.group(2)) / 1000
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def health_seconds(env: dict, timeout: float = 30.0) -> float:
+    """uvicorn を起動し、/health が 200 を返すまでの秒数を返す（計測後に停止する）。"""
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+            time.sleep(0.005)
+        raise TimeoutError("/health did not respond")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="表示する import 内訳の件数")
+    args = ap.parse_args()
+
+    env = bench_env(Path(tempfile.mkdtemp(prefix="bench-")))
+
+    samples = [import_seconds(env) for _ in range(args.repeat)]
+    print(f"import app.main   median {statistics.median(samples) * 1000:7.1f} ms  min {min(samples) * 1000:7.1f} ms")
+    for name, ms in import_breakdown(env, args.top):
+        print(f"    {name:<24}{ms:8.1f} ms")
+
+    first = health_seconds(env)
+    print(f"first /health     {first * 1000:7.1f} ms  (empty DB, migrations applied)")
+    samples = [health_seconds(env) for _ in range(args.repeat)]
+    print(f"first /health     median {statistics.median(samples) * 1000:7.1f} ms  min {min(samples) * 1000:7.1f} ms"
+          "  (up-to-date DB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""PptxConverter の python-pptx バックエンドと zip バックエンドを比較する。
+
+出力が同一であることを確認した上で、各デッキの変換時間（中央値）を表示する。
+
+    cd backend && python -m benchmarks.converter_backends --slides 20 80 200
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.pptx_parser import PptxConverter  # noqa: E402
+from benchmarks.synthetic import make_deck  # noqa: E402
+
+DECK = Path(__file__).resolve().parent.parent / "tests" / "data" / "dummy_slide.pptx"
+
+
+def _time(path: Path, backend: str, pretty: bool, repeat: int) -> tuple[float, str]:
+    samples = []
+    out = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = PptxConverter.convert_to_xml(str(path), pretty=pretty, backend=backend, include_notes=False)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--slides", type=int, nargs="*", default=[20, 80])
+    ap.add_argument("--shapes", type=int, default=8)
+    ap.add_argument("--images", type=int, default=2)
+    ap.add_argument("--image-px", type=int, default=512)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    decks = [("dummy_slide.pptx", DECK)]
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    for n in args.slides:
+        path = make_deck(tmp / f"synthetic_{n}.pptx", slides=n, shapes=args.shapes, images=args.images, image_px=args.image_px)
+        decks.append((f"synthetic {n} slides", path))
+
+    print(f"{'deck':<24}{'MB':>8}{'pretty':>8}{'python-pptx ms':>16}{'zip ms':>10}{'speedup':>9}")
+    for label, path in decks:
+        mb = path.stat().st_size / 1e6
+        for pretty in (True, False):
+            t_pptx, out_pptx = _time(path, "python-pptx", pretty, args.repeat)
+            t_zip, out_zip = _time(path, "zip", pretty, args.repeat)
+            if out_pptx != out_zip:
+                raise SystemExit(f"output mismatch for {label} (pretty={pretty})")
+            print(
+                f"{label:<24}{mb:>8.1f}{str(pretty):>8}{t_pptx * 1000:>16.1f}{t_zip * 1000:>10.1f}"
+                f"{t_pptx / t_zip:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
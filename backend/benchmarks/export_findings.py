@@ -0,0 +1,129 @@
+"""指摘エクスポート（GET /exports/findings の中身）のメモリ使用量と速度を測る。
+
+--rows 件の指摘を投入し、全体の 1/10 と全件をそれぞれ CSV / XLSX に書き出して
+子プロセスの最大 RSS と最初の塊が出るまでの時間を比べる。どちらも行数によらずほぼ一定なら
+ストリーミングできている（Linux / macOS 用）。
+
+    cd backend && python -m benchmarks.export_findings --rows 1000000
+    DB_URL=postgresql+psycopg2://... python -m benchmarks.export_findings --rows 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ITEMS_PER_ANALYSIS = 1000
+
+
+def _seed(rows: int, files: int, out) -> None:
+    """子プロセスで投入し（親の RSS を膨らませないため）、作成した file id を out に送る。"""
+    from app.crud import create_file
+    from app.db import SessionLocal
+    from app.models import Analysis, AnalysisItemRow
+    from sqlalchemy import insert, select
+
+    with SessionLocal() as db:
+        file_ids = [
+            create_file(db, user_id="localuser", filename=f"deck{i}.pptx", path="x", sha256=f"{i:064d}", size_bytes=0).id
+            for i in range(files)
+        ]
+        n_analyses = max(rows // ITEMS_PER_ANALYSIS, 1)
+        db.execute(
+            insert(Analysis),
+            [
+                {"user_id": "localuser", "file_id": file_ids[i % files], "model": "mock", "status": "succeeded"}
+                for i in range(n_analyses)
+            ],
+        )
+        analysis_ids = db.execute(select(Analysis.id).order_by(Analysis.id)).scalars().all()
+        done = 0
+        for aid in analysis_ids:
+            n = min(ITEMS_PER_ANALYSIS, rows - done)
+            if n <= 0:
+                break
+            db.execute(
+                insert(AnalysisItemRow),
+                [
+                    {
+                        "analysis_id": aid,
+                        "slide_number": j % 40 + 1,
+                        "category": "表現",
+                        "basis": str(j % 9 + 1),
+                        "issue": "「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
+                        "suggestion": "「血糖コントロールの改善が期待される」といった、慎重な表現への修正をお勧めいたします。",
+                        "correction_type": "任意",
+                    }
+                    for j in range(n)
+                ],
+            )
+            done += n
+        db.commit()
+    out.send(file_ids)
+
+
+def _export(fmt: str, file_ids: list[int] | None, out) -> None:
+    """子プロセスで書き出し、(バイト数, 最初の塊までの秒, 秒, 最大 RSS MiB) を out に送る。"""
+    from app.crud import iter_findings
+    from app.db import SessionLocal
+    from app.services.export import iter_csv, iter_xlsx
+
+    t0 = time.perf_counter()
+    size = 0
+    first = None
+    with SessionLocal() as db:
+        rows = iter_findings(db, user_id="localuser", file_ids=file_ids, latest_only=False)
+        for chunk in (iter_csv(rows) if fmt == "csv" else iter_xlsx(rows)):
+            if first is None:
+                first = time.perf_counter() - t0
+            size += len(chunk)
+    elapsed = time.perf_counter() - t0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss は Linux では KiB、macOS ではバイト
+    out.send((size, first or 0.0, elapsed, maxrss / (2**20 if sys.platform == "darwin" else 2**10)))
+
+
+def _in_child(ctx, target, *args):
+    recv, send = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=target, args=(*args, send))
+    p.start()
+    result = recv.recv()
+    p.join()
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--files", type=int, default=10)
+    ap.add_argument("--formats", default="csv,xlsx")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.db import engine, init_db
+
+    init_db()
+    engine.dispose()
+    ctx = multiprocessing.get_context("fork")
+    t0 = time.perf_counter()
+    file_ids = _in_child(ctx, _seed, args.rows, args.files)
+    print(f"{engine.dialect.name}: seeded {args.rows} items in {time.perf_counter() - t0:.1f}s")
+
+    for fmt in args.formats.split(","):
+        for label, ids in (("1/10", file_ids[:1]), ("all", None)):
+            size, first, elapsed, rss = _in_child(ctx, _export, fmt, ids)
+            print(
+                f"  {fmt:<4} {label:<5} {size / 2**20:8.1f} MiB in {elapsed:6.1f}s"
+                f"  first byte={first:6.2f}s  max RSS={rss:6.1f} MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Gemini の generateContent を模したローカル HTTP サーバー（課金なしの試験用）。
+
+プロンプト中の <Slide number="N"> ごとに AnalysisItem を 1 件返す。遅延・5xx・429 を注入できる。
+遅延は uniform（latency-ms ± jitter-ms）か lognormal（中央値 latency-ms・形状 latency-sigma。
+実際の LLM のように裾の長い分布）で選ぶ。GET /_stats で受けた件数を返す。
+アプリ側は GEMINI_BASE_URL=http://127.0.0.1:<port> と任意の GEMINI_API_KEY で向ける。
+
+    cd backend && python -m benchmarks.fake_gemini --port 8765 --latency-ms 800 --error-rate 0.05 --rate-429 0.05
+    cd backend && python -m benchmarks.fake_gemini --latency-dist lognormal --latency-ms 800 --latency-sigma 0.6
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+_SLIDE = re.compile(r'<Slide number="(\d+)"')
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 0.0  # uniform では平均、lognormal では中央値
+    jitter_ms: float = 0.0
+    latency_dist: str = "uniform"  # uniform | lognormal
+    latency_sigma: float = 0.5  # lognormal の形状（大きいほど裾が長い）
+    error_rate: float = 0.0  # 503 を返す割合
+    rate_429: float = 0.0  # 429 を返す割合
+    seed: int | None = None
+
+
+def _items(prompt: str) -> list[dict]:
+    return [
+        {
+            "slideNumber": int(n),
+            "category": "表現",
+            "basis": "6",
+            "issue": "「効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
+            "suggestion": "「改善が期待される」など、慎重な表現へのご修正をお勧めいたします。",
+            "correctionType": "任意",
+        }
+        for n in dict.fromkeys(_SLIDE.findall(prompt))
+    ]
+
+
+def _delay_seconds(cfg: FakeConfig, rnd: random.Random) -> float:
+    if cfg.latency_ms <= 0:
+        return 0.0
+    if cfg.latency_dist == "lognormal":
+        return rnd.lognormvariate(math.log(cfg.latency_ms), cfg.latency_sigma) / 1000
+    return max(cfg.latency_ms + rnd.uniform(-cfg.jitter_ms, cfg.jitter_ms), 0.0) / 1000
+
+
+def _error(code: int, status: str, message: str) -> JSONResponse:
+    return JSONResponse(status_code=code, content={"error": {"code": code, "message": message, "status": status}})
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="fake gemini")
+    rnd = random.Random(config.seed)
+    app.state.config = config
+    app.state.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "client_ports": set()}
+
+    @app.post("/{version}/models/{model}:generateContent")
+    async def generate_content(version: str, model: str, request: Request):
+        cfg: FakeConfig = app.state.config
+        stats = app.state.stats
+        stats["requests"] += 1
+        if request.client:
+            stats["client_ports"].add(request.client.port)
+        body = await request.json()
+        prompt = "".join(
+            part.get("text", "") for c in body.get("contents", []) for part in c.get("parts", [])
+        )
+        delay = _delay_seconds(cfg, rnd)
+        if delay:
+            await asyncio.sleep(delay)
+
+        r = rnd.random()
+        if r < cfg.rate_429:
+            stats["rate_limited"] += 1
+            return _error(429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (fake).")
+        if r < cfg.rate_429 + cfg.error_rate:
+            stats["errors"] += 1
+            return _error(503, "UNAVAILABLE", "The model is overloaded (fake).")
+
+        text = json.dumps(_items(prompt), ensure_ascii=False)
+        prompt_tokens = len(prompt) // 2
+        return {
+            "candidates": [
+                {"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}
+            ],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": len(text) // 2,
+                "totalTokenCount": prompt_tokens + len(text) // 2,
+            },
+            "modelVersion": model,
+        }
+
+    @app.get("/_stats")
+    async def get_stats():
+        stats = app.state.stats
+        return {
+            "requests": stats["requests"],
+            "errors": stats["errors"],
+            "rate_limited": stats["rate_limited"],
+            "connections": len(stats["client_ports"]),
+        }
+
+    return app
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--latency-dist", choices=("uniform", "lognormal"), default="uniform")
+    ap.add_argument("--latency-sigma", type=float, default=0.5)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    import uvicorn
+
+    config = FakeConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        latency_dist=args.latency_dist,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_429=args.rate_429,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
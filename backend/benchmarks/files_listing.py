@@ -0,0 +1,103 @@
+"""GET /files のクエリ数とレイテンシを大量データで測る。
+
+ファイル数に関係なくクエリ数が一定（N+1 が無い）であることを確認する。
+
+    cd backend && python -m benchmarks.files_listing --files 10000 --analyses 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--files", type=int, default=10000)
+    ap.add_argument("--analyses", type=int, default=3, help="ファイルあたりの解析数")
+    ap.add_argument("--page", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    os.environ["JOB_WORKERS"] = "0"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.api.routes import FAKE_USER_ID
+    from app.db import engine
+    from app.main import app
+    from app.models import Analysis, File
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, insert
+
+    with TestClient(app) as client:
+        with engine.begin() as conn:
+            conn.execute(
+                insert(File),
+                [
+                    {
+                        "user_id": FAKE_USER_ID,
+                        "filename": f"deck_{i}.pptx",
+                        "path": f"00/{i:064d}.pptx",
+                        "sha256": f"{i:064d}",
+                        "size_bytes": 1000 + i,
+                    }
+                    for i in range(args.files)
+                ],
+            )
+            conn.execute(
+                insert(Analysis),
+                [
+                    {"user_id": FAKE_USER_ID, "file_id": f + 1, "model": "mock", "status": "succeeded"}
+                    for f in range(args.files)
+                    for _ in range(args.analyses if f % 2 == 0 else 0)
+                ],
+            )
+
+        queries = 0
+
+        def count(*_):
+            nonlocal queries
+            queries += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+
+        def measure(params: dict) -> tuple[float, int, int]:
+            nonlocal queries
+            samples, n = [], 0
+            for _ in range(args.repeat):
+                queries = 0
+                t0 = time.perf_counter()
+                r = client.get("/files", params=params)
+                samples.append(time.perf_counter() - t0)
+                r.raise_for_status()
+                n = len(r.json())
+            return statistics.median(samples), queries, n
+
+        print(f"{args.files} files × {args.analyses} analyses (half of the files analyzed)")
+        for label, params in [("all", {}), (f"page limit={args.page}", {"limit": args.page})]:
+            t, q, n = measure(params)
+            print(f"  {label:<20} rows={n:<6} queries={q:<3} median={t * 1000:.1f} ms")
+
+        # 最後のページまでたどってもクエリ数はページあたり一定
+        cursor, pages, total_q = None, 0, 0
+        t0 = time.perf_counter()
+        while True:
+            queries = 0
+            params = {"limit": args.page, **({"after": cursor} if cursor else {})}
+            r = client.get("/files", params=params)
+            total_q += queries
+            pages += 1
+            cursor = r.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        dt = time.perf_counter() - t0
+        print(f"  {'walk all pages':<20} pages={pages:<5} queries/page={total_q / pages:.1f} total={dt * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""偽 Gemini サーバーに対して共有クライアントの再試行・流量制限・サーキットブレーカーを確認する。
+
+シナリオ:
+  healthy   正常応答の並列呼び出し
+  reuse     逐次呼び出しで接続（クライアント側ポート）が使い回されること
+  flaky     30% を 503/429 にしても再試行で全件成功すること
+  outage    全件 503。ブレーカーが開いた後の呼び出しが即座に失敗すること
+  rpm       GEMINI_RPM を超えた分の送信が補充を待つこと（20 RPM で 22 件 → 最後の 2 件が 3 秒・6 秒待つ）
+
+    cd backend && python -m benchmarks.gemini_resilience --calls 40
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+XML = '<Document><Slide number="1"><Text>血糖値が効果的にコントロールされる</Text></Slide></Document>'
+
+
+async def _scenario(name: str, fake_app, *, calls: int, fake: dict, env: dict) -> None:
+    from app.core.settings import settings
+    from app.services.analysis import analyze_xml_async
+    from app.services.gemini_client import close_gateway, get_gateway
+    from benchmarks.fake_gemini import FakeConfig
+
+    for k, v in env.items():
+        setattr(settings, k, v)
+    await close_gateway()
+    fake_app.state.config = FakeConfig(**fake)
+    fake_app.state.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "client_ports": set()}
+
+    outcomes: Counter = Counter()
+    latencies: list[float] = []
+
+    async def one() -> None:
+        t0 = time.perf_counter()
+        try:
+            await analyze_xml_async(XML)
+            outcomes["ok"] += 1
+        except Exception as e:
+            outcomes[type(e).__name__] += 1
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    if name in ("reuse", "outage"):
+        # 逐次に呼ぶ（接続の再利用・ブレーカーが開くまでの様子を見る）
+        for _ in range(calls):
+            await one()
+    else:
+        await asyncio.gather(*(one() for _ in range(calls)))
+    elapsed = time.perf_counter() - t0
+    stats = fake_app.state.stats
+    print(
+        f"{name:<8} {dict(outcomes)} in {elapsed:.2f}s | server requests={stats['requests']} "
+        f"5xx={stats['errors']} 429={stats['rate_limited']} connections={len(stats['client_ports'])} "
+        f"| p50={statistics.median(latencies):.1f}ms min={min(latencies):.2f}ms "
+        f"| breaker={get_gateway().breaker.state}"
+    )
+
+
+async def _run(fake_app, base_url: str, args) -> None:
+    common = {
+        "GEMINI_BASE_URL": base_url,
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_BACKOFF_BASE_SECONDS": 0.05,
+        "GEMINI_BACKOFF_MAX_SECONDS": 0.5,
+        "GEMINI_MAX_RETRIES": 4,
+        "GEMINI_RPM": 0,
+        "PROMPT_COMPACT": True,
+    }
+    await _scenario("healthy", fake_app, calls=args.calls, fake={"latency_ms": 50}, env=common)
+    await _scenario("reuse", fake_app, calls=20, fake={}, env=common)
+    await _scenario(
+        "flaky", fake_app, calls=args.calls, fake={"latency_ms": 20, "error_rate": 0.15, "rate_429": 0.15, "seed": 1},
+        env=common,
+    )
+    await _scenario(
+        "outage", fake_app, calls=20, fake={"latency_ms": 5, "error_rate": 1.0},
+        env={**common, "GEMINI_MAX_RETRIES": 1, "GEMINI_BREAKER_THRESHOLD": 3, "GEMINI_BREAKER_RESET_SECONDS": 30},
+    )
+    await _scenario("rpm", fake_app, calls=22, fake={}, env={**common, "GEMINI_RPM": 20})
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=40)
+    args = ap.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    import uvicorn
+    from benchmarks.fake_gemini import FakeConfig, create_app
+
+    fake_app = create_app(FakeConfig())
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(fake_app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(_run(fake_app, f"http://127.0.0.1:{port}", args))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""/analyze 実行中も /health のレイテンシが平坦なままかを確認する負荷テスト。
+
+LLM 呼び出しは指定秒数スリープするダミーに差し替え（課金なし）、PPTX 解析は実際に行う。
+
+    cd backend && python -m benchmarks.health_latency --analyses 16 --llm-delay 2.0
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DECK = Path(__file__).resolve().parent.parent / "tests" / "data" / "dummy_slide.pptx"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _summary(samples: list[float]) -> dict:
+    ms = sorted(x * 1000 for x in samples)
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "p50_ms": round(statistics.median(ms), 2),
+        "p95_ms": round(ms[int(len(ms) * 0.95) - 1 if len(ms) > 1 else 0], 2),
+        "max_ms": round(ms[-1], 2),
+    }
+
+
+async def _probe_health(client, base: str, stop: asyncio.Event, interval: float) -> list[float]:
+    samples = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = await client.get(f"{base}/health")
+        r.raise_for_status()
+        samples.append(time.perf_counter() - t0)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def _run(base: str, args) -> None:
+    import httpx
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        with open(args.deck, "rb") as fh:
+            r = await client.post(f"{base}/files", files={"file": (Path(args.deck).name, fh)})
+        r.raise_for_status()
+        file_id = r.json()["file_id"]
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, base, stop, args.interval))
+        await asyncio.sleep(args.baseline)
+        stop.set()
+        idle = await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, base, stop, args.interval))
+        t0 = time.perf_counter()
+        results = await asyncio.gather(
+            *[
+                client.post(f"{base}/analyze", data={"file_id": file_id, "mode": "auto", "force": "true"})
+                for _ in range(args.analyses)
+            ]
+        )
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        loaded = await probe
+
+    ok = sum(1 for r in results if r.status_code == 200)
+    print(f"analyses: {ok}/{args.analyses} ok in {elapsed:.2f}s (llm delay {args.llm_delay}s)")
+    print(f"/health idle  : {_summary(idle)}")
+    print(f"/health loaded: {_summary(loaded)}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--analyses", type=int, default=16)
+    ap.add_argument("--llm-delay", type=float, default=2.0)
+    ap.add_argument("--baseline", type=float, default=1.0, help="負荷なしで /health を測る秒数")
+    ap.add_argument("--interval", type=float, default=0.02)
+    ap.add_argument("--deck", default=str(DECK))
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    os.environ["GEMINI_API_KEY"] = "bench-dummy"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    import uvicorn
+    from app.main import app
+    from app.services import pipeline
+
+    async def slow_llm(xml_str, rules=None):
+        await asyncio.sleep(args.llm_delay)
+        return pipeline._mock_items_from_xml(xml_str)
+
+    pipeline.analyze_xml_async = slow_llm
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        asyncio.run(_run(f"http://127.0.0.1:{port}", args))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""指摘の一括編集（POST /analyses/{id}/items:batch）と 1 件ずつの PATCH / DELETE を比べる。
+
+件数ごとに、同じ件数の更新（+ 1 割の削除・追加）を
+  per-item  PATCH /analysis-items/{id}・DELETE・POST .../latest/items を 1 件ずつ
+  batch     items:batch 1 回
+で送り、合計時間と SQL 文の数を表示する。
+
+    cd backend && python -m benchmarks.items_batch --sizes 10 100 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _seed(n: int) -> tuple[int, int, list[int]]:
+    from app.crud import create_analysis_with_items, create_file, list_analysis_items
+    from app.db import SessionLocal
+    from app.services.schemas import AnalysisItem
+
+    items = [
+        AnalysisItem(
+            slideNumber=i % 40 + 1,
+            category="表現",
+            basis=str(i % 9 + 1),
+            issue="「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
+            suggestion="「血糖コントロールの改善が期待される」といった、慎重な表現への修正をお勧めいたします。",
+            correctionType="任意",
+        )
+        for i in range(n)
+    ]
+    with SessionLocal() as db:
+        f = create_file(db, user_id="localuser", filename="bench.pptx", path="x", sha256="0" * 64, size_bytes=0)
+        a = create_analysis_with_items(db, user_id="localuser", file_id=f.id, model="mock", items=items)
+        return f.id, a.id, [r.id for r in list_analysis_items(db, a.id)]
+
+
+def _new_item(i: int) -> dict:
+    return {"slideNumber": i % 40 + 1, "category": "誤植", "basis": "1", "issue": f"追加 {i}", "suggestion": "修正案"}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    os.environ.setdefault("JOB_WORKERS", "0")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.db import engine
+    from app.main import app
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    with TestClient(app) as client:
+        print(f"{engine.dialect.name}, median of {args.repeat}")
+        print(f"{'items':>6} {'per-item ms':>12} {'stmts':>7} {'batch ms':>10} {'stmts':>7} {'speedup':>8}")
+        for n in args.sizes:
+            extra = max(n // 10, 1)
+            per_item, batch = [], []
+            per_item_stmts = batch_stmts = 0
+            for r in range(args.repeat):
+                # 毎回新しい解析を使う（削除済みの行を再利用しない）
+                file_id, _, ids = _seed(n + extra)
+                statements = 0
+                t0 = time.perf_counter()
+                for i, item_id in enumerate(ids[:n]):
+                    client.patch(f"/analysis-items/{item_id}", json={"issue": f"更新 {r}-{i}"}).raise_for_status()
+                for item_id in ids[n:]:
+                    client.delete(f"/analysis-items/{item_id}").raise_for_status()
+                for i in range(extra):
+                    client.post(f"/files/{file_id}/analyses/latest/items", json=_new_item(i)).raise_for_status()
+                per_item.append(time.perf_counter() - t0)
+                per_item_stmts = statements
+
+                _, analysis_id, ids = _seed(n + extra)
+                ops = [{"op": "update", "id": item_id, "issue": f"更新 {r}-{i}"} for i, item_id in enumerate(ids[:n])]
+                ops += [{"op": "delete", "id": item_id} for item_id in ids[n:]]
+                ops += [{"op": "create", **_new_item(i)} for i in range(extra)]
+                statements = 0
+                t0 = time.perf_counter()
+                client.post(f"/analyses/{analysis_id}/items:batch", json={"operations": ops}).raise_for_status()
+                batch.append(time.perf_counter() - t0)
+                batch_stmts = statements
+            p, b = statistics.median(per_item) * 1000, statistics.median(batch) * 1000
+            print(f"{n:>6} {p:>12.1f} {per_item_stmts:>7} {b:>10.1f} {batch_stmts:>7} {p / b:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
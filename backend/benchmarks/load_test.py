@@ -0,0 +1,207 @@
+"""偽 Gemini サーバーを相手に /files → /analyze（LLM モード）を一定の同時実行数で流す負荷試験。
+
+既定では偽サーバー（benchmarks/fake_gemini.py）とアプリ（uvicorn）を子プロセスで起動し、
+GEMINI_BASE_URL で偽サーバーに向ける。仮想ユーザー --concurrency 人がそれぞれ
+「アップロード → 解析（force=true でキャッシュを使わない）」を繰り返し、段階ごとの
+p50/p95/p99・スループット・ステータス別のエラー数と、偽サーバー側で数えた件数を表示する。
+
+    cd backend && python -m benchmarks.load_test --concurrency 16 --duration 30 \\
+        --latency-dist lognormal --latency-ms 800 --rate-429 0.05 --error-rate 0.02
+    cd backend && python -m benchmarks.load_test --workers 4 --env ANALYZE_MAX_CONCURRENCY=32 --env GEMINI_RPM=600
+
+--app-url を指定すると起動済みのアプリに対して流す（偽サーバーの起動・集計はしない）。
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.cold_start import BACKEND_DIR, bench_env  # noqa: E402
+
+PPTX_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_http(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError(f"process exited while waiting for {url}")
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def _spawn(stack: ExitStack, args: list[str], env: dict | None = None) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, *args], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    def stop() -> None:
+        proc.terminate()
+        proc.wait()
+
+    stack.callback(stop)
+    return proc
+
+
+def _percentile(sorted_ms: list[float], p: float) -> float:
+    # 最近順位法
+    if not sorted_ms:
+        return float("nan")
+    k = max(int(-(-p * len(sorted_ms) // 100)) - 1, 0)
+    return sorted_ms[k]
+
+
+class Recorder:
+    """段階（upload / analyze / scenario）ごとの所要時間と結果を集める。"""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.outcomes: dict[str, Counter] = defaultdict(Counter)
+
+    def add(self, step: str, ms: float, outcome: str) -> None:
+        self.outcomes[step][outcome] += 1
+        if outcome == "ok":
+            self.latencies[step].append(ms)
+
+    def report(self, elapsed: float) -> None:
+        print(f"{'step':<9} {'ok':>6} {'err':>5} {'rate':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+              "  errors")
+        for step in ("upload", "analyze", "scenario"):
+            outcomes = self.outcomes[step]
+            ok = outcomes["ok"]
+            total = sum(outcomes.values())
+            errors = {k: v for k, v in outcomes.items() if k != "ok"}
+            ms = sorted(self.latencies[step])
+            print(
+                f"{step:<9} {ok:>6} {total - ok:>5} {(total - ok) / max(total, 1):>6.1%} {ok / elapsed:>7.2f}"
+                f" {_percentile(ms, 50):>8.1f} {_percentile(ms, 95):>8.1f} {_percentile(ms, 99):>8.1f}"
+                f"  {', '.join(f'{k}={v}' for k, v in sorted(errors.items())) or '-'}"
+            )
+
+
+async def _drive(app_url: str, deck: bytes, args, rec: Recorder) -> float:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    deadline = time.perf_counter() + args.duration
+    remaining = args.requests
+
+    async def call(client: httpx.AsyncClient, step: str, **kw) -> httpx.Response | None:
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(**kw)
+        except httpx.HTTPError as e:
+            rec.add(step, 0.0, type(e).__name__)
+            return None
+        rec.add(step, (time.perf_counter() - t0) * 1000, "ok" if r.status_code < 400 else str(r.status_code))
+        return r if r.status_code < 400 else None
+
+    async def user(client: httpx.AsyncClient) -> None:
+        nonlocal remaining
+        while time.perf_counter() < deadline and (args.requests == 0 or remaining > 0):
+            remaining -= 1
+            t0 = time.perf_counter()
+            r = await call(client, "upload", url="/files", files={"file": ("load.pptx", deck, PPTX_TYPE)})
+            if r is None:
+                rec.add("scenario", 0.0, "upload_failed")
+                continue
+            data = {"file_id": str(r.json()["file_id"]), "mode": "llm", "force": "true"}
+            r = await call(client, "analyze", url="/analyze", data=data)
+            rec.add("scenario", (time.perf_counter() - t0) * 1000, "ok" if r is not None else "analyze_failed")
+
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user(client) for _ in range(args.concurrency)))
+        return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--concurrency", type=int, default=8, help="同時に動く仮想ユーザー数")
+    ap.add_argument("--duration", type=float, default=20.0, help="秒")
+    ap.add_argument("--requests", type=int, default=0, help="シナリオの総数（0 なら --duration まで）")
+    ap.add_argument("--timeout", type=float, default=300.0, help="1 リクエストのタイムアウト秒")
+    ap.add_argument("--slides", type=int, default=10, help="アップロードする合成デッキの枚数")
+    ap.add_argument("--deck", type=Path, help="合成デッキの代わりに使う PPTX")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn のワーカー数")
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="アプリに渡す設定（複数可）")
+    ap.add_argument("--app-url", help="起動済みのアプリの URL（指定時はアプリ・偽サーバーを起動しない）")
+    fake = ap.add_argument_group("fake gemini")
+    fake.add_argument("--latency-ms", type=float, default=800.0)
+    fake.add_argument("--jitter-ms", type=float, default=0.0)
+    fake.add_argument("--latency-dist", choices=("uniform", "lognormal"), default="lognormal")
+    fake.add_argument("--latency-sigma", type=float, default=0.5)
+    fake.add_argument("--error-rate", type=float, default=0.0)
+    fake.add_argument("--rate-429", type=float, default=0.0)
+    fake.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    if args.deck:
+        deck = args.deck.read_bytes()
+    else:
+        from benchmarks.synthetic import make_deck
+
+        deck = make_deck(tmp / "load.pptx", slides=args.slides, images=0, boilerplate=2).read_bytes()
+
+    with ExitStack() as stack:
+        fake_url = None
+        app_url = args.app_url
+        if app_url is None:
+            fake_port, app_port = _free_port(), _free_port()
+            fake_url = f"http://127.0.0.1:{fake_port}"
+            fake_proc = _spawn(stack, [
+                "-m", "benchmarks.fake_gemini", "--port", str(fake_port),
+                "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                "--latency-dist", args.latency_dist, "--latency-sigma", str(args.latency_sigma),
+                "--error-rate", str(args.error_rate), "--rate-429", str(args.rate_429), "--seed", str(args.seed),
+            ])
+            _wait_http(f"{fake_url}/_stats", fake_proc)
+
+            env = bench_env(tmp)
+            env.update(GEMINI_BASE_URL=fake_url, GEMINI_API_KEY="fake", ANALYZE_MODE="llm")
+            env.update(kv.split("=", 1) for kv in args.env)
+            app_url = f"http://127.0.0.1:{app_port}"
+            app_proc = _spawn(stack, [
+                "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+                "--workers", str(args.workers), "--log-level", "warning",
+            ], env=env)
+            _wait_http(f"{app_url}/health", app_proc)
+
+        rec = Recorder()
+        limit = f"{args.requests} scenarios" if args.requests else f"{args.duration:g} s"
+        print(f"{app_url}: concurrency {args.concurrency}, {limit}, deck {len(deck) / 1024:.0f} KiB, "
+              f"workers {args.workers}")
+        if fake_url:
+            print(f"fake gemini: {args.latency_dist} {args.latency_ms:g} ms"
+                  f" (sigma {args.latency_sigma:g}), 503 {args.error_rate:.0%}, 429 {args.rate_429:.0%}")
+        elapsed = asyncio.run(_drive(app_url, deck, args, rec))
+        print(f"elapsed {elapsed:.1f} s")
+        rec.report(elapsed)
+        if fake_url:
+            with urllib.request.urlopen(f"{fake_url}/_stats") as r:
+                print(f"fake gemini received: {r.read().decode()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""解析結果の保存にかかる DB 時間を、旧方式（2 回 commit + 再 SELECT + result_json 二重保存）と
+新方式（1 トランザクションの bulk INSERT ... RETURNING）で比較する。
+
+    cd backend && python -m benchmarks.persistence --items 500
+    DB_URL=postgresql+psycopg2://... python -m benchmarks.persistence
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _items(n: int):
+    from app.services.schemas import AnalysisItem
+
+    return [
+        AnalysisItem(
+            slideNumber=i % 80 + 1,
+            category="表現",
+            basis=str(i % 9 + 1),
+            issue="「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。" * 2,
+            suggestion="「血糖コントロールの改善が期待される」といった、慎重な表現への修正をお勧めいたします。" * 2,
+            correctionType="任意",
+        )
+        for i in range(n)
+    ]
+
+
+def _legacy(db, file_id: int, items) -> None:
+    # user-011 以前の保存処理（create_analysis → bulk_create_analysis_items の旧実装）
+    from app.models import Analysis, AnalysisItemRow
+    from sqlalchemy import select
+
+    payload = [i.model_dump() for i in items]
+    a = Analysis(user_id="bench", file_id=file_id, model="mock", result_json=payload, status="succeeded")
+    db.add(a)
+    db.commit()
+    db.refresh(a)
+    db.add_all(
+        AnalysisItemRow(
+            analysis_id=a.id,
+            slide_number=i.slideNumber,
+            category=i.category,
+            basis=i.basis,
+            issue=i.issue,
+            suggestion=i.suggestion,
+            correction_type=i.correctionType or "任意",
+        )
+        for i in items
+    )
+    db.commit()
+    q = select(AnalysisItemRow).where(AnalysisItemRow.analysis_id == a.id).order_by(AnalysisItemRow.id.asc())
+    db.execute(q).scalars().all()
+
+
+def _single(db, file_id: int, items, store_json: bool) -> None:
+    from app.crud import create_analysis_with_items
+
+    create_analysis_with_items(
+        db,
+        user_id="bench",
+        file_id=file_id,
+        model="mock",
+        items=items,
+        result_json=[i.model_dump() for i in items] if store_json else None,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{tmp}/bench.db")
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.crud import create_file
+    from app.db import SessionLocal, engine, init_db
+    from sqlalchemy import event
+
+    init_db()
+    items = _items(args.items)
+    queries = 0
+
+    def count(*_):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    with SessionLocal() as db:
+        f = create_file(db, user_id="bench", filename="bench.pptx", path="x", sha256="0" * 64, size_bytes=0)
+        cases = [
+            ("legacy (2 commits + reselect)", lambda: _legacy(db, f.id, items)),
+            ("single tx + result_json", lambda: _single(db, f.id, items, True)),
+            ("single tx, no result_json", lambda: _single(db, f.id, items, False)),
+        ]
+        print(f"{engine.dialect.name}, {args.items} items per analysis, median of {args.repeat}")
+        for label, fn in cases:
+            fn()  # warm-up
+            samples = []
+            for _ in range(args.repeat):
+                queries = 0
+                t0 = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - t0)
+            print(f"  {label:<32} {statistics.median(samples) * 1000:8.1f} ms  statements={queries}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""プロンプト圧縮（PROMPT_COMPACT）前後の推定トークン数と圧縮にかかる時間を比較する。
+
+テンプレートのフッター・免責文を各スライドに置いた合成デッキと、テスト用デッキで計測する。
+
+    cd backend && python -m benchmarks.prompt_size --slides 40 --boilerplate 3
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.settings import settings  # noqa: E402
+from app.services.analysis import DEFAULT_RULES, _build_prompt  # noqa: E402
+from app.services.pptx_parser import PptxConverter  # noqa: E402
+from app.services.prompt_compact import estimate_tokens  # noqa: E402
+from benchmarks.synthetic import make_deck  # noqa: E402
+
+DECK = Path(__file__).resolve().parent.parent / "tests" / "data" / "dummy_slide.pptx"
+
+
+def _prompt(xml_str: str, compact: bool) -> str:
+    settings.PROMPT_COMPACT = compact
+    return _build_prompt(xml_str, DEFAULT_RULES)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--slides", type=int, default=40)
+    ap.add_argument("--shapes", type=int, default=4)
+    ap.add_argument("--boilerplate", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    synthetic = make_deck(
+        tmp / "template.pptx", slides=args.slides, shapes=args.shapes, images=1, boilerplate=args.boilerplate
+    )
+    print(f"{'deck':<28}{'raw tokens':>12}{'compact':>10}{'saved':>8}{'compact ms':>12}")
+    for label, path in (("dummy_slide.pptx", DECK), (f"template {args.slides} slides", synthetic)):
+        xml_str = PptxConverter.convert_to_xml(str(path), pretty=False)
+        raw = estimate_tokens(_prompt(xml_str, False))
+        compact = estimate_tokens(_prompt(xml_str, True))
+        samples = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            _prompt(xml_str, True)
+            samples.append(time.perf_counter() - t0)
+        print(
+            f"{label:<28}{raw:>12}{compact:>10}{1 - compact / raw:>7.0%}"
+            f"{statistics.median(samples) * 1000:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
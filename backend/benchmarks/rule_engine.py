@@ -0,0 +1,64 @@
+"""ルールエンジンの 1 スライドあたりの走査時間を、大きな辞書で計測する。
+
+組み込み辞書に --terms 件の架空の製品名を追加し、合成デッキの XML を走査する。
+
+    cd backend && python -m benchmarks.rule_engine --terms 50000 --slides 80
+"""
+import argparse
+import copy
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.pptx_parser import PptxConverter  # noqa: E402
+from app.services.rule_engine import DEFAULT_DICTIONARY, RuleEngine  # noqa: E402
+from benchmarks.synthetic import make_deck  # noqa: E402
+
+_KANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン"
+
+
+def _dictionary(n: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    d = copy.deepcopy(DEFAULT_DICTIONARY)
+    terms = d["rules"][0]["terms"]
+    while len(terms) < n:
+        terms["".join(rnd.choice(_KANA) for _ in range(rnd.randint(4, 9)))] = "成分名"
+    return d
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--terms", type=int, default=50000)
+    ap.add_argument("--slides", type=int, default=80)
+    ap.add_argument("--shapes", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    engine = RuleEngine(_dictionary(args.terms))
+    compile_ms = (time.perf_counter() - t0) * 1000
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    deck = make_deck(tmp / "rules.pptx", slides=args.slides, shapes=args.shapes, images=1, tables=1, groups=1)
+    xml_str = PptxConverter.convert_to_xml(str(deck), pretty=False)
+
+    samples = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        items = engine.scan_xml(xml_str)
+        samples.append(time.perf_counter() - t0)
+    per_slide_us = statistics.median(samples) / args.slides * 1e6
+    chars = len(xml_str) // args.slides
+
+    print(f"dictionary: {args.terms} terms, compiled in {compile_ms:.0f} ms")
+    print(f"deck: {args.slides} slides, ~{chars} XML chars/slide, {len(items)} findings")
+    print(f"scan: {statistics.median(samples) * 1000:.2f} ms total, {per_slide_us:.0f} us/slide")
+
+
+if __name__ == "__main__":
+    main()
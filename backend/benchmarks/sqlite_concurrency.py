@@ -0,0 +1,108 @@
+"""SQLite で PATCH /analysis-items/{id} を並列に投げ、ロックエラー（500）が出ないことを確認する。
+
+--no-pragmas で WAL・busy_timeout を無効にした従来の挙動と比較できる。失敗があれば終了コード 1。
+
+    cd backend && python -m benchmarks.sqlite_concurrency --requests 2000 --concurrency 64
+    cd backend && python -m benchmarks.sqlite_concurrency --no-pragmas
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+DECK = Path(__file__).resolve().parent.parent / "tests" / "data" / "dummy_slide.pptx"
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _run(base: str, args) -> bool:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        with open(args.deck, "rb") as fh:
+            r = await client.post(f"{base}/files", files={"file": (Path(args.deck).name, fh)})
+        r.raise_for_status()
+        file_id = r.json()["file_id"]
+        r = await client.post(f"{base}/analyze", data={"file_id": file_id, "mode": "mock", "force": "true"})
+        r.raise_for_status()
+        r = await client.get(f"{base}/analyses/{r.headers['X-Analysis-Id']}")
+        item_ids = [i["id"] for i in r.json()["items"]]
+
+        sem = asyncio.Semaphore(args.concurrency)
+        statuses: Counter = Counter()
+        latencies: list[float] = []
+
+        async def patch(n: int) -> None:
+            item_id = item_ids[n % len(item_ids)]
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.patch(
+                    f"{base}/analysis-items/{item_id}",
+                    json={"suggestion": f"修正案 {n}", "correctionType": "任意" if n % 2 else "必須"},
+                )
+                latencies.append(time.perf_counter() - t0)
+            statuses[r.status_code] += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(patch(n) for n in range(args.requests)))
+        elapsed = time.perf_counter() - t0
+
+    ms = sorted(x * 1000 for x in latencies)
+    print(f"{args.requests} PATCH x {args.concurrency} parallel over {len(item_ids)} items: {elapsed:.2f}s "
+          f"({args.requests / elapsed:.0f} req/s)")
+    print(f"status: {dict(statuses)}")
+    print(f"latency p50={statistics.median(ms):.1f}ms p95={ms[int(len(ms) * 0.95) - 1]:.1f}ms max={ms[-1]:.1f}ms")
+    return set(statuses) == {200}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--no-pragmas", action="store_true", help="WAL・busy_timeout を無効にして実行する")
+    ap.add_argument("--deck", default=str(DECK))
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    os.environ["DB_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ.setdefault("STORAGE_DIR", f"{tmp}/storage")
+    os.environ["JOB_WORKERS"] = "0"
+    if args.no_pragmas:
+        os.environ["SQLITE_WAL"] = "false"
+        os.environ["SQLITE_BUSY_TIMEOUT_MS"] = "0"
+        os.environ["SQLITE_MMAP_SIZE"] = "0"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    # 失敗時のスタックトレースで出力が埋まらないようにする
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="critical"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        ok = asyncio.run(_run(f"http://127.0.0.1:{port}", args))
+    finally:
+        server.should_exit = True
+        thread.join()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""主要な処理の所要時間をまとめて計測し、JSON に保存して基準値と比較するベンチマークスイート。
+
+計測対象:
+  convert.pretty / convert.compact  PptxConverter.convert_to_xml（合成デッキ）
+  prompt.build                      analysis._build_prompt（既定ルール）
+  db.bulk_items                     crud.bulk_create_analysis_items（--items 件）
+  api.flow                          TestClient で /files → /analyze?mode=mock → /analyses/{id}
+  startup.import                    新しいプロセスでの import app.main（benchmarks/cold_start.py）
+  startup.health                    uvicorn 起動から最初の /health 応答まで（マイグレーション済みの DB）
+
+基準値より --stat（既定は中央値）が --threshold（既定 20%）以上遅くなったケースがあれば終了コード 1。
+所要時間はマシンに依存するので基準値はリポジトリに含めない。比較するマシンで先に
+--update-baseline で記録しておく。
+
+    cd backend && python -m benchmarks.suite --output bench.json
+    cd backend && python -m benchmarks.suite --baseline bench-baseline.json --update-baseline
+    cd backend && python -m benchmarks.suite --baseline bench-baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+
+CASES = (
+    "convert.pretty", "convert.compact", "prompt.build", "db.bulk_items", "api.flow",
+    "startup.import", "startup.health",
+)
+
+
+def _measure(fn: Callable[[], object], *, repeat: int, warmup: int = 1, inner: int = 1) -> dict:
+    """repeat 回計測した 1 呼び出しあたりのミリ秒。速い処理は inner 回まとめて測って割る。"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - t0) * 1000 / inner)
+    return _stats(samples)
+
+
+def _stats(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "median_ms": round(statistics.median(samples), 6),
+        "p95_ms": round(samples[max(int(len(samples) * 0.95) - 1, 0)], 6),
+        "min_ms": round(samples[0], 6),
+    }
+
+
+def _items(n: int):
+    from app.services.schemas import AnalysisItem
+
+    return [
+        AnalysisItem(
+            slideNumber=i % 40 + 1,
+            category="表現",
+            basis=str(i % 9 + 1),
+            issue="「血糖値が効果的にコントロールされる」という表現は、効果を断定的に印象付ける恐れがございます。",
+            suggestion="「血糖コントロールの改善が期待される」といった、慎重な表現への修正をお勧めいたします。",
+            correctionType="任意",
+        )
+        for i in range(n)
+    ]
+
+
+def run_suite(args, deck: Path, cases: set[str]) -> dict:
+    from app.services.pptx_parser import PptxConverter
+
+    results: dict[str, dict] = {}
+    if "convert.pretty" in cases:
+        results["convert.pretty"] = _measure(
+            lambda: PptxConverter.convert_to_xml(str(deck), pretty=True), repeat=args.repeat
+        )
+    if "convert.compact" in cases:
+        results["convert.compact"] = _measure(
+            lambda: PptxConverter.convert_to_xml(str(deck), pretty=False), repeat=args.repeat
+        )
+
+    if "prompt.build" in cases:
+        from app.services.analysis import DEFAULT_RULES, _build_prompt
+
+        xml_str = PptxConverter.convert_to_xml(str(deck), pretty=False)
+        results["prompt.build"] = _measure(
+            lambda: _build_prompt(xml_str, DEFAULT_RULES), repeat=args.repeat, inner=1000
+        )
+
+    if "db.bulk_items" in cases:
+        from app.crud import bulk_create_analysis_items, create_analysis, create_file
+        from app.db import SessionLocal
+
+        items = _items(args.items)
+        with SessionLocal() as db:
+            f = create_file(db, user_id="bench", filename="bench.pptx", path="bench", sha256="0" * 64, size_bytes=0)
+
+            def bulk() -> None:
+                a = create_analysis(db, user_id="bench", file_id=f.id, model="mock")
+                bulk_create_analysis_items(db, analysis_id=a.id, items=items)
+
+            results["db.bulk_items"] = _measure(bulk, repeat=args.repeat)
+
+    if "api.flow" in cases:
+        from app.main import app
+        from fastapi.testclient import TestClient
+
+        payload = deck.read_bytes()
+        with TestClient(app) as client:
+
+            def flow() -> None:
+                r = client.post("/files", files={"file": (deck.name, payload)})
+                r.raise_for_status()
+                r = client.post(
+                    "/analyze", data={"file_id": r.json()["file_id"], "mode": "mock", "force": "true"}
+                )
+                r.raise_for_status()
+                r = client.get(f"/analyses/{r.headers['X-Analysis-Id']}")
+                r.raise_for_status()
+
+            results["api.flow"] = _measure(flow, repeat=args.repeat, warmup=3)
+
+    # 別プロセスで測る（環境変数は main で設定したものを引き継ぐ）
+    if "startup.import" in cases:
+        from benchmarks.cold_start import import_seconds
+
+        results["startup.import"] = _stats([import_seconds(dict(os.environ)) * 1000 for _ in range(args.repeat)])
+    if "startup.health" in cases:
+        from benchmarks.cold_start import health_seconds
+
+        results["startup.health"] = _stats([health_seconds(dict(os.environ)) * 1000 for _ in range(args.repeat)])
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, stat: str = "median_ms") -> list[str]:
+    """基準値と比較して表を表示し、閾値を超えて遅くなったケース名を返す。"""
+    regressions = []
+    print(f"{'case':<18}{'baseline ms':>13}{'current ms':>12}{'ratio':>8}  ({stat})")
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<18}{'-':>13}{cur[stat]:>12.4f}{'new':>8}")
+            continue
+        ratio = cur[stat] / base[stat] if base[stat] > 0 else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<18}{base[stat]:>13.4f}{cur[stat]:>12.4f}{ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--slides", type=int, default=40)
+    ap.add_argument("--shapes", type=int, default=6)
+    ap.add_argument("--tables", type=int, default=1)
+    ap.add_argument("--groups", type=int, default=1)
+    ap.add_argument("--images", type=int, default=1)
+    ap.add_argument("--image-px", type=int, default=256)
+    ap.add_argument("--items", type=int, default=500, help="db.bulk_items で保存する項目数")
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--cases", nargs="*", choices=CASES, default=list(CASES))
+    ap.add_argument("--output", help="結果 JSON の保存先")
+    ap.add_argument("--baseline", help="比較する基準値 JSON")
+    ap.add_argument("--threshold", type=float, default=0.2, help="許容する悪化率")
+    ap.add_argument("--stat", choices=("median_ms", "min_ms", "p95_ms"), default="median_ms",
+                    help="比較に使う統計量（ノイズの多い環境では min_ms が安定）")
+    ap.add_argument("--update-baseline", action="store_true", help="結果で --baseline を上書きする")
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-"))
+    os.environ["DB_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ["STORAGE_DIR"] = str(tmp / "storage")
+    os.environ["ANALYZE_MODE"] = "mock"
+    os.environ["JOB_WORKERS"] = "0"
+    # 毎回の変換を計測するため変換結果のディスクキャッシュは使わない
+    os.environ["XML_CACHE_ENABLED"] = "false"
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from app.db import init_db
+    from benchmarks.synthetic import make_deck
+
+    init_db()
+    deck = make_deck(
+        tmp / "suite.pptx",
+        slides=args.slides,
+        shapes=args.shapes,
+        images=args.images,
+        image_px=args.image_px,
+        tables=args.tables,
+        groups=args.groups,
+    )
+    params = {k: getattr(args, k) for k in ("slides", "shapes", "tables", "groups", "images", "image_px", "items", "repeat")}
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": run_suite(args, deck, set(args.cases)),
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    regressions: list[str] = []
+    if args.baseline and Path(args.baseline).exists() and not args.update_baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("params") != params:
+            print("warning: baseline was recorded with different parameters", file=sys.stderr)
+        regressions = compare(report["results"], baseline.get("results", {}), args.threshold, args.stat)
+    else:
+        for name, r in report["results"].items():
+            print(f"{name:<18}{r['median_ms']:>12.4f} ms (p95 {r['p95_ms']:.4f}, n={r['n']})")
+        if args.baseline and args.update_baseline:
+            Path(args.baseline).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"regressions over {args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
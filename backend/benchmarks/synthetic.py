@@ -0,0 +1,90 @@
+"""ベンチマーク用の合成 PPTX を生成する。"""
+import io
+import random
+from pathlib import Path
+
+from pptx import Presentation
+from pptx.util import Emu, Inches
+
+# テンプレートに含まれがちな全スライド共通のテキスト
+_BOILERPLATE = [
+    "本資料は医療関係者向けの情報提供を目的としており、一般の方への広告を目的としたものではありません。",
+    "© 2024 Example Pharma Co., Ltd. All rights reserved. 無断転載・複製を禁じます。",
+    "社外秘 / Confidential — 本資料の社外への持ち出しはご遠慮ください。",
+    "製造販売元：サンプル製薬株式会社　お問い合わせ：くすり相談窓口 0120-000-000",
+]
+
+_WORDS = ["血糖値", "サキサグリプチン", "患者さん", "食事療法", "インスリン", "効果", "出典", "添付文書", "運動療法", "副作用"]
+
+
+def _png(width: int, height: int, seed: int) -> bytes:
+    from PIL import Image
+
+    rnd = random.Random(seed)
+    # ノイズ画像にして圧縮が効きにくい（実際の写真に近い）サイズにする
+    img = Image.frombytes("RGB", (width, height), rnd.randbytes(width * height * 3))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _sentence(rnd: random.Random) -> str:
+    return "".join(rnd.choice(_WORDS) for _ in range(rnd.randint(3, 8)))
+
+
+def make_deck(
+    path: str | Path,
+    *,
+    slides: int = 10,
+    shapes: int = 5,
+    images: int = 1,
+    image_px: int = 256,
+    tables: int = 0,
+    table_size: tuple[int, int] = (4, 3),
+    groups: int = 0,
+    group_shapes: int = 3,
+    boilerplate: int = 0,
+    seed: int = 0,
+) -> Path:
+    """slides 枚 × (テキスト図形 shapes 個 + 画像 images 枚 + 表 tables 個 + グループ groups 個) のデッキを path に保存する。
+
+    表は table_size (行, 列) のセルすべてに文章を入れ、グループは group_shapes 個のテキスト図形を束ねる。
+    boilerplate を指定すると、全スライド共通のフッター・免責文をその数だけ各スライドに置く。
+    """
+    rnd = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[6]  # blank
+    blobs = [_png(image_px, image_px, seed + i) for i in range(max(images, 1))]
+    for s in range(slides):
+        slide = prs.slides.add_slide(layout)
+        for i in range(shapes):
+            box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5 + i * 0.6), Inches(6), Inches(0.5))
+            tf = box.text_frame
+            tf.text = _sentence(rnd)
+            for _ in range(rnd.randint(0, 2)):
+                tf.add_paragraph().text = _sentence(rnd)
+        for i in range(images):
+            pic = slide.shapes.add_picture(
+                io.BytesIO(blobs[(s + i) % len(blobs)]), Inches(7), Inches(0.5 + i), Emu(914400), Emu(914400)
+            )
+            pic._element.nvPicPr.cNvPr.set("descr", f"図{s + 1}-{i + 1} {_sentence(rnd)}")
+        for i in range(boilerplate):
+            box = slide.shapes.add_textbox(Inches(0.3), Inches(6.6 + i * 0.2), Inches(9), Inches(0.2))
+            box.text_frame.text = _BOILERPLATE[i % len(_BOILERPLATE)]
+        rows, cols = table_size
+        for i in range(tables):
+            frame = slide.shapes.add_table(
+                rows, cols, Inches(0.5), Inches(4 + i * 0.4), Inches(6), Inches(0.3 * rows)
+            )
+            for cell in frame.table.iter_cells():
+                cell.text = _sentence(rnd)
+        for g in range(groups):
+            group = slide.shapes.add_group_shape()
+            for i in range(group_shapes):
+                box = group.shapes.add_textbox(
+                    Inches(7 + g * 0.3), Inches(3 + i * 0.5), Inches(2.5), Inches(0.4)
+                )
+                box.text_frame.text = _sentence(rnd)
+    path = Path(path)
+    prs.save(path)
+    return path
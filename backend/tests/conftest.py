@@ -0,0 +1,76 @@
+"""バックエンドのテスト。一時ディレクトリの SQLite・mock 解析・スレッドの変換プールで動かす。
+
+    cd backend && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# app の settings・engine は import 時に環境変数から決まるため、先に一時ディレクトリへ向ける
+_TMP = tempfile.mkdtemp(prefix="rulecheck-tests-")
+os.environ["DB_URL"] = f"sqlite:///{_TMP}/app.db"
+os.environ["STORAGE_DIR"] = f"{_TMP}/storage"
+os.environ["ANALYZE_MODE"] = "mock"
+os.environ["PARSE_EXECUTOR"] = "thread"
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import pytest  # noqa: E402
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+DECK = DATA_DIR / "dummy_slide.pptx"
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def upload(client):
+    def _upload(path: Path = DECK, name: str = "dummy_slide.pptx", revision_of: int | None = None) -> dict:
+        data = {"revision_of": str(revision_of)} if revision_of is not None else {}
+        with open(path, "rb") as fh:
+            r = client.post("/files", files={"file": (name, fh, PPTX_MIME)}, data=data)
+        assert r.status_code == 200, r.text
+        return r.json()
+
+    return _upload
+
+
+@pytest.fixture
+def analyze(client):
+    def _analyze(file_id: int, **data) -> tuple[int, list[dict], dict]:
+        r = client.post("/analyze", data={"file_id": file_id, "mode": "mock", **data})
+        assert r.status_code == 200, r.text
+        return int(r.headers["x-analysis-id"]), r.json(), r.headers
+
+    return _analyze
+
+
+@pytest.fixture
+def revised_deck(tmp_path) -> Path:
+    """dummy_slide.pptx のスライド 1 と 2 を入れ替え、末尾に新しいスライドを足した改訂版。
+
+    解析結果のキャッシュに当たらないよう、追加スライドの本文はテストごとに変える。
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation(str(DECK))
+    ids = prs.slides._sldIdLst
+    first = ids[0]
+    ids.remove(first)
+    ids.insert(1, first)
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1)).text_frame.text = f"新しいスライド {tmp_path.name}"
+    path = tmp_path / "revised.pptx"
+    prs.save(str(path))
+    return path
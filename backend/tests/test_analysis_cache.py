@@ -0,0 +1,29 @@
+from app.services.analysis_cache import cache_key, rules_hash
+
+
+def test_cache_key_ignores_rule_whitespace():
+    assert rules_hash("1. foo\n2. bar") == rules_hash("  1.   foo \n\n2. bar\n")
+    assert rules_hash(None) == rules_hash("   ")
+    assert cache_key("a" * 64, "1. foo", "m") == cache_key("a" * 64, " 1.  foo\n", "m")
+
+
+def test_cache_key_changes_with_deck_rules_and_model():
+    base = cache_key("a" * 64, "1. foo", "m")
+    assert cache_key("b" * 64, "1. foo", "m") != base
+    assert cache_key("a" * 64, "1. bar", "m") != base
+    assert cache_key("a" * 64, "1. foo", "other") != base
+
+
+def test_analyze_is_served_from_cache(upload, analyze):
+    file_id = upload()["file_id"]
+    rules = "1. キャッシュ確認用のルール"
+    first_id, first, headers = analyze(file_id, rules=rules)
+    assert headers["x-analysis-mode"] == "mock; cache=miss"
+
+    second_id, second, headers = analyze(file_id, rules="  1.  キャッシュ確認用のルール\n\n")
+    assert headers["x-analysis-mode"] == "mock; cache=hit"
+    assert second_id != first_id
+    assert [(i["slideNumber"], i["issue"]) for i in second] == [(i["slideNumber"], i["issue"]) for i in first]
+
+    _, _, headers = analyze(file_id, rules=rules, force="true")
+    assert headers["x-analysis-mode"] == "mock; cache=bypass"
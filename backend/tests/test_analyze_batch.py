@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from app.core.settings import settings
+from app.services import pipeline
+from sqlalchemy import event
+
+
+def test_batch_reports_missing_files_per_file(client, upload):
+    file_id = upload()["file_id"]
+    r = client.post("/analyze/batch", json={"file_ids": [file_id, 999999, file_id], "mode": "mock"})
+    assert r.status_code == 200, r.text
+    results = r.json()["results"]
+    assert [x["file_id"] for x in results] == [file_id, 999999]
+    assert results[0]["status"] == "succeeded" and results[0]["items_count"] > 0
+    assert (results[1]["status"], results[1]["error"]) == ("failed", "file not found")
+
+
+def test_batch_does_not_exhaust_the_connection_pool(client, upload, monkeypatch):
+    """数十ファイルのバッチでも、同時に使う DB 接続はプールの大きさまでに収まる。"""
+    from app.db import engine
+
+    real_convert = pipeline._convert
+
+    async def slow_convert(abs_path, sha256):
+        await asyncio.sleep(0.05)  # 解析に時間が掛かる間も接続を握り続けないことを確かめる
+        return await real_convert(abs_path, sha256)
+
+    monkeypatch.setattr(pipeline, "_convert", slow_convert)
+    file_ids = [upload(name=f"batch-{n}.pptx")["file_id"] for n in range(40)]
+
+    in_use = peak = 0
+
+    def checkout(*_):
+        nonlocal in_use, peak
+        in_use += 1
+        peak = max(peak, in_use)
+
+    def checkin(*_):
+        nonlocal in_use
+        in_use -= 1
+
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+    try:
+        t0 = time.perf_counter()
+        r = client.post("/analyze/batch", json={"file_ids": file_ids, "mode": "mock", "force": True})
+        elapsed = time.perf_counter() - t0
+    finally:
+        event.remove(engine, "checkout", checkout)
+        event.remove(engine, "checkin", checkin)
+
+    assert r.status_code == 200, r.text
+    assert [x["status"] for x in r.json()["results"]] == ["succeeded"] * 40
+    # バッチの各ファイル分 + リクエスト自身のセッション
+    assert peak <= settings.DB_POOL_SIZE + 1
+    assert elapsed < settings.DB_POOL_TIMEOUT_SECONDS
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+from app.core.settings import settings
+from app.services import analysis, pipeline
+from app.services.schemas import AnalysisItem
+
+
+def _events(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        events.append((fields.get("event", "message"), json.loads(fields.get("data", "null"))))
+    return events
+
+
+def test_stream_emits_items_then_done(client, upload):
+    file_id = upload()["file_id"]
+    r = client.get("/analyze/stream", params={"file_id": file_id, "mode": "mock", "force": "true"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    items = [data for name, data in events if name == "item"]
+    name, done = events[-1]
+    assert name == "done"
+    assert done["items_count"] == len(items) > 0
+
+    # 流した指摘はそのまま解析として保存されている
+    saved = client.get(f"/analyses/{done['analysis_id']}").json()
+    assert saved["status"] == "succeeded"
+    assert len(saved["items"]) == len(items)
+
+
+def test_stream_on_missing_file(client):
+    assert client.get("/analyze/stream", params={"file_id": 999999}).status_code == 404
+
+
+def test_stream_calls_the_llm_when_rule_engine_is_off(client, upload, monkeypatch):
+    calls = 0
+
+    async def fake_analyze(xml_str, rules=None):
+        nonlocal calls
+        calls += 1
+        return [AnalysisItem(slideNumber=1, category="表現", basis="1", issue="LLM", suggestion="s")]
+
+    monkeypatch.setattr(settings, "RULE_ENGINE_ENABLED", False)
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(analysis, "analyze_xml_async", fake_analyze)
+
+    file_id = upload()["file_id"]
+    r = client.get("/analyze/stream", params={"file_id": file_id, "mode": "llm", "force": "true"})
+    assert r.status_code == 200
+    events = _events(r.text)
+    assert calls >= 1
+    name, done = events[-1]
+    assert name == "done"
+    assert done["items_count"] >= 1
+
+
+def test_auto_fallback_matches_the_non_stream_result(client, upload, monkeypatch):
+    """auto で LLM が失敗したら、ルールエンジンの指摘を混ぜずに mock だけの結果になる（/analyze と同じ）。"""
+
+    async def failing(xml_str, rules=None):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(settings, "RULE_ENGINE_ENABLED", True)
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(settings, "ANALYZE_SHARD_RETRIES", 0)
+    monkeypatch.setattr(analysis, "analyze_xml_async", failing)
+    monkeypatch.setattr(pipeline, "analyze_xml_async", failing)
+
+    file_id = upload()["file_id"]
+    r = client.get("/analyze/stream", params={"file_id": file_id, "mode": "auto", "force": "true"})
+    events = _events(r.text)
+    name, done = events[-1]
+    assert (name, done["model"]) == ("done", "mock")
+    streamed = sorted(d["issue"] for n, d in events if n == "item")
+
+    r = client.post("/analyze", data={"file_id": file_id, "mode": "auto", "force": "true"})
+    assert r.headers["x-analysis-mode"].startswith("mock")
+    assert streamed == sorted(i["issue"] for i in r.json())
+    saved = client.get(f"/analyses/{done['analysis_id']}").json()
+    assert sorted(i["issue"] for i in saved["items"]) == streamed
+
+
+def test_failed_stream_is_finished_off_the_event_loop(client, upload, monkeypatch):
+    on_loop: list[bool] = []
+    real_finish = pipeline.finish_analysis
+
+    def finish(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return real_finish(*args, **kwargs)
+
+    async def failing(xml_str, rules=None):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(pipeline, "finish_analysis", finish)
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(settings, "ANALYZE_SHARD_RETRIES", 0)
+    monkeypatch.setattr(analysis, "analyze_xml_async", failing)
+
+    file_id = upload()["file_id"]
+    r = client.get("/analyze/stream", params={"file_id": file_id, "mode": "llm", "force": "true"})
+    name, error = _events(r.text)[-1]
+    assert (name, error["status_code"]) == ("error", 502)
+    assert client.get(f"/analyses/{error['analysis_id']}/status").json()["status"] == "failed"
+    assert on_loop == [False]
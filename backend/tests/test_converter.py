@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+from app.services.pptx_parser import PptxConverter
+
+DECK = Path(__file__).resolve().parent / "data" / "dummy_slide.pptx"
+
+
+@pytest.mark.parametrize("pretty", [True, False])
+def test_zip_backend_matches_python_pptx(pretty):
+    expected = PptxConverter.convert_to_xml(str(DECK), pretty=pretty, backend="python-pptx")
+    assert PptxConverter.convert_to_xml(str(DECK), pretty=pretty, backend="zip") == expected
+    with open(DECK, "rb") as fh:
+        assert PptxConverter.convert_to_xml(fh.read(), pretty=pretty, backend="zip") == expected
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        PptxConverter.convert_to_xml(str(DECK), backend="nope")
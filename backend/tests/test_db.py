@@ -0,0 +1,45 @@
+import threading
+
+
+def test_sqlite_pragmas(client):
+    from app.db import engine
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+
+
+def test_parallel_item_patches(client, upload, analyze):
+    """PATCH /analysis-items/{id} を並列に投げても "database is locked" で 500 にならない。"""
+    from app.db import SessionLocal
+    from app.models import Analysis
+
+    analysis_id, _, _ = analyze(upload()["file_id"], force="true")
+    ids = [i["id"] for i in client.get(f"/analyses/{analysis_id}").json()["items"]]
+
+    statuses: list[int] = []
+    start = threading.Barrier(16)
+
+    def patcher(n: int) -> None:
+        start.wait()
+        for i in range(20):
+            try:
+                r = client.patch(
+                    f"/analysis-items/{ids[(n + i) % len(ids)]}",
+                    json={"suggestion": f"修正案 {n}-{i}", "correctionType": "任意" if i % 2 else "必須"},
+                )
+            except Exception:  # TestClient はサーバー側の例外（"database is locked" など）をそのまま送出する
+                statuses.append(500)
+            else:
+                statuses.append(r.status_code)
+
+    threads = [threading.Thread(target=patcher, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(statuses) == 16 * 20
+    assert set(statuses) == {200}
+    # 全ての更新で版が上がっている（更新の取りこぼしがない）
+    with SessionLocal() as db:
+        assert db.get(Analysis, analysis_id).version >= 16 * 20
@@ -0,0 +1,54 @@
+def test_conditional_get_returns_304_until_the_analysis_changes(client, upload, analyze):
+    file_id = upload()["file_id"]
+    analysis_id, items, _ = analyze(file_id)
+    url = f"/analyses/{analysis_id}"
+
+    r = client.get(url)
+    etag = r.headers["etag"]
+    assert r.status_code == 200 and r.headers["cache-control"] == "no-cache"
+
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert (r.status_code, r.content, r.headers["etag"]) == (304, b"", etag)
+    # 弱い比較・複数指定・* も一致とみなす
+    for value in (f"W/{etag}", f'"other", {etag}', "*"):
+        assert client.get(url, headers={"If-None-Match": value}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    item_id = client.get(url).json()["items"][0]["id"]
+    assert client.patch(f"/analysis-items/{item_id}", json={"issue": "編集後"}).status_code == 200
+    r = client.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    # 応答キャッシュに古い本文が残っていない
+    assert [i["issue"] for i in r.json()["items"] if i["id"] == item_id] == ["編集後"]
+    assert len(r.json()["items"]) == len(items)
+
+
+def test_every_item_edit_changes_the_etag(client, upload, analyze):
+    file_id = upload()["file_id"]
+    analysis_id, _, _ = analyze(file_id)
+    url = f"/analyses/{analysis_id}"
+    latest_url = f"/files/{file_id}/analyses/latest"
+
+    def etags() -> tuple[str, str]:
+        return client.get(url).headers["etag"], client.get(latest_url).headers["etag"]
+
+    seen = [etags()]
+    assert seen[0][0] == seen[0][1]  # 同じ Analysis の版
+    new_item = {"slideNumber": 1, "category": "表現", "basis": "1", "issue": "追加", "suggestion": "s"}
+    assert client.post(f"/files/{file_id}/analyses/latest/items", json=new_item).status_code == 200
+    seen.append(etags())
+    item_id = client.get(url).json()["items"][-1]["id"]
+    ops = {"operations": [{"op": "update", "id": item_id, "issue": "一括編集"}]}
+    assert client.post(f"/analyses/{analysis_id}/items:batch", json=ops).status_code == 200
+    seen.append(etags())
+    assert client.delete(f"/analysis-items/{item_id}").status_code == 200
+    seen.append(etags())
+
+    assert len(set(seen)) == len(seen)
+    r = client.get(latest_url, headers={"If-None-Match": seen[-1][1]})
+    assert r.status_code == 304
+    assert all(i["id"] != item_id for i in client.get(latest_url).json()["items"])
+
+
+def test_missing_analysis_is_404_even_with_if_none_match(client):
+    assert client.get("/analyses/999999", headers={"If-None-Match": "*"}).status_code == 404
@@ -0,0 +1,78 @@
+import csv
+import io
+import zipfile
+
+import pytest
+from app.services import export
+
+
+def test_csv_export_of_one_file(client, upload, analyze):
+    file_id = upload()["file_id"]
+    analysis_id, items, _ = analyze(file_id)
+    r = client.get("/exports/findings", params={"format": "csv", "file_id": file_id})
+    assert r.status_code == 200
+    assert r.headers["content-disposition"] == 'attachment; filename="findings.csv"'
+    assert r.content.startswith(b"\xef\xbb\xbf")  # Excel 向けの BOM
+    rows = list(csv.reader(io.StringIO(r.content.decode("utf-8-sig"))))
+    assert rows[0] == [label for _, label in export.EXPORT_COLUMNS]
+    assert len(rows) == 1 + len(items)
+    assert {row[2] for row in rows[1:]} == {str(analysis_id)}
+
+
+def test_csv_export_filters_by_category(client, upload, analyze):
+    file_id = upload()["file_id"]
+    _, items, _ = analyze(file_id)
+    category = items[0]["category"]
+    r = client.get("/exports/findings", params={"format": "csv", "file_id": file_id, "category": category})
+    rows = list(csv.reader(io.StringIO(r.content.decode("utf-8-sig"))))[1:]
+    assert len(rows) == sum(1 for i in items if i["category"] == category)
+    assert {row[7] for row in rows} == {category}
+
+
+def test_export_rejects_unknown_format(client):
+    assert client.get("/exports/findings", params={"format": "pdf"}).status_code == 400
+
+
+def test_xlsx_export_opens_in_openpyxl(client, upload, analyze):
+    openpyxl = pytest.importorskip("openpyxl")
+    file_id = upload()["file_id"]
+    analysis_id, items, _ = analyze(file_id)
+    r = client.get("/exports/findings", params={"format": "xlsx", "file_id": file_id})
+    assert r.status_code == 200
+    wb = openpyxl.load_workbook(io.BytesIO(r.content), read_only=True)
+    rows = list(wb["findings"].iter_rows(values_only=True))
+    assert list(rows[0]) == [label for _, label in export.EXPORT_COLUMNS]
+    assert len(rows) == 1 + len(items)
+    assert {row[2] for row in rows[1:]} == {analysis_id}
+    assert sorted(row[10] for row in rows[1:]) == sorted(i["issue"] for i in items)
+
+
+class _Row:
+    def __init__(self, n: int):
+        values = {key: None for key, _ in export.EXPORT_COLUMNS}
+        values.update(item_id=n, issue=f"指摘 {n} <&>\x01")
+        self._mapping = values
+
+
+def test_xlsx_is_streamed_before_all_rows_are_read(monkeypatch):
+    """最初の塊は全行を読み終える前に出る。行数上限を超えた分は次のシートに続く。"""
+    consumed = 0
+
+    def rows(n):
+        nonlocal consumed
+        for i in range(n):
+            consumed += 1
+            yield _Row(i)
+
+    monkeypatch.setattr(export, "XLSX_MAX_ROWS", 1000)
+    chunks = export.iter_xlsx(rows(20000), flush_rows=500)
+    first = next(chunks)
+    assert first.startswith(b"PK") and consumed < 20000
+    body = first + b"".join(chunks)
+
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert zf.testzip() is None
+        sheets = sorted(n for n in zf.namelist() if n.startswith("xl/worksheets/"))
+        assert len(sheets) == 21  # 1 シート 999 行 + 見出し
+        # XML の特殊文字はエスケープし、XML で使えない制御文字は落とす
+        assert ">指摘 0 &lt;&amp;&gt;</t>" in zf.read("xl/worksheets/sheet1.xml").decode("utf-8")
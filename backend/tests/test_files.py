@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+from app.api import routes
+from app.core.settings import settings
+
+
+def _blob(rec: dict) -> str:
+    return os.path.join(settings.STORAGE_DIR, rec["sha256"][:2], f"{rec['sha256']}.pptx")
+
+
+# revised_deck はテストごとに中身が違うので、他のテストと blob を共有しない
+
+
+def test_same_bytes_share_one_blob_until_the_last_delete(client, upload, revised_deck):
+    a, b = upload(path=revised_deck), upload(path=revised_deck)
+    assert a["file_id"] != b["file_id"] and a["sha256"] == b["sha256"]
+    assert os.path.exists(_blob(a))
+    assert os.listdir(os.path.join(settings.STORAGE_DIR, ".tmp")) == []
+
+    assert client.delete(f"/files/{a['file_id']}").status_code == 200
+    assert os.path.exists(_blob(a))  # b がまだ参照している
+    assert client.delete(f"/files/{b['file_id']}").status_code == 200
+    assert not os.path.exists(_blob(a))
+
+
+def test_delete_racing_an_upload_of_the_same_bytes_keeps_the_blob(client, upload, revised_deck, monkeypatch):
+    first = upload(path=revised_deck)
+
+    entered = threading.Event()
+    real_count = routes.count_files_by_sha256
+
+    def slow_count(*args, **kwargs):
+        # 参照数 0 を確認してから blob を消すまでの間に、同じバイト列のアップロードが割り込む状況を作る
+        n = real_count(*args, **kwargs)
+        entered.set()
+        time.sleep(0.3)
+        return n
+
+    monkeypatch.setattr(routes, "count_files_by_sha256", slow_count)
+    t = threading.Thread(target=client.delete, args=(f"/files/{first['file_id']}",))
+    t.start()
+    assert entered.wait(5)
+    uploaded = upload(path=revised_deck)
+    t.join()
+
+    assert os.path.exists(_blob(uploaded))
+    r = client.post("/analyze", data={"file_id": uploaded["file_id"], "mode": "mock", "force": "true"})
+    assert r.status_code == 200, r.text
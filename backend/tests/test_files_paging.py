@@ -0,0 +1,43 @@
+def _pages(client, limit: int, after: str | None = None) -> list[list[str]]:
+    pages = []
+    while True:
+        params = {"limit": limit, **({"after": after} if after else {})}
+        r = client.get("/files", params=params)
+        assert r.status_code == 200, r.text
+        pages.append([f["id"] for f in r.json()])
+        after = r.headers.get("x-next-cursor")
+        if not after:
+            return pages
+
+
+def test_keyset_pages_cover_the_full_listing_once(client, upload, analyze):
+    # 同じ秒に作られた（created_at が並ぶ）ファイルも id で順序が決まる
+    ids = [upload(name=f"page-{n}.pptx")["file_id"] for n in range(7)]
+    analyze(ids[0])
+
+    full = client.get("/files")
+    assert "x-next-cursor" not in full.headers
+    everything = [f["id"] for f in full.json()]
+    assert [str(i) for i in reversed(ids)] == everything[: len(ids)]
+
+    pages = _pages(client, limit=3)
+    assert all(len(p) <= 3 for p in pages)
+    assert [i for p in pages for i in p] == everything
+    statuses = {f["id"]: f["status"] for f in full.json()}
+    assert statuses[str(ids[0])] == "success" and statuses[str(ids[1])] == "pending"
+
+
+def test_cursor_survives_deleting_the_anchor_file(client, upload):
+    ids = [upload(name=f"anchor-{n}.pptx")["file_id"] for n in range(4)]
+    r = client.get("/files", params={"limit": 2})
+    first = [f["id"] for f in r.json()]
+    assert first == [str(ids[3]), str(ids[2])]
+    assert client.delete(f"/files/{ids[2]}").status_code == 200
+
+    r = client.get("/files", params={"limit": 2, "after": r.headers["x-next-cursor"]})
+    assert [f["id"] for f in r.json()] == [str(ids[1]), str(ids[0])]
+
+
+def test_invalid_cursor_is_rejected(client):
+    assert client.get("/files", params={"after": "not-a-cursor"}).status_code == 400
+    assert client.get("/files", params={"limit": 0}).status_code == 422
@@ -0,0 +1,40 @@
+from sqlalchemy import select
+
+
+def test_revised_deck_reuses_unchanged_slides(client, upload, analyze, revised_deck):
+    base = upload(name="incremental.pptx")
+    _, base_items, _ = analyze(base["file_id"], force="true")
+    by_slide = {n: sorted(i["issue"] for i in base_items if i["slideNumber"] == n) for n in (1, 2)}
+
+    rev = upload(revised_deck, name="incremental.pptx", revision_of=base["file_id"])
+    _, items, headers = analyze(rev["file_id"])
+    assert headers["x-slides-reused"] == "2"
+    assert headers["x-slides-analyzed"] == "1"
+    # スライド 1 と 2 を入れ替えたので、前回の指摘は入れ替え後の番号で引き継がれる
+    assert sorted(i["issue"] for i in items if i["slideNumber"] == 2) == by_slide[1]
+    assert sorted(i["issue"] for i in items if i["slideNumber"] == 1) == by_slide[2]
+
+
+def test_edited_items_are_not_carried_over(client, upload, analyze, revised_deck):
+    from app.db import SessionLocal
+    from app.models import AnalysisCacheEntry
+
+    base = upload(name="edited.pptx")
+    base_id, _, _ = analyze(base["file_id"], force="true")
+    base_items = client.get(f"/analyses/{base_id}").json()["items"]
+    r = client.patch(f"/analysis-items/{base_items[0]['id']}", json={"issue": "EDITED"})
+    assert r.status_code == 200, r.text
+    r = client.post(
+        f"/files/{base['file_id']}/analyses/latest/items",
+        json={"slideNumber": 1, "category": "誤植", "basis": "1", "issue": "MANUAL", "suggestion": "s"},
+    )
+    assert r.status_code == 200, r.text
+
+    rev = upload(revised_deck, name="edited.pptx", revision_of=base["file_id"])
+    _, items, headers = analyze(rev["file_id"])
+    assert headers["x-slides-reused"] == "2"
+    assert not {"EDITED", "MANUAL"} & {i["issue"] for i in items}
+
+    with SessionLocal() as db:
+        cached = db.execute(select(AnalysisCacheEntry.result_json)).scalars().all()
+    assert not any(d["issue"] in ("EDITED", "MANUAL") for result in cached for d in result)
@@ -0,0 +1,75 @@
+import pytest
+
+
+@pytest.fixture
+def analysis(client, upload, analyze) -> tuple[int, list[int]]:
+    analysis_id, _, _ = analyze(upload()["file_id"], force="true")
+    ids = [i["id"] for i in client.get(f"/analyses/{analysis_id}").json()["items"]]
+    assert len(ids) >= 6
+    return analysis_id, ids
+
+
+def _batch(client, analysis_id: int, ops: list[dict]):
+    return client.post(f"/analyses/{analysis_id}/items:batch", json={"operations": ops})
+
+
+def test_batch_applies_creates_updates_and_deletes(client, analysis):
+    analysis_id, ids = analysis
+    r = _batch(
+        client,
+        analysis_id,
+        [
+            {"op": "update", "id": ids[0], "category": "表現", "basis": "9"},
+            {"op": "update", "id": ids[0], "issue": "更新済み"},
+            {"op": "update", "id": ids[1], "correctionType": "任意"},
+            {"op": "delete", "id": ids[2]},
+            {"op": "update", "id": ids[2], "issue": "消える"},
+            {"op": "create", "slideNumber": 2, "category": "誤植", "basis": "1", "issue": "新規", "suggestion": "s"},
+        ],
+    )
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["deleted"] == [ids[2]]
+    assert [(c["issue"], c["correctionType"]) for c in body["created"]] == [("新規", "任意")]
+    updated = {u["id"]: u for u in body["updated"]}
+    # 同じ id への更新は重ねて適用され、削除された id の更新は捨てられる
+    assert set(updated) == {ids[0], ids[1]}
+    assert (updated[ids[0]]["category"], updated[ids[0]]["basis"], updated[ids[0]]["issue"]) == ("表現", "9", "更新済み")
+    assert updated[ids[1]]["correctionType"] == "任意"
+
+    after = {i["id"]: i for i in client.get(f"/analyses/{analysis_id}").json()["items"]}
+    assert ids[2] not in after
+    assert after[ids[0]]["issue"] == "更新済み"
+    assert body["created"][0]["id"] in after
+
+
+def test_batch_is_all_or_nothing(client, analysis):
+    analysis_id, ids = analysis
+    r = _batch(client, analysis_id, [{"op": "delete", "id": ids[5]}, {"op": "delete", "id": 999999}])
+    assert r.status_code == 404
+    assert "999999" in r.json()["detail"]
+    assert ids[5] in {i["id"] for i in client.get(f"/analyses/{analysis_id}").json()["items"]}
+
+
+def test_batch_rejects_items_of_other_analyses(client, analysis, upload, analyze):
+    analysis_id, _ = analysis
+    other_id, _, _ = analyze(upload()["file_id"], force="true")
+    other_item = client.get(f"/analyses/{other_id}").json()["items"][0]["id"]
+    assert _batch(client, analysis_id, [{"op": "delete", "id": other_item}]).status_code == 404
+
+
+@pytest.mark.parametrize(
+    "ops",
+    [
+        [],
+        [{"op": "bogus", "id": 1}],
+        [{"op": "update", "id": 1, "correctionType": "x"}],
+    ],
+)
+def test_batch_validates_operations(client, analysis, ops):
+    analysis_id, _ = analysis
+    assert _batch(client, analysis_id, ops).status_code == 422
+
+
+def test_batch_on_missing_analysis(client):
+    assert _batch(client, 999999, [{"op": "delete", "id": 1}]).status_code == 404
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from app.core.settings import settings
+from app.services import jobs
+from starlette.concurrency import run_in_threadpool
+
+
+def _wait(client, analysis_id: int, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/analyses/{analysis_id}/status").json()
+        if status["status"] in ("succeeded", "failed") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.05)
+
+
+def _enqueue(client, file_id: int) -> int:
+    r = client.post("/analyze?async=true", data={"file_id": file_id, "mode": "mock", "force": "true"})
+    assert r.status_code == 202, r.text
+    return r.json()["analysis_id"]
+
+
+def test_job_runs_to_completion(client, upload):
+    analysis_id = _enqueue(client, upload()["file_id"])
+    status = _wait(client, analysis_id)
+    assert status["status"] == "succeeded"
+    assert status["attempts"] == 1 and status["finished_at"] is not None
+    assert len(client.get(f"/analyses/{analysis_id}").json()["items"]) > 0
+
+
+def test_failed_job_records_the_error(client, upload, monkeypatch):
+    async def boom(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(jobs, "run_analysis", boom)
+    status = _wait(client, _enqueue(client, upload()["file_id"]))
+    assert (status["status"], status["error"]) == ("failed", "boom")
+
+
+def test_timed_out_job_is_marked_failed(client, upload, monkeypatch):
+    async def slow(db, f, **kwargs):
+        # 打ち切られた時点でもセッションをスレッドで使っている解析を模す
+        await run_in_threadpool(time.sleep, 0.5)
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(jobs, "run_analysis", slow)
+    monkeypatch.setattr(settings, "JOB_TIMEOUT_SECONDS", 0.2)
+    status = _wait(client, _enqueue(client, upload()["file_id"]))
+    assert status["status"] == "failed"
+    assert status["error"].startswith("timeout after")
+
+
+def test_job_db_work_does_not_block_the_event_loop(client, upload, monkeypatch):
+    entered = threading.Event()
+    real_finish = jobs.finish_job
+
+    def slow_finish(*args, **kwargs):
+        entered.set()
+        time.sleep(1.0)  # SQLite のロック待ちや大量 INSERT を模す
+        return real_finish(*args, **kwargs)
+
+    monkeypatch.setattr(jobs, "finish_job", slow_finish)
+    analysis_id = _enqueue(client, upload()["file_id"])
+    assert entered.wait(5)
+    t0 = time.perf_counter()
+    assert client.get("/health").status_code == 200
+    assert time.perf_counter() - t0 < 0.5
+    assert _wait(client, analysis_id)["status"] == "succeeded"
+
+
+def test_stale_jobs_are_recovered(client, upload, monkeypatch):
+    from app.db import SessionLocal
+    from app.models import Analysis, AnalysisJob, utcnow
+
+    # 実行中のまま取り残されたジョブ（プロセスが落ちた等）を作る。それまではワーカーに拾わせない
+    monkeypatch.setattr(jobs, "_claim", lambda: None)
+    analysis_id = _enqueue(client, upload()["file_id"])
+    exhausted_id = _enqueue(client, upload()["file_id"])
+    long_ago = utcnow() - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS + jobs.STALE_GRACE_SECONDS + 60)
+    with SessionLocal() as db:
+        for aid, attempts in ((analysis_id, 1), (exhausted_id, settings.JOB_MAX_ATTEMPTS)):
+            job = db.query(AnalysisJob).filter(AnalysisJob.analysis_id == aid).one()
+            job.status, job.started_at, job.attempts = "running", long_ago, attempts
+            db.get(Analysis, aid).status = "running"
+        db.commit()
+
+    assert jobs.recover_jobs() == 2
+    assert client.get(f"/analyses/{analysis_id}/status").json()["status"] == "queued"
+    assert client.get(f"/analyses/{exhausted_id}/status").json()["status"] == "failed"
+
+    monkeypatch.undo()
+    jobs.notify_new_job()
+    status = _wait(client, analysis_id)
+    assert (status["status"], status["attempts"]) == ("succeeded", 2)
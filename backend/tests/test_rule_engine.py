@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from app.core.settings import settings
+from app.services import analysis, pipeline
+from app.services.rule_engine import (DEFAULT_DICTIONARY, RuleEngine, _AhoCorasick,
+                                      basis_rule, remaining_rules)
+from app.services.schemas import AnalysisItem
+
+
+@pytest.fixture(scope="module")
+def engine() -> RuleEngine:
+    return RuleEngine(DEFAULT_DICTIONARY)
+
+
+def test_aho_corasick_finds_overlapping_words():
+    ac = _AhoCorasick(["he", "she", "his", "hers"])
+    assert sorted(ac.find("ushers")) == [(0, 4), (1, 4), (3, 6)]
+    assert list(ac.find("")) == []
+    assert list(_AhoCorasick([]).find("abc")) == []
+
+
+def test_product_name_is_flagged_with_generic_name(engine):
+    items = engine.scan_slide(1, "オングリザという糖尿病治療剤がありますよ。ｵﾝｸﾞﾘｻﾞも同じ。")
+    assert [(i.basis, i.correctionType) for i in items] == [("2", "必須")]
+    assert "サキサグリプチン" in items[0].suggestion
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "本剤は治癒を保証するものではありません。",
+        "2型糖尿病は完治が難しい疾患です。",
+        "糖尿病専門病院を受診してください。",
+        "地域の総合病院にご相談ください。",
+    ],
+)
+def test_no_false_positives(engine, text):
+    assert engine.scan_slide(1, text) == []
+
+
+def test_judgment_rules_are_optional_candidates(engine):
+    items = engine.scan_slide(1, "この薬で糖尿病は完治します。詳しくは山田クリニックへ。")
+    assert sorted((i.basis, i.correctionType) for i in items) == [("4", "任意"), ("8", "任意")]
+
+
+def test_negation_applies_only_to_the_same_sentence(engine):
+    items = engine.scan_slide(1, "糖尿病は完治します。副作用はありません。")
+    assert [i.basis for i in items] == ["4"]
+
+
+def test_only_decided_rules_leave_the_prompt(engine):
+    assert engine.decided_rules == frozenset({"2"})
+    rules = "1. 誤字脱字\n2. 製品名\n3. 恐怖\n4. 治癒\n8. 医療機関名"
+    assert remaining_rules(rules, engine.decided_rules) == "1. 誤字脱字\n3. 恐怖\n4. 治癒\n8. 医療機関名"
+
+
+def test_basis_rule_number():
+    assert [basis_rule(b) for b in ("4", "ルール4: 治癒", " 8.", "Rule 3", "薬機法第66条", None)] == [
+        "4", "4", "8", "3", None, None,
+    ]
+
+
+def _item(slide: int, basis: str, issue: str, correction_type: str | None = None) -> AnalysisItem:
+    return AnalysisItem(
+        slideNumber=slide, category="表現", basis=basis, issue=issue, suggestion="s", correctionType=correction_type
+    )
+
+
+@pytest.fixture
+def engine_and_llm(monkeypatch):
+    """スライド 1 にルール 2（判定済み）とルール 4（候補）、スライド 2 にルール 8（候補）。
+    LLM はスライド 1 のルール 4 だけを指摘する。"""
+    local = [_item(1, "2", "engine-2", "必須"), _item(1, "4", "engine-4", "任意"), _item(2, "8", "engine-8", "任意")]
+
+    async def fake_analyze(xml_str, rules=None):
+        return [_item(1, "ルール4（治癒）", "llm-4")]
+
+    monkeypatch.setattr(settings, "RULE_ENGINE_ENABLED", True)
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test")
+    monkeypatch.setattr(pipeline, "_local_items", lambda xml_str: list(local))
+    monkeypatch.setattr(pipeline, "analyze_xml_async", fake_analyze)
+    monkeypatch.setattr(analysis, "analyze_xml_async", fake_analyze)
+
+
+def test_drop_confirmed_keeps_decided_and_unreported_candidates(engine):
+    items = [_item(1, "2", "engine-2"), _item(1, "4", "engine-4"), _item(2, "4", "engine-4b")]
+    kept = engine.drop_confirmed(items, [_item(1, "4.", "llm"), _item(1, "2", "llm-2")])
+    assert [i.issue for i in kept] == ["engine-2", "engine-4b"]
+
+
+@pytest.mark.parametrize("sharded", ["false", "true"])
+def test_llm_result_drops_candidates_the_llm_reported(client, upload, engine_and_llm, sharded):
+    r = client.post(
+        "/analyze", data={"file_id": upload()["file_id"], "mode": "llm", "force": "true", "sharded": sharded}
+    )
+    assert r.status_code == 200, r.text
+    assert [i["issue"] for i in r.json()] == ["engine-2", "llm-4", "engine-8"]
+
+
+@pytest.mark.parametrize("mode", ["llm", "auto"])
+def test_stream_drops_candidates_the_llm_reported(client, upload, engine_and_llm, mode):
+    r = client.get("/analyze/stream", params={"file_id": upload()["file_id"], "mode": mode, "force": "true"})
+    events = [block.split("\n") for block in r.text.strip().split("\n\n")]
+    issues = [json.loads(lines[1][len("data: "):])["issue"] for lines in events if lines[0] == "event: item"]
+    assert sorted(issues) == ["engine-2", "engine-8", "llm-4"]
@@ -0,0 +1,65 @@
+from app.services.analysis_cache import rules_hash
+
+RULES_V1 = "1. 誤字脱字\n2. 製品名を使わない"
+RULES_V2 = "1. 誤字脱字\n2. 製品名を使わない\n3. 恐怖をあおらない"
+
+
+def _create(client, name: str = "社内ルール", rules: str = RULES_V1) -> dict:
+    r = client.post("/rule-sets", json={"name": name, "rules": rules})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_create_and_read(client):
+    rs = _create(client)
+    assert (rs["rules"], rs["version"]) == (RULES_V1, rules_hash(RULES_V1))
+    assert rs["id"] in [x["id"] for x in client.get("/rule-sets").json()]
+    detail = client.get(f"/rule-sets/{rs['id']}").json()
+    assert (detail["rules"], detail["version"]) == (RULES_V1, rs["version"])
+
+
+def test_versions_are_added_only_when_the_content_changes(client):
+    rs = _create(client)
+    v1 = rs["version"]
+
+    # 空白・空行の違いだけなら版は変わらない
+    same = client.patch(f"/rule-sets/{rs['id']}", json={"rules": "  1.  誤字脱字\n\n2. 製品名を使わない  "}).json()
+    assert same["version"] == v1
+
+    v2 = client.patch(f"/rule-sets/{rs['id']}", json={"rules": RULES_V2}).json()["version"]
+    assert v2 != v1
+    versions = client.get(f"/rule-sets/{rs['id']}/versions").json()
+    assert [(v["version"], v["current"]) for v in versions] == [(v2, True), (v1, False)]
+    assert client.get(f"/rule-sets/{rs['id']}", params={"version": v1}).json()["rules"] == RULES_V1
+
+    # 過去と同じ内容に戻したら既存の版を現在の版にする（版は増えない）
+    back = client.patch(f"/rule-sets/{rs['id']}", json={"rules": RULES_V1, "name": "改名"}).json()
+    assert (back["version"], back["name"], back["rules"]) == (v1, "改名", RULES_V1)
+    assert len(client.get(f"/rule-sets/{rs['id']}/versions").json()) == 2
+
+
+def test_analysis_records_the_rule_set_version(client, upload):
+    rs = _create(client, rules=RULES_V2)
+    file_id = upload()["file_id"]
+    r = client.post("/analyze", data={"file_id": file_id, "rule_set_id": rs["id"], "mode": "mock", "force": "true"})
+    assert r.status_code == 200, r.text
+    analyses = client.get(f"/files/{file_id}/analyses").json()
+    assert analyses[0]["rules_version"] == rs["version"]
+
+    # 削除しても過去の解析の rules_version は残る
+    assert client.delete(f"/rule-sets/{rs['id']}").status_code == 200
+    assert client.get(f"/rule-sets/{rs['id']}").status_code == 404
+    assert client.get(f"/files/{file_id}/analyses").json()[0]["rules_version"] == rs["version"]
+
+
+def test_invalid_requests(client, upload):
+    rs = _create(client)
+    file_id = upload()["file_id"]
+    assert client.post("/rule-sets", json={"name": "空", "rules": "   "}).status_code == 400
+    assert client.patch(f"/rule-sets/{rs['id']}", json={"rules": " "}).status_code == 400
+    assert client.get(f"/rule-sets/{rs['id']}", params={"version": "nope"}).status_code == 404
+    assert client.get("/rule-sets/999999").status_code == 404
+    r = client.post("/analyze", data={"file_id": file_id, "rule_set_id": rs["id"], "rules": "1. x", "mode": "mock"})
+    assert r.status_code == 400
+    r = client.post("/analyze", data={"file_id": file_id, "rule_set_id": 999999, "mode": "mock"})
+    assert r.status_code == 404
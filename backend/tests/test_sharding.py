@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from app.services import analysis
+
+
+@pytest.mark.parametrize(
+    "exc, calls",
+    [
+        (TimeoutError(), 3),
+        (ValueError("invalid model output"), 1),
+        (analysis.CircuitOpenError("open"), 1),
+    ],
+)
+def test_shards_retry_only_transient_errors(monkeypatch, exc, calls):
+    attempts = 0
+
+    async def failing(shard, rules):
+        nonlocal attempts
+        attempts += 1
+        raise exc
+
+    async def no_sleep(_seconds):
+        return None
+
+    monkeypatch.setattr(analysis, "analyze_xml_async", failing)
+    monkeypatch.setattr(analysis.asyncio, "sleep", no_sleep)
+
+    async def run():
+        xml_str = '<Document><Slide number="1"><Text>a</Text></Slide></Document>'
+        async for _ in analysis.iter_xml_shards(xml_str, max_chars=10_000, concurrency=1, retries=2):
+            pass
+
+    with pytest.raises(type(exc)):
+        asyncio.run(run())
+    assert attempts == calls
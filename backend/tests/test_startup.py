@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_concurrent_migrate(tmp_path):
+    from app.migrations import SCHEMA_VERSION, migrate
+
+    url = f"sqlite:///{tmp_path}/race.db"
+    results: list[object] = []
+    start = threading.Barrier(6)
+
+    def run() -> None:
+        eng = create_engine(url, connect_args={"timeout": 30})
+        start.wait()
+        try:
+            results.append(migrate(eng))
+        except Exception as e:
+            results.append(e)
+        finally:
+            eng.dispose()
+
+    threads = [threading.Thread(target=run) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not [r for r in results if isinstance(r, Exception)], results
+    assert sum(results) == SCHEMA_VERSION
+    with create_engine(url).connect() as conn:
+        versions = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+    assert versions == list(range(1, SCHEMA_VERSION + 1))
+
+
+def test_import_does_not_load_heavy_modules(tmp_path):
+    """起動時（import app.main）には google-genai・python-pptx・lxml・httpx を読み込まない。"""
+    code = (
+        "import sys, app.main; "
+        "print(','.join(m for m in ('google.genai', 'pptx', 'lxml', 'httpx') if m in sys.modules))"
+    )
+    env = dict(os.environ, DB_URL=f"sqlite:///{tmp_path}/startup.db", STORAGE_DIR=str(tmp_path / "storage"))
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
@@ -0,0 +1,40 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from app.core.settings import settings
+from app.services import workers
+
+DECK = Path(__file__).resolve().parent / "data" / "dummy_slide.pptx"
+
+
+class _BrokenPool(Executor):
+    """ワーカーが異常終了した後の ProcessPoolExecutor と同じく、投入した処理が BrokenProcessPool で失敗する。"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        fut: Future = Future()
+        fut.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return fut
+
+
+def test_broken_parse_pool_is_replaced(monkeypatch):
+    broken = _BrokenPool()
+    monkeypatch.setattr(workers, "_parse_pool", broken)
+    xml_str = asyncio.run(workers._run_in_parse_pool(str(DECK), False))
+    assert xml_str.startswith("<?xml")
+    assert workers._parse_pool is not None and workers._parse_pool is not broken
+    workers.shutdown_pools()
+
+
+def test_analyze_returns_503_when_the_retry_also_fails(client, upload, monkeypatch):
+    monkeypatch.setattr(settings, "XML_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "ANALYSIS_CACHE_ENABLED", False)
+    monkeypatch.setattr(workers, "get_parse_pool", lambda: _BrokenPool())
+    file_id = upload()["file_id"]
+    r = client.post("/analyze", data={"file_id": file_id, "mode": "mock", "force": "true"})
+    assert r.status_code == 503
+
+    monkeypatch.undo()
+    r = client.post("/analyze", data={"file_id": file_id, "mode": "mock", "force": "true"})
+    assert r.status_code == 200
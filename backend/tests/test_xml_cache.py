@@ -0,0 +1,41 @@
+import os
+
+from app.core.settings import settings
+from app.services import xml_cache
+from app.services.xml_cache import XmlCache
+
+
+def test_xml_cache_key_includes_backend(tmp_path, monkeypatch):
+    cache = XmlCache(str(tmp_path), 1 << 20)
+    sha = "ab" * 32
+    monkeypatch.setattr(settings, "PPTX_BACKEND", "python-pptx")
+    cache.put(sha, "<Document/>", pretty=True, include_notes=False)
+    assert cache.get(sha, pretty=True, include_notes=False) == "<Document/>"
+    monkeypatch.setattr(settings, "PPTX_BACKEND", "zip")
+    assert cache.get(sha, pretty=True, include_notes=False) is None
+
+
+def test_xml_cache_evicts_without_scanning_on_every_put(tmp_path, monkeypatch):
+    walks = 0
+    real_walk = os.walk
+
+    def counting_walk(*args, **kwargs):
+        nonlocal walks
+        walks += 1
+        return real_walk(*args, **kwargs)
+
+    monkeypatch.setattr(xml_cache.os, "walk", counting_walk)
+    cache = XmlCache(str(tmp_path), 10_000)
+    for i in range(200):
+        cache.put(f"{i:064x}", "x" * 100, pretty=False, include_notes=False)
+
+    total = sum(
+        os.path.getsize(os.path.join(d, f)) for d, _, files in real_walk(tmp_path) for f in files if f.endswith(".xml")
+    )
+    assert total <= 10_000
+    assert cache.stats()["bytes"] == total
+    assert cache.evictions > 0
+    # 初回の集計と、上限を超えたときだけ走査する（下限まで削るので超過は 10 回に 1 回程度）
+    assert walks < 200 // 5
+    # 最も新しいエントリは残る
+    assert cache.get(f"{199:064x}", pretty=False, include_notes=False) == "x" * 100